@@ -0,0 +1,101 @@
+import argparse
+import json
+import logging
+import sys
+
+import nordic_central_ble_wrapper as Ble  # needs to come before ble_driver import to set the config type
+from pc_ble_driver_py import ble_driver as NordicDriver
+
+from services.opcodes import (
+    OpCodesService,
+    OpCodesTxCharacteristic,
+    OpCodesRxCharacteristic,
+    build_opcodes,
+    load_opcode_specs,
+)
+from services.opcodes.batch import BatchRunner, load_script
+from services.opcodes.schema import DEFAULT_SPEC_PATH
+
+
+def main(args: argparse.Namespace) -> int:
+    # Setup logging output to stdout
+    logging.getLogger().addHandler(logging.StreamHandler(sys.stdout))
+    logging.getLogger().setLevel(logging.WARNING)
+
+    steps = load_script(args.script)
+    specs = load_opcode_specs(args.spec)
+
+    # Initialize BLE driver
+    nrf = Ble.CentralBleDriver(
+        log_severity_level=logging.WARNING,
+        driver_log_severity_level=logging.WARNING,
+        rcp_log_severity_level=NordicDriver.RpcLogSeverity.info,
+        dispatcher=Ble.DispatchExecutor(max_workers=2),
+    )
+    nrf.open(com=args.com_port, auto_flash=True)
+    if nrf.adapter is None:
+        print(f"Failed to connect to Nordic device on {args.com_port}.")
+        return 2
+
+    svc_opcodes = OpCodesService(nrf=nrf)
+    nrf.add_service_handler(svc_opcodes)
+    opcodes = build_opcodes(
+        opcode_tx_char=svc_opcodes.characteristics[OpCodesTxCharacteristic.uuid.value],
+        opcode_rx_char=svc_opcodes.characteristics[OpCodesRxCharacteristic.uuid.value],
+        specs=specs,
+        log_severity_level=logging.WARNING,
+    )
+
+    try:
+        nrf.connect(target_mac_address=args.mac_address)
+        if nrf.conn_handle is None:
+            print(f"Failed to connect to 0x{args.mac_address}.")
+            return 2
+
+        svc_opcodes.characteristics[OpCodesRxCharacteristic.uuid.value].enable_notification()
+        results = BatchRunner(opcodes=opcodes, max_in_flight=args.max_in_flight).run(steps)
+    finally:
+        nrf.close()
+
+    if args.json:
+        print(json.dumps([r.to_dict() for r in results], indent=2))
+    else:
+        patt = "{:<6} {:<16} {:<6} {:>12}  {}\n"
+        sys.stdout.write(patt.format("Step", "OpCode", "Result", "Latency (ms)", "Details"))
+        for r in results:
+            latency = "-" if r.latency_s is None else f"{r.latency_s * 1000:.2f}"
+            details = r.error or (", ".join(f"{k}: expected {e} got {a}" for k, (e, a) in r.mismatches.items()))
+            sys.stdout.write(patt.format(r.index, r.opcode, "PASS" if r.passed else "FAIL", latency, details))
+
+    return 0 if all(r.passed for r in results) else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Connect to a peripheral and run a script of opcode invocations, reporting per-step latency and "
+        "pass/fail. Exits with 0 when every step passed, 1 when a step failed and 2 on connection errors."
+    )
+    parser.add_argument(
+        "com_port",
+        type=str,
+        help="Central BLE NRF52 dev kit's COM port (ex. Windows: COMx, Linux: /dev/ttyACMx)",
+    )
+    parser.add_argument("mac_address", type=str, help="Peripheral BLE mac address to connect to")
+    parser.add_argument("script", type=str, help="Opcode script file (JSON, or YAML with PyYAML installed)")
+    parser.add_argument(
+        "--spec",
+        dest="spec",
+        type=str,
+        default=DEFAULT_SPEC_PATH,
+        help="Opcode spec file (default: services/opcodes/opcodes.json)",
+    )
+    parser.add_argument(
+        "--max-in-flight",
+        dest="max_in_flight",
+        type=int,
+        default=8,
+        help="Maximum number of opcodes written without a received response (default: 8)",
+    )
+    parser.add_argument("--json", dest="json", action="store_true", help="Output the result vector as JSON")
+
+    sys.exit(main(parser.parse_args()))
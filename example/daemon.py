@@ -0,0 +1,66 @@
+import argparse
+import logging
+import sys
+
+import nordic_central_ble_wrapper as Ble  # needs to come before ble_driver import to set the config type
+from pc_ble_driver_py import ble_driver as NordicDriver
+
+
+DEFAULT_SOCKET_PATH = "/tmp/nordic_central_ble.sock"
+
+
+def main(args: argparse.Namespace):
+    # Setup logging output to stdout
+    logging.getLogger().addHandler(logging.StreamHandler(sys.stdout))
+    logging.getLogger().setLevel(logging.INFO)
+
+    # Open every requested adapter once, the daemon keeps them (and their connections) alive between clients
+    drivers = []
+    for com_port in args.com_ports:
+        nrf = Ble.CentralBleDriver(
+            log_severity_level=logging.INFO,
+            driver_log_severity_level=logging.INFO,
+            rcp_log_severity_level=NordicDriver.RpcLogSeverity.info,
+        )
+        nrf.open(com=com_port, auto_flash=True)
+        if nrf.adapter is None:
+            print(f"Failed to connect to Nordic device on {com_port}.")
+            print("Detectable Nordic devices:")
+            print(nrf.enumerate_ports())
+            sys.exit(1)
+        drivers.append(nrf)
+
+    server = Ble.BleDaemon(socket_path=args.socket, drivers=drivers)
+    logging.info(f"Serving {len(drivers)} adapter(s) on {args.socket}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        for nrf in drivers:
+            nrf.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Keep one or more NRF52 dev kit central devices open and expose scan/connect/read/write/opcode/"
+        "subscribe over a Unix-domain socket. Adapters are addressed by their position in the COM port list."
+    )
+    parser.add_argument(
+        "com_ports",
+        type=str,
+        nargs="+",
+        help="Central BLE NRF52 dev kit's COM port(s) (ex. Windows: COMx, Linux: /dev/ttyACMx)",
+    )
+    parser.add_argument(
+        "-s",
+        "--socket",
+        dest="socket",
+        type=str,
+        default=DEFAULT_SOCKET_PATH,
+        help=f"Unix-domain socket path to listen on (default: {DEFAULT_SOCKET_PATH})",
+    )
+
+    main(parser.parse_args())
+    sys.exit(0)
@@ -0,0 +1,152 @@
+import argparse
+import json
+import logging
+import sys
+
+import nordic_central_ble_wrapper as Ble  # needs to come before ble_driver import to set the config type
+from pc_ble_driver_py import ble_driver as NordicDriver
+
+from services import uuids
+from services.device_information import DeviceInformationService
+from services.opcodes import (
+    OpCodesService,
+    OpCodesTxCharacteristic,
+    OpCodesRxCharacteristic,
+    build_opcodes,
+    load_opcode_specs,
+)
+from services.opcodes.batch import BatchRunner, BatchStep, load_script
+from services.opcodes.schema import DEFAULT_SPEC_PATH
+
+
+class ProductionTestPlan:
+    """Per-device production flow: read the DIS, then run an opcode script"""
+
+    def __init__(self, steps: list[BatchStep], spec_path: str = DEFAULT_SPEC_PATH):
+        self.steps = steps
+        self.specs = load_opcode_specs(spec_path)
+        self._adapters = dict()  # type: dict[int, tuple[DeviceInformationService, OpCodesService, BatchRunner]]
+
+    def _services(self, nrf: Ble.CentralBleDriver) -> tuple[DeviceInformationService, OpCodesService, BatchRunner]:
+        # Service handlers are created once per adapter and reused for every device it tests
+        if id(nrf) not in self._adapters:
+            svc_dis = DeviceInformationService(nrf=nrf)
+            nrf.add_service_handler(svc_dis)
+
+            svc_opcodes = OpCodesService(nrf=nrf)
+            nrf.add_service_handler(svc_opcodes)
+
+            opcodes = build_opcodes(
+                opcode_tx_char=svc_opcodes.characteristics[OpCodesTxCharacteristic.uuid.value],
+                opcode_rx_char=svc_opcodes.characteristics[OpCodesRxCharacteristic.uuid.value],
+                specs=self.specs,
+                log_severity_level=logging.WARNING,
+            )
+            self._adapters[id(nrf)] = (svc_dis, svc_opcodes, BatchRunner(opcodes=opcodes))
+
+        return self._adapters[id(nrf)]
+
+    def __call__(self, nrf: Ble.CentralBleDriver, address: str) -> dict:
+        svc_dis, svc_opcodes, runner = self._services(nrf)
+
+        dis = {
+            "manufacturer": svc_dis.characteristics[uuids.DIS_MANUFACTURE_NAME_CUUID.value].read(),
+            "model": svc_dis.characteristics[uuids.DIS_MODEL_NAME_CUUID.value].read(),
+            "serial_number": svc_dis.characteristics[uuids.DIS_SERIAL_NUMBER_CUUID.value].read(),
+            "firmware_revision": svc_dis.characteristics[uuids.DIS_FIRMWARE_REVISION_CUUID.value].read(),
+            "hardware_revision": svc_dis.characteristics[uuids.DIS_HARDWARE_REVISION_CUUID.value].read(),
+            "software_revision": svc_dis.characteristics[uuids.DIS_SOFTWARE_REVISION_CUUID.value].read(),
+        }
+
+        svc_opcodes.characteristics[OpCodesRxCharacteristic.uuid.value].enable_notification()
+        results = runner.run(self.steps)
+
+        failed = [r for r in results if not r.passed]
+        if failed:
+            raise AssertionError(f"{len(failed)}/{len(results)} opcode steps failed (first: step {failed[0].index})")
+
+        return {"dis": dis, "steps": [r.to_dict() for r in results]}
+
+
+def main(args: argparse.Namespace) -> int:
+    # Setup logging output to stderr, results are streamed to stdout as JSON lines
+    logging.getLogger().addHandler(logging.StreamHandler(sys.stderr))
+    logging.getLogger().setLevel(logging.WARNING)
+
+    runner = Ble.FleetRunner(
+        ports=args.com_ports,
+        test_plan=ProductionTestPlan(steps=load_script(args.script), spec_path=args.spec),
+        retries=args.retries,
+        driver_factory=lambda: Ble.CentralBleDriver(
+            log_severity_level=logging.WARNING,
+            driver_log_severity_level=logging.WARNING,
+            rcp_log_severity_level=NordicDriver.RpcLogSeverity.info,
+            dispatcher=Ble.DispatchExecutor(max_workers=2),
+        ),
+        open_kwargs={"auto_flash": True},
+    )
+
+    addresses = list(args.mac_addresses)
+    if args.name_prefix is not None:
+        addresses += runner.discover(lambda addr, data: data.get("name", "").startswith(args.name_prefix))
+
+    passed = 0
+    for result in runner.run(addresses):
+        passed += result.passed
+        print(
+            json.dumps(
+                {
+                    "address": result.address,
+                    "passed": result.passed,
+                    "attempts": result.attempts,
+                    "port": result.port,
+                    "duration_s": round(result.duration_s, 3),
+                    "result": result.result,
+                    "error": result.error,
+                }
+            ),
+            flush=True,
+        )
+
+    logging.warning(f"{passed}/{len(addresses)} devices passed")
+    return 0 if passed == len(addresses) else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Run the production test plan (DIS read + opcode script) on many peripherals in parallel, one "
+        "device per adapter at a time. Per-device results are streamed to stdout as JSON lines as they finish."
+    )
+    parser.add_argument(
+        "com_ports",
+        type=str,
+        nargs="+",
+        help="Central BLE NRF52 dev kit COM ports (ex. Windows: COMx, Linux: /dev/ttyACMx)",
+    )
+    parser.add_argument("-s", "--script", dest="script", type=str, required=True, help="Opcode script file")
+    parser.add_argument(
+        "-m",
+        "--mac-address",
+        dest="mac_addresses",
+        type=str,
+        action="append",
+        default=[],
+        help="Peripheral BLE mac address to test, may be repeated",
+    )
+    parser.add_argument(
+        "-n",
+        "--name-prefix",
+        dest="name_prefix",
+        type=str,
+        help="Scan on the first adapter and also test every advertiser whose name starts with the prefix",
+    )
+    parser.add_argument("-r", "--retries", dest="retries", type=int, default=1, help="Retries per failed device")
+    parser.add_argument(
+        "--spec",
+        dest="spec",
+        type=str,
+        default=DEFAULT_SPEC_PATH,
+        help="Opcode spec file (default: services/opcodes/opcodes.json)",
+    )
+
+    sys.exit(main(parser.parse_args()))
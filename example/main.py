@@ -13,8 +13,8 @@ from services.opcodes import (
     OpCodesService,
     OpCodesTxCharacteristic,
     OpCodesRxCharacteristic,
+    build_opcodes,
 )
-from services.opcodes.handlers import *
 
 
 TARGET_MAC_ADDRESS = "FCAE017C78CE"
@@ -30,6 +30,7 @@ def main(args: argparse.Namespace):
         log_severity_level=logging.INFO,
         driver_log_severity_level=logging.INFO,
         rcp_log_severity_level=NordicDriver.RpcLogSeverity.info,
+        dispatcher=Ble.DispatchExecutor(max_workers=2),  # keep opcode handlers off the driver's event thread
     )
     try:
         nrf.open(com=args.com_port, auto_flash=True)
@@ -55,25 +56,13 @@ def connect(nrf: Ble.CentralBleDriver, target_mac_address: str):
     opcode_rx_char = svc_opcodes.characteristics[OpCodesRxCharacteristic.uuid.value]
     nrf.add_service_handler(svc_opcodes)
 
-    # Create an OpCode dictionary object for calling opcodes by a string
+    # Create an OpCode dictionary object for calling opcodes by a string, built from the declarative opcode spec
     opcode_dict = UserDict(
-        {
-            "ping": PingOpCode(
-                opcode_tx_char=opcode_tx_char,
-                opcode_rx_char=opcode_rx_char,
-                log_severity_level=logging.DEBUG,
-            ),
-            "counter": CounterOpCode(
-                opcode_tx_char=opcode_tx_char,
-                opcode_rx_char=opcode_rx_char,
-                log_severity_level=logging.DEBUG,
-            ),
-            "delay": DelayOpCode(
-                opcode_tx_char=opcode_tx_char,
-                opcode_rx_char=opcode_rx_char,
-                log_severity_level=logging.DEBUG,
-            ),
-        }
+        build_opcodes(
+            opcode_tx_char=opcode_tx_char,
+            opcode_rx_char=opcode_rx_char,
+            log_severity_level=logging.DEBUG,
+        )
     )
 
     # Connect ot targeted BLE peripheral
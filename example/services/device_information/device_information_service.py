@@ -30,12 +30,16 @@ class DeviceInformationService(Ble.Service):
     one or more of the characteristics in @ref DeviceInformationService.characteristics.
     """
 
-    def __init__(self, nrf: Ble.CentralBleDriver):
+    def __init__(self, nrf: Ble.CentralBleDriver, cache: Ble.StaticValueCache | None = None):
         """Initialize service object for reading and storing values from the DIS
 
         :param nrf: Central BLE Driver object used for BLE READ operations
+        :param cache: optional cache of the static DIS values, keyed by peer address and firmware revision
         """
-        super().__init__(nrf=nrf)
+        super().__init__(nrf=nrf, cache=cache)
+
+        self._cache_key = None  # type: (tuple[str, str] | None)
+        self._cache_key_connection = None  # type: (int | None)
 
         self.uuid = UUID.DIS_SUUID
 
@@ -52,3 +56,21 @@ class DeviceInformationService(Ble.Service):
             ),
             PNPIDCharacteristic.uuid.value: PNPIDCharacteristic(nrf=self.nrf, service=self),
         }  # type: dict[NordicDriver.BLEUUID, Ble.Characteristic]
+
+    def cache_key(self) -> tuple[str, str] | None:
+        """Cache key prefix (peer address, firmware revision) of the connected peer
+
+        The Firmware Revision characteristic is read over the air once per connection, since it is what invalidates
+        every other cached DIS value when the peer is updated.
+
+        :return: Key prefix, None when not connected or the firmware revision can't be read
+        """
+        if self.nrf.peer_addr is None:
+            return None
+
+        if self._cache_key_connection != self.nrf.connection_count:
+            self._cache_key_connection = self.nrf.connection_count
+            revision = self.characteristics[FirmwareRevisionCharacteristic.uuid.value].read()
+            self._cache_key = None if revision is None else (self.nrf.peer_addr, revision)
+
+        return self._cache_key
@@ -15,6 +15,7 @@ class HardwareRevisionCharacteristic(Ble.Characteristic):
     """Hardware Revision characteristic handling"""
 
     uuid = uuids.DIS_HARDWARE_REVISION_CUUID
+    static = True
 
     def __init__(self, nrf: Ble.CentralBleDriver, service: Ble.Service):
         """Initialize characteristic object for reading and storing values from the DIS characteristic
@@ -20,6 +20,7 @@ class IEEERegulatoryCertificationDataList(Ble.Characteristic):
     """
 
     uuid = uuids.DIS_IEEE_REGULATORY_CERTIFICATION_DATA_LIST_CUUID
+    static = True
 
     def __init__(self, nrf: Ble.CentralBleDriver, service: Ble.Service):
         """Initialize characteristic object for reading and storing values from the DIS characteristic
@@ -18,6 +18,7 @@ class ManufactureNameCharacteristic(Ble.Characteristic):
     """
 
     uuid = uuids.DIS_MANUFACTURE_NAME_CUUID
+    static = True
 
     def __init__(self, nrf: Ble.CentralBleDriver, service: Ble.Service):
         """Initialize characteristic object for reading and storing values from the DIS characteristic
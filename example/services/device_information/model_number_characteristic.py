@@ -19,6 +19,7 @@ class ModelNumberCharacteristic(Ble.Characteristic):
     """
 
     uuid = uuids.DIS_MODEL_NAME_CUUID
+    static = True
 
     def __init__(self, nrf: Ble.CentralBleDriver, service: Ble.Service):
         """Initialize characteristic object for reading and storing values from the DIS characteristic
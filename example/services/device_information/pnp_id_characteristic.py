@@ -80,6 +80,7 @@ class PNPIDCharacteristic(Ble.Characteristic):
     """
 
     uuid = NordicDriver.BLEUUID(0x2A50)
+    static = True
 
     def __init__(self, nrf: Ble.CentralBleDriver, service: Ble.Service):
         """Initialize characteristic object for reading and storing values from the DIS characteristic
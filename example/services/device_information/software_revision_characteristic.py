@@ -18,6 +18,7 @@ class SoftwareRevisionCharacteristic(Ble.Characteristic):
     """
 
     uuid = uuids.DIS_SOFTWARE_REVISION_CUUID
+    static = True
 
     def __init__(self, nrf: Ble.CentralBleDriver, service: Ble.Service):
         """Initialize characteristic object for reading and storing values from the DIS characteristic
@@ -20,6 +20,7 @@ class SystemIDCharacteristic(Ble.Characteristic):
     """
 
     uuid = uuids.DIS_SYSTEM_ID_CUUID
+    static = True
 
     def __init__(self, nrf: Ble.CentralBleDriver, service: Ble.Service):
         """Initialize characteristic object for reading and storing values from the DIS characteristic
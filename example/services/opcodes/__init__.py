@@ -9,3 +9,9 @@ from . import handlers
 
 # Misc
 from .opcode import OpCode
+from .timeouts import RetryPolicy, RttEstimator
+from .coalescer import OpCodeCoalescer
+from .stream import OpCodeStream
+
+# Declarative opcode definitions
+from .schema import OpCodeSpec, SchemaOpCode, load_opcode_specs, build_opcodes
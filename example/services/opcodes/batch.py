@@ -0,0 +1,186 @@
+#!/usr/bin/env python3.10
+# -*- coding: utf-8 -*-
+
+"""
+Opcode script/batch runner
+
+A script is a JSON (or YAML, when PyYAML is installed) list of steps, optionally wrapped as {"steps": [...]}:
+
+    [
+        {"opcode": "ping"},
+        {"opcode": "counter", "expect": {"count": 1}},
+        {"opcode": "delay", "sync": true},
+        {"opcode": "set_led", "args": {"led": 1, "on": true}}
+    ]
+
+Steps are pipelined: each step is written without waiting for the previous responses, up to max_in_flight
+outstanding steps. A step with "sync": true waits for every outstanding response before it is written, for steps that
+depend on the peripheral having finished the previous ones.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import struct
+import time
+
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any
+
+from services.opcodes.schema import SchemaOpCode
+
+
+@dataclass(frozen=True, slots=True)
+class BatchStep:
+    """Single opcode invocation of a script"""
+
+    opcode: str
+    args: tuple | dict = ()
+    expect: dict[str, Any] | None = None
+    sync: bool = False
+
+    @classmethod
+    def from_dict(cls, d: dict[str, Any]) -> BatchStep:
+        args = d.get("args", ())
+        return cls(
+            opcode=d["opcode"],
+            args=args if isinstance(args, dict) else tuple(args),
+            expect=d.get("expect"),
+            sync=bool(d.get("sync", False)),
+        )
+
+
+@dataclass(slots=True)
+class StepResult:
+    """Result of a single script step"""
+
+    index: int
+    opcode: str
+    passed: bool = False
+    latency_s: float | None = None
+    response: Any = None
+    error: str | None = None
+    mismatches: dict[str, tuple[Any, Any]] = field(default_factory=dict)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "index": self.index,
+            "opcode": self.opcode,
+            "passed": self.passed,
+            "latency_s": self.latency_s,
+            "response": None if self.response is None else repr(self.response),
+            "error": self.error,
+            "mismatches": {k: list(v) for k, v in self.mismatches.items()},
+        }
+
+
+def load_script(path: str) -> list[BatchStep]:
+    """Load a batch script file
+
+    :param path: script file path
+    :return: List of script steps
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        if os.path.splitext(path)[1].lower() in (".yaml", ".yml"):
+            import yaml  # optional dependency, only needed for YAML scripts
+
+            script = yaml.safe_load(f)
+        else:
+            script = json.load(f)
+
+    if isinstance(script, dict):
+        script = script["steps"]
+
+    return [BatchStep.from_dict(step) for step in script]
+
+
+class BatchRunner:
+    """Run scripts of opcode invocations with pipelined execution"""
+
+    def __init__(self, opcodes: dict[str, SchemaOpCode], max_in_flight: int = 8):
+        """Initialize batch runner
+
+        :param opcodes: opcode objects keyed by the names used in scripts
+        :param max_in_flight: maximum number of steps written without a received response
+        """
+        assert max_in_flight > 0, "At least a single step must be allowed in flight."
+
+        self.opcodes = opcodes
+        self.max_in_flight = max_in_flight
+
+    def run(self, steps: list[BatchStep]) -> list[StepResult]:
+        """Run script steps
+
+        :param steps: script steps
+        :return: Result vector, one result per step in script order
+        """
+        unknown = {step.opcode for step in steps} - self.opcodes.keys()
+        assert not unknown, f"Unknown opcode(s) in script: {', '.join(sorted(unknown))}"
+
+        # Late responses of an earlier run (possibly to another device) would be taken for the first responses here
+        for name in {step.opcode for step in steps}:
+            self.opcodes[name].discard_late_responses()
+
+        results = [StepResult(index=i, opcode=step.opcode) for i, step in enumerate(steps)]
+        in_flight = deque()  # type: deque[tuple[int, SchemaOpCode, float]]
+
+        for i, step in enumerate(steps):
+            if step.sync:
+                while in_flight:
+                    self._complete(steps, results, *in_flight.popleft())
+            elif len(in_flight) >= self.max_in_flight:
+                self._complete(steps, results, *in_flight.popleft())
+
+            opcode = self.opcodes[step.opcode]
+            try:
+                if isinstance(step.args, dict):
+                    data = opcode.spec.encode(**step.args)
+                else:
+                    data = opcode.spec.encode(*step.args)
+                t_tx = time.perf_counter()
+                opcode.send(data)
+            except Exception as e:
+                results[i].error = f"{e.__class__.__name__}: {e}"
+                continue
+
+            in_flight.append((i, opcode, t_tx))
+
+        while in_flight:
+            self._complete(steps, results, *in_flight.popleft())
+
+        return results
+
+    @staticmethod
+    def _complete(
+        steps: list[BatchStep], results: list[StepResult], index: int, opcode: SchemaOpCode, t_tx: float
+    ) -> None:
+        result = results[index]
+
+        try:
+            resp = opcode.receive(timeout=opcode.resp_timeout_s - (time.perf_counter() - t_tx))
+        except Exception as e:
+            result.error = f"{e.__class__.__name__}: {e}"
+            return
+
+        if resp is None:
+            result.error = "No response received for opcode 0x{:02X}".format(opcode.opcode)
+            return
+
+        t_rx, rx_data = resp
+        result.latency_s = t_rx - t_tx
+
+        try:
+            result.response = opcode.spec.decode(rx_data)
+        except struct.error as e:
+            result.error = f"Failed to parse response data: {e}"
+            return
+
+        expect = steps[index].expect or dict()
+        for name, expected in expect.items():
+            actual = getattr(result.response, name, None)
+            if actual != expected:
+                result.mismatches[name] = (expected, actual)
+
+        result.passed = result.response.valid and not result.mismatches
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3.10
+# -*- coding: utf-8 -*-
+
+"""
+Opt-in coalescing of opcode writes into framed batches
+
+For peripherals supporting framed batches, opcode writes issued within a short window are sent as a single ATT write:
+
+    batch = BATCH_OPCODE, then per opcode: frame length (u8, opcode and data), opcode, data
+
+A batch holding a single opcode is written as the plain opcode write. The peripheral answers with notifications in
+the same framing, split back into the individual opcode responses by OpCodesRxCharacteristic.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+
+from typing import TYPE_CHECKING, Callable, Iterator
+
+from pc_ble_driver_py import ble_adapter as NordicAdapter
+from pc_ble_driver_py import ble_driver as NordicDriver
+
+if TYPE_CHECKING:
+    from services.opcodes import OpCodesTxCharacteristic
+
+logger = logging.getLogger(__name__)
+
+# Called with the error of a failed batch write, for every opcode of the batch
+TErrorCallback = Callable[[Exception], None]
+
+BATCH_OPCODE = 0xFF
+ATT_WRITE_HEADER_LEN = 3  # ATT opcode and attribute handle
+DEFAULT_ATT_MTU = 23
+
+
+def encode_batch(frames: list[tuple[int, bytes]]) -> bytes:
+    """Frame opcode writes as a batch
+
+    :param frames: (opcode, data) tuples
+    :return: Batch payload, or the plain opcode write for a single frame
+    """
+    if len(frames) == 1:
+        opcode, data = frames[0]
+        return bytes([opcode]) + data
+    return bytes([BATCH_OPCODE]) + b"".join(bytes([len(data) + 1, opcode]) + data for opcode, data in frames)
+
+
+def iter_batch(payload: bytes) -> Iterator[tuple[int, bytes]]:
+    """Split a batch (without its BATCH_OPCODE marker) into (opcode, data) tuples
+
+    :param payload: framed opcodes
+    :return: Iterator of (opcode, data) tuples, a truncated last frame is dropped
+    """
+    offset = 0
+    while offset < len(payload):
+        length = payload[offset]
+        frame = payload[offset + 1 : offset + 1 + length]
+        if length == 0 or len(frame) < length:
+            logger.error(f"Malformed opcode batch frame at offset {offset}: {payload.hex(sep=':')}")
+            return
+        yield frame[0], frame[1:]
+        offset += 1 + length
+
+
+class OpCodeCoalescer:
+    """Gather opcode writes into framed batches, written by a background thread
+
+    A batch is written window_s after its first opcode was queued, or as soon as the next opcode wouldn't fit in a
+    single ATT write (negotiated MTU minus the ATT header). Batches are written in order, so opcodes reach the
+    peripheral in the order they were queued. Writing is asynchronous: callers wait for the opcode responses, and a
+    batch write that fails or is rejected by the peripheral is logged and reported to the error callback of each of
+    its opcodes.
+    """
+
+    def __init__(
+        self,
+        tx_char: OpCodesTxCharacteristic,
+        window_s: float = 0.005,
+        max_payload: int | None = None,
+        write_command: bool = False,
+    ) -> None:
+        """Initialize coalescer
+
+        :param tx_char: Tx characteristic the batches are written to
+        :param window_s: maximum time an opcode waits for others to join its batch
+        :param max_payload: maximum batch payload, defaults to the negotiated ATT MTU minus the ATT header
+        :param write_command: write batches as GATT WRITE_CMD instead of WRITE_REQ
+        """
+        self.tx_char = tx_char
+        self.window_s = window_s
+        self.max_payload = max_payload
+        self.write_command = write_command
+
+        self.batches = 0
+        self.opcodes = 0
+        self.errors = 0
+
+        self._cond = threading.Condition()
+        self._frames = list()  # type: list[tuple[int, bytes]]
+        self._on_error = list()  # type: list[TErrorCallback | None]
+        self._size = 1  # batch payload length including BATCH_OPCODE
+        self._first_t = None  # type: (float | None)
+        self._full = False
+        self._closed = False
+        self._idle = threading.Event()
+        self._idle.set()
+        self._thread = threading.Thread(target=self._run, name="OpCodeCoalescer", daemon=True)
+        self._thread.start()
+
+    def payload_limit(self) -> int:
+        """Maximum batch payload length in bytes"""
+        if self.max_payload is not None:
+            return self.max_payload
+        return (self.tx_char.nrf.actual_att_mtu or DEFAULT_ATT_MTU) - ATT_WRITE_HEADER_LEN
+
+    def write(self, opcode: int, data: bytes, on_error: TErrorCallback | None = None) -> None:
+        """Queue an opcode write
+
+        :param opcode: opcode, BATCH_OPCODE is reserved
+        :param data: opcode data
+        :param on_error: called from the writer thread with the error if the batch write fails
+        """
+        assert opcode != BATCH_OPCODE, "OpCode 0x{:02X} is reserved for batches.".format(BATCH_OPCODE)
+
+        frame_len = 2 + len(data)
+        with self._cond:
+            assert not self._closed, "Coalescer is closed."
+            if self._frames and self._size + frame_len > self.payload_limit():
+                # Hand the full batch to the writer thread before starting the next one
+                self._full = True
+                self._cond.notify_all()
+                while self._frames and not self._closed:
+                    self._cond.wait()
+
+            if not self._frames:
+                self._first_t = time.monotonic()
+                self._idle.clear()
+            self._frames.append((opcode, bytes(data)))
+            self._on_error.append(on_error)
+            self._size += frame_len
+            self._cond.notify_all()
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Write the pending batch now and wait until it was written
+
+        :param timeout: maximum time to wait in seconds
+        :return: Boolean indicating if every queued opcode was written
+        """
+        with self._cond:
+            if self._frames:
+                self._full = True
+                self._cond.notify_all()
+        return self._idle.wait(timeout)
+
+    def close(self) -> None:
+        """Write the pending batch and stop the writer thread"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._frames and not self._closed:
+                    self._cond.wait()
+                if not self._frames:
+                    return
+
+                while not self._full and not self._closed:
+                    remaining = self._first_t + self.window_s - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+
+                frames, on_error = self._frames, self._on_error
+                self._frames, self._on_error = list(), list()
+                self._size = 1
+                self._full = False
+                self._cond.notify_all()
+
+            self._write(frames, on_error)
+            with self._cond:
+                if not self._frames:
+                    self._idle.set()
+
+    def _write(self, frames: list[tuple[int, bytes]], on_error: list[TErrorCallback | None]) -> None:
+        payload = encode_batch(frames)
+        what = "batch of opcodes {}".format(", ".join("0x{:02X}".format(op) for op, _ in frames))
+
+        error = None
+        try:
+            if self.write_command:
+                self.tx_char.write_command(payload=payload)
+            else:
+                # Characteristic.write_request() drops the GATT status, a rejected write must fail its opcodes
+                status = self.tx_char.nrf.characteristic_write_request(
+                    characteristic=self.tx_char.uuid, payload=payload, priority=self.tx_char.priority
+                )
+                if status != NordicDriver.BLEGattStatusCode.success:
+                    logger.error(f"Peripheral rejected {what}: {status}")
+                    error = NordicAdapter.NordicSemiException(f"Writing {what} failed: {status}")
+        except Exception as e:
+            logger.exception(f"Failed writing {what}")
+            error = NordicAdapter.NordicSemiException(f"Writing {what} failed: {e}")
+
+        if error is not None:
+            self.errors += 1
+            for callback in on_error:
+                if callback is not None:
+                    callback(error)
+            return
+
+        self.batches += 1
+        self.opcodes += len(frames)
@@ -7,11 +7,13 @@ Ping opcode handling
 
 import logging
 
+import nordic_central_ble_wrapper as Ble
 from services.opcodes import OpCodesRxCharacteristic, OpCodesTxCharacteristic
 from services.opcodes.opcode import OpCode
 
 
 class PingOpCode(OpCode):
+    IDEMPOTENT = True
 
     def __init__(
         self,
@@ -27,5 +29,5 @@ class PingOpCode(OpCode):
             log_severity_level=log_severity_level,
         )
 
-    def write(self) -> None:
-        self._write()
+    def write(self, deadline: Ble.Deadline | None = None) -> None:
+        self._write(deadline=deadline)
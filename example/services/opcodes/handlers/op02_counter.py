@@ -10,6 +10,7 @@ from __future__ import annotations
 import logging
 import struct
 
+import nordic_central_ble_wrapper as Ble
 from services.opcodes import OpCodesRxCharacteristic, OpCodesTxCharacteristic
 from services.opcodes.opcode import OpCode
 
@@ -42,12 +43,12 @@ class CounterOpCode(OpCode):
             opcode_tx_char=opcode_tx_char,
             opcode_rx_char=opcode_rx_char,
             opcode=0x02,
-            resp_data_len=4,
+            resp_data_len=2,
             log_severity_level=log_severity_level,
         )
 
-    def write(self) -> CounterRxData:
-        resp_data = self._write()
+    def write(self, deadline: Ble.Deadline | None = None) -> CounterRxData:
+        resp_data = self._write(deadline=deadline)
 
         try:
             return CounterRxData.parse_bytes(resp_data)
@@ -9,6 +9,7 @@ from __future__ import annotations
 
 import logging
 
+import nordic_central_ble_wrapper as Ble
 from services.opcodes import OpCodesRxCharacteristic, OpCodesTxCharacteristic
 from services.opcodes.opcode import OpCode
 
@@ -29,5 +30,5 @@ class DelayOpCode(OpCode):
             log_severity_level=log_severity_level,
         )
 
-    def write(self) -> None:
-        self._write()
+    def write(self, deadline: Ble.Deadline | None = None) -> None:
+        self._write(deadline=deadline)
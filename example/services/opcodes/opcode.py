@@ -5,16 +5,30 @@
 Generic opcode object handling
 """
 
+from __future__ import annotations
+
 import logging
+import time
 from queue import Queue, Empty
 
+import nordic_central_ble_wrapper as Ble
 from services.opcodes import OpCodesTxCharacteristic, OpCodesRxCharacteristic
+from services.opcodes.timeouts import RetryPolicy, RttEstimator
 
 
 class OpCode:
-    """Generic OpCode object for generating opcode commands with simple handling"""
+    """Generic OpCode object for generating opcode commands with simple handling
+
+    Idempotent opcodes retry a missed response according to their retry policy, their response timeout adapting to
+    the observed round trip time between RESP_TIMEOUT_FLOOR_S and the configured response timeout (the timeout used
+    until the first response). Any other opcode is written exactly once and, since a late response can't be made up
+    for by a retry, keeps the configured response timeout unless given an explicit floor.
+    """
 
     RESP_TIMEOUT_S = 10
+    RESP_TIMEOUT_FLOOR_S = 0.1
+    IDEMPOTENT = False
+    RETRY_POLICY = RetryPolicy(attempts=3)  # default retry policy of idempotent opcodes
 
     def __init__(
         self,
@@ -23,6 +37,10 @@ class OpCode:
         opcode: int,
         resp_data_len: int,
         log_severity_level: int = logging.DEBUG,
+        resp_timeout_s: float | None = None,
+        resp_timeout_floor_s: float | None = None,
+        idempotent: bool | None = None,
+        retry: RetryPolicy | None = None,
     ):
         """Initialize OpCode object
 
@@ -31,6 +49,12 @@ class OpCode:
         :param opcode: op code object controls
         :param resp_data_len: expected response data length
         :param log_severity_level: logging level
+        :param resp_timeout_s: maximum (and initial) response timeout, defaults to RESP_TIMEOUT_S. Callers needing an
+                               overall budget pass a Ble.Deadline to write(), which bounds this timeout further.
+        :param resp_timeout_floor_s: minimum adaptive response timeout, defaults to RESP_TIMEOUT_FLOOR_S for idempotent
+                                     opcodes and to resp_timeout_s (no adaptation) for the others
+        :param idempotent: writing the opcode twice has the same effect as writing it once, defaults to IDEMPOTENT
+        :param retry: retry policy, only allowed for idempotent opcodes, defaults to RETRY_POLICY for them
         """
         assert 0x00 <= opcode <= 0xFF, "OpCode is a single-byte. Must be between 0x00 and 0xFF."
         assert resp_data_len < 20, "Data length must be less than 20 to adhere to MTU size."
@@ -42,17 +66,92 @@ class OpCode:
         self.opcode_rx_char = opcode_rx_char
         self.opcode = opcode
         self.resp_data_len = resp_data_len
+        self.resp_timeout_s = self.RESP_TIMEOUT_S if resp_timeout_s is None else resp_timeout_s
+
+        self.idempotent = self.IDEMPOTENT if idempotent is None else idempotent
+        self.retry = retry if retry is not None else self.RETRY_POLICY if self.idempotent else RetryPolicy()
+        assert self.idempotent or self.retry.attempts == 1, "Only idempotent opcodes can be retried."
+
+        if resp_timeout_floor_s is not None:
+            floor_s = resp_timeout_floor_s
+        else:
+            floor_s = self.RESP_TIMEOUT_FLOOR_S if self.idempotent else self.resp_timeout_s
+        self.rtt = RttEstimator(floor_s=min(floor_s, self.resp_timeout_s), ceiling_s=self.resp_timeout_s)
 
         self.opcode_rx_char.add_opcode_handler(self.opcode, self.write_cb)
         self._resp_q = Queue()
 
-    def _write(self, data: bytes = bytes()):
-        self.opcode_tx_char.write(self.opcode, data)
-        try:
-            rx_data: bytes = self._resp_q.get(timeout=self.RESP_TIMEOUT_S)
-        except Empty:
+    @property
+    def timeout_s(self) -> float:
+        """Current adaptive response timeout in seconds"""
+        return self.rtt.timeout()
+
+    def send(self, data: bytes = bytes(), deadline: Ble.Deadline | None = None) -> None:
+        """Write the opcode without waiting for its response, see receive()"""
+        self.opcode_tx_char.write(self.opcode, data, deadline=deadline, on_error=self._write_failed)
+
+    def receive(self, timeout: float | None = None, deadline: Ble.Deadline | None = None) -> tuple[float, bytes] | None:
+        """Wait for the next response of the opcode. Responses are returned in arrival order.
+
+        :param timeout: maximum time to wait in seconds, defaults to the opcode's adaptive response timeout
+        :param deadline: overall deadline also bounding the wait. With a deadline, a missing response raises
+                         DeadlineExceeded (or Cancelled) instead of returning None.
+        :return: Tuple (time.perf_counter() timestamp of the notification, response data), None on timeout
+        :raises NordicSemiException: the coalesced write of the opcode failed
+        """
+        timeout = self.timeout_s if timeout is None else max(0.0, timeout)
+
+        if deadline is not None:
+            resp = deadline.get(self._resp_q, timeout=timeout, what="opcode 0x{:02X} response".format(self.opcode))
+        else:
+            try:
+                resp = self._resp_q.get(timeout=timeout)
+            except Empty:
+                return None
+
+        if isinstance(resp[1], Exception):
+            raise resp[1]
+        return resp
+
+    def _write(self, data: bytes = bytes(), deadline: Ble.Deadline | None = None):
+        # Responses still queued arrived after their write timed out, they don't answer this write
+        self.discard_late_responses()
+
+        resp = None
+        for attempt in range(1, self.retry.attempts + 1):
+            delay = self.retry.delay(attempt)
+            if delay > 0:
+                (deadline or Ble.Deadline()).sleep(delay)
+
+            timeout = self.timeout_s
+            t_tx = time.perf_counter()
+            self.send(data, deadline=deadline)
+            try:
+                resp = self.receive(timeout=timeout, deadline=deadline)
+            except Ble.DeadlineExceeded:
+                if deadline.expired or attempt == self.retry.attempts:
+                    self.rtt.backoff()
+                    raise
+                resp = None
+
+            if resp is not None:
+                # A response after a retry may answer an earlier attempt, only first attempts give RTT samples
+                if attempt == 1:
+                    self.rtt.update(resp[0] - t_tx)
+                break
+
+            self.rtt.backoff()
+            if attempt < self.retry.attempts:
+                self.logger.warning(
+                    "No response for opcode 0x{:02X} within {:.3f} s, retrying ({}/{})".format(
+                        self.opcode, timeout, attempt + 1, self.retry.attempts
+                    )
+                )
+
+        if resp is None:
             self.logger.error("No response received for opcode 0x{:02X}".format(self.opcode))
             return None
+        _, rx_data = resp
 
         assert (
             len(rx_data) == self.resp_data_len
@@ -60,13 +159,26 @@ class OpCode:
 
         return rx_data
 
+    def discard_late_responses(self) -> None:
+        """Drop responses still queued, which arrived after their write timed out and answer no later write"""
+        while True:
+            try:
+                self._resp_q.get_nowait()
+            except Empty:
+                return
+            self.logger.debug("Discarding late response for opcode 0x{:02X}".format(self.opcode))
+
     def write(self, *args, **kwargs):
         raise NotImplementedError("Not implemented yet")
 
+    def _write_failed(self, error: Exception) -> None:
+        # Coalesced write failed, no response will come: wake the waiter now instead of at its timeout
+        self._resp_q.put((time.perf_counter(), error))
+
     def write_cb(self, opcode: int, data: bytes) -> None:
         assert (
             opcode == self.opcode
         ), "Notification handler received invalid opcode. Received 0x{:02X} expected 0x{:02X}.".format(
             opcode, self.opcode
         )
-        self._resp_q.put(data)
+        self._resp_q.put((time.perf_counter(), data))
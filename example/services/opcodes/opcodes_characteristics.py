@@ -9,12 +9,14 @@ from typing import Callable
 
 import nordic_central_ble_wrapper as Ble
 from services import uuids
+from services.opcodes.coalescer import BATCH_OPCODE, OpCodeCoalescer, TErrorCallback, iter_batch
 
 
 class OpCodesTxCharacteristic(Ble.Characteristic):
     """OpCodes Tx Characteristic object for handling transferring data to the peripheral BLE device."""
 
     uuid = uuids.OPCODES_TX_CUUID
+    priority = Ble.Priority.Control
 
     def __init__(self, nrf: Ble.CentralBleDriver, service: Ble.Service):
         """Initialize characteristic object for writing values
@@ -24,13 +26,48 @@ class OpCodesTxCharacteristic(Ble.Characteristic):
         """
         super().__init__(nrf=nrf, service=service)
 
-    def write(self, opcode: int, data: bytes) -> None:
-        """Write opcode and data buffer to characteristic."""
+        self.coalescer = None  # type: (OpCodeCoalescer | None)
+
+    def write(
+        self, opcode: int, data: bytes, deadline: Ble.Deadline | None = None, on_error: TErrorCallback | None = None
+    ) -> None:
+        """Write opcode and data buffer to characteristic.
+
+        With coalescing enabled, the opcode is queued for the next batch and the call returns without waiting for the
+        write, the deadline then only bounding the response wait of the caller. A failed batch write is then reported
+        to on_error.
+        """
         assert 0x00 <= opcode <= 0xFF, "OpCode is a single-byte. Must be between 0x00 and 0xFF."
         assert len(data) < 20, "Data length must be less than 20 to adhere to MTU size."
 
         self.logger.debug("opcode: 0x{:02X}, data: {}".format(opcode, data.hex(sep=":")))
-        super().write_request(payload=bytes([opcode]) + data)
+        if self.coalescer is not None:
+            self.coalescer.write(opcode, data, on_error=on_error)
+            return
+
+        super().write_request(payload=bytes([opcode]) + data, deadline=deadline)
+
+    def enable_coalescing(
+        self, window_s: float = 0.005, max_payload: int | None = None, write_command: bool = False
+    ) -> OpCodeCoalescer:
+        """Coalesce opcode writes into framed batches, only for peripherals supporting them (see coalescer module)
+
+        :param window_s: maximum time an opcode waits for others to join its batch
+        :param max_payload: maximum batch payload, defaults to the negotiated ATT MTU minus the ATT header
+        :param write_command: write batches as GATT WRITE_CMD instead of WRITE_REQ
+        :return: Coalescer object
+        """
+        if self.coalescer is None:
+            self.coalescer = OpCodeCoalescer(
+                self, window_s=window_s, max_payload=max_payload, write_command=write_command
+            )
+        return self.coalescer
+
+    def disable_coalescing(self) -> None:
+        """Write the pending batch, then go back to one write per opcode"""
+        if self.coalescer is not None:
+            coalescer, self.coalescer = self.coalescer, None
+            coalescer.close()
 
 
 class OpCodesRxCharacteristic(Ble.Characteristic):
@@ -69,6 +106,12 @@ class OpCodesRxCharacteristic(Ble.Characteristic):
             self.ntf_handlers.pop(opcode)
 
     def on_notification(self, payload: bytes) -> None:
+        if payload[0] == BATCH_OPCODE and BATCH_OPCODE not in self.ntf_handlers:
+            # Batched responses of coalesced opcode writes
+            for opcode, data in iter_batch(payload[1:]):
+                self.on_notification(bytes([opcode]) + data)
+            return
+
         try:
             self.ntf_handlers[payload[0]](payload[0], payload[1:])
         except KeyError:
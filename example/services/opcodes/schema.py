@@ -0,0 +1,237 @@
+#!/usr/bin/env python3.10
+# -*- coding: utf-8 -*-
+
+"""
+Declarative opcode definitions with precompiled request/response codecs
+
+Opcodes are described in a JSON (or YAML, when PyYAML is installed) spec:
+
+    {
+        "counter": {
+            "opcode": 2,
+            "timeout_s": 10,
+            "idempotent": false,
+            "request": [],
+            "response": [{"name": "count", "type": "H", "min": 0, "max": 65535}]
+        }
+    }
+
+Field types are single struct format codes (little-endian, e.g. "B", "h", "I", "8s"). Each spec compiles its layouts
+into struct.Struct objects once, and generates a response dataclass with __slots__ whose `valid` flag reports whether
+every field is within its range.
+
+"timeout_s" is the maximum response timeout. Only opcodes marked "idempotent" may be retried, up to "attempts" writes
+(3 by default), their timeout adapting to the observed round trip time down to "timeout_floor_s". Other opcodes keep
+"timeout_s" unless given an explicit "timeout_floor_s".
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import struct
+
+from dataclasses import dataclass, field, make_dataclass
+from typing import Any
+
+import nordic_central_ble_wrapper as Ble
+from services.opcodes import OpCodesTxCharacteristic, OpCodesRxCharacteristic
+from services.opcodes.opcode import OpCode
+from services.opcodes.timeouts import RetryPolicy
+
+DEFAULT_SPEC_PATH = os.path.join(os.path.dirname(__file__), "opcodes.json")
+
+# Value ranges implied by the integer struct format codes
+_INT_RANGES = {
+    "b": (-0x80, 0x7F),
+    "B": (0x00, 0xFF),
+    "h": (-0x8000, 0x7FFF),
+    "H": (0x0000, 0xFFFF),
+    "i": (-0x80000000, 0x7FFFFFFF),
+    "I": (0x00000000, 0xFFFFFFFF),
+    "q": (-0x8000000000000000, 0x7FFFFFFFFFFFFFFF),
+    "Q": (0x0000000000000000, 0xFFFFFFFFFFFFFFFF),
+}
+
+
+@dataclass(frozen=True, slots=True)
+class FieldSpec:
+    """Single request/response field layout"""
+
+    name: str
+    type: str
+    min: int | float | None = None
+    max: int | float | None = None
+
+    @classmethod
+    def from_dict(cls, d: dict[str, Any]) -> FieldSpec:
+        fmt = str(d["type"])
+        struct.calcsize("<" + fmt)  # raises struct.error for invalid types
+
+        lo, hi = _INT_RANGES.get(fmt, (None, None))
+        return cls(name=d["name"], type=fmt, min=d.get("min", lo), max=d.get("max", hi))
+
+    def in_range(self, value: Any) -> bool:
+        return (self.min is None or value >= self.min) and (self.max is None or value <= self.max)
+
+
+def _response_post_init(self) -> None:
+    self.valid = all(f.in_range(getattr(self, f.name)) for f in self._fields)
+
+
+@dataclass(frozen=True, slots=True)
+class OpCodeSpec:
+    """Compiled opcode definition"""
+
+    name: str
+    opcode: int
+    timeout_s: float | None
+    timeout_floor_s: float | None
+    idempotent: bool
+    attempts: int | None
+    request_fields: tuple[FieldSpec, ...]
+    response_fields: tuple[FieldSpec, ...]
+    request: struct.Struct = field(repr=False)
+    response: struct.Struct = field(repr=False)
+    response_type: type = field(repr=False)
+
+    @classmethod
+    def from_dict(cls, name: str, d: dict[str, Any]) -> OpCodeSpec:
+        """Compile an opcode definition
+
+        :param name: opcode name
+        :param d: opcode definition dictionary
+        :return: Compiled opcode spec
+        """
+        opcode = int(d["opcode"])
+        assert 0x00 <= opcode <= 0xFF, f"{name}: OpCode is a single-byte. Must be between 0x00 and 0xFF."
+
+        request_fields = tuple(FieldSpec.from_dict(f) for f in d.get("request", ()))
+        response_fields = tuple(FieldSpec.from_dict(f) for f in d.get("response", ()))
+
+        response_type = make_dataclass(
+            "".join(part.capitalize() for part in name.split("_")) + "RxData",
+            [(f.name, Any) for f in response_fields] + [("valid", bool, field(init=False, default=True))],
+            namespace={"_fields": response_fields, "__post_init__": _response_post_init},
+            slots=True,
+        )
+
+        return cls(
+            name=name,
+            opcode=opcode,
+            timeout_s=d.get("timeout_s"),
+            timeout_floor_s=d.get("timeout_floor_s"),
+            idempotent=bool(d.get("idempotent", False)),
+            attempts=d.get("attempts"),
+            request_fields=request_fields,
+            response_fields=response_fields,
+            request=struct.Struct("<" + "".join(f.type for f in request_fields)),
+            response=struct.Struct("<" + "".join(f.type for f in response_fields)),
+            response_type=response_type,
+        )
+
+    def encode(self, *args, **kwargs) -> bytes:
+        """Encode request fields, given positionally and/or by name, into the request payload"""
+        if kwargs:
+            args += tuple(kwargs[f.name] for f in self.request_fields[len(args) :])
+
+        for f, value in zip(self.request_fields, args):
+            if not f.in_range(value):
+                raise ValueError(f"{self.name}: {f.name}={value} out of range [{f.min}, {f.max}]")
+
+        return self.request.pack(*args)
+
+    def decode(self, payload: bytes) -> Any:
+        """Decode a response payload into a response dataclass object"""
+        return self.response_type(*self.response.unpack(payload))
+
+
+class SchemaOpCode(OpCode):
+    """OpCode driven by a compiled OpCodeSpec instead of a hand-written handler"""
+
+    def __init__(
+        self,
+        opcode_tx_char: OpCodesTxCharacteristic,
+        opcode_rx_char: OpCodesRxCharacteristic,
+        spec: OpCodeSpec,
+        log_severity_level: int = logging.DEBUG,
+    ):
+        super().__init__(
+            opcode_tx_char=opcode_tx_char,
+            opcode_rx_char=opcode_rx_char,
+            opcode=spec.opcode,
+            resp_data_len=spec.response.size,
+            log_severity_level=log_severity_level,
+            resp_timeout_s=spec.timeout_s,
+            resp_timeout_floor_s=spec.timeout_floor_s,
+            idempotent=spec.idempotent,
+            retry=None if spec.attempts is None else RetryPolicy(attempts=spec.attempts),
+        )
+        self.spec = spec
+
+    def write(self, *args, deadline: Ble.Deadline | None = None, **kwargs) -> Any:
+        """Write the opcode with its request fields and return the decoded response
+
+        :param deadline: overall deadline bounding the write and the response wait
+        :return: Response dataclass object, None if no response was received (without a deadline)
+        """
+        resp_data = self._write(self.spec.encode(*args, **kwargs), deadline=deadline)
+        if resp_data is None:
+            return None
+
+        try:
+            return self.spec.decode(resp_data)
+        except struct.error as e:
+            self.logger.error("Failed to parse response data")
+            raise e
+
+
+def load_opcode_specs(path: str = DEFAULT_SPEC_PATH) -> dict[str, OpCodeSpec]:
+    """Load and compile opcode definitions from a JSON or YAML spec file
+
+    :param path: spec file path
+    :return: Dictionary of compiled opcode specs keyed by opcode name
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        if os.path.splitext(path)[1].lower() in (".yaml", ".yml"):
+            import yaml  # optional dependency, only needed for YAML specs
+
+            definitions = yaml.safe_load(f)
+        else:
+            definitions = json.load(f)
+
+    specs = {name: OpCodeSpec.from_dict(name, d) for name, d in definitions.items()}
+
+    opcodes = [s.opcode for s in specs.values()]
+    assert len(opcodes) == len(set(opcodes)), f"Duplicate opcode numbers in {path}"
+
+    return specs
+
+
+def build_opcodes(
+    opcode_tx_char: OpCodesTxCharacteristic,
+    opcode_rx_char: OpCodesRxCharacteristic,
+    specs: dict[str, OpCodeSpec] | None = None,
+    log_severity_level: int = logging.DEBUG,
+) -> dict[str, SchemaOpCode]:
+    """Create OpCode objects for every spec
+
+    :param opcode_tx_char: Tx characteristic for writing data to the BLE peripheral
+    :param opcode_rx_char: Rx characteristic for receiving notification responses
+    :param specs: compiled opcode specs, defaults to the specs in DEFAULT_SPEC_PATH
+    :param log_severity_level: logging level
+    :return: Dictionary of OpCode objects keyed by opcode name
+    """
+    if specs is None:
+        specs = load_opcode_specs()
+
+    return {
+        name: SchemaOpCode(
+            opcode_tx_char=opcode_tx_char,
+            opcode_rx_char=opcode_rx_char,
+            spec=spec,
+            log_severity_level=log_severity_level,
+        )
+        for name, spec in specs.items()
+    }
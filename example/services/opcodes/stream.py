@@ -0,0 +1,398 @@
+#!/usr/bin/env python3.10
+# -*- coding: utf-8 -*-
+
+"""
+Socket-like byte stream transport over the OpCodes service's TX/RX characteristics
+
+Stream packets share the characteristics with the opcodes, marked by the reserved STREAM_OPCODE:
+
+    packet = STREAM_OPCODE, kind (u8), sequence number (u16), segment data (Data and DataEnd only)
+
+Messages are split into segments filling the negotiated MTU, the last one sent as DataEnd. The central writes its
+packets to the TX characteristic (as write commands by default), the peripheral notifies its packets on the RX
+characteristic. Both sides run the same go-back-N protocol: at most `window` segments are unacknowledged, the receiver
+acknowledges cumulatively (the next sequence number it expects) every window / 2 segments and at the end of every
+message, and the sender retransmits every unacknowledged segment once the oldest one isn't acknowledged within
+ack_timeout_s. Sequence numbers start at 0 when the stream is opened, on both sides.
+"""
+
+from __future__ import annotations
+
+import io
+import logging
+import struct
+import threading
+import time
+
+from collections import OrderedDict, deque
+from enum import IntEnum
+
+import nordic_central_ble_wrapper as Ble
+from services.opcodes import OpCodesTxCharacteristic, OpCodesRxCharacteristic
+from services.opcodes.coalescer import ATT_WRITE_HEADER_LEN, DEFAULT_ATT_MTU
+
+logger = logging.getLogger(__name__)
+
+STREAM_OPCODE = 0xFE
+PACKET_HEADER = struct.Struct("<BBH")
+SEQ_MOD = 0x10000
+
+
+class PacketKind(IntEnum):
+    Data = 0
+    DataEnd = 1  # last segment of a message
+    Ack = 2
+
+
+class OpCodeStream:
+    """Reliable, ordered message and byte stream to the peripheral
+
+    send() queues a message, blocking while the window is full, and flush() waits for every segment to be acknowledged.
+    recv() reads bytes and recv_message() whole messages, both only returning complete messages. makefile() wraps the
+    stream in a file object. Segments unacknowledged after max_attempts transmissions fail the stream with
+    DeadlineExceeded.
+    """
+
+    def __init__(
+        self,
+        tx_char: OpCodesTxCharacteristic,
+        rx_char: OpCodesRxCharacteristic,
+        window: int = 8,
+        ack_timeout_s: float = 0.5,
+        max_attempts: int = 5,
+        segment_size: int | None = None,
+        write_command: bool = True,
+    ) -> None:
+        """Initialize stream, open() it before use
+
+        :param tx_char: Tx characteristic the central's packets are written to
+        :param rx_char: Rx characteristic the peripheral's packets are notified on
+        :param window: maximum number of unacknowledged segments in each direction, agreed with the peripheral
+        :param ack_timeout_s: time after which unacknowledged segments are retransmitted
+        :param max_attempts: transmissions of a segment before the stream fails
+        :param segment_size: segment data length, defaults to filling the negotiated ATT MTU
+        :param write_command: write packets as GATT WRITE_CMD instead of WRITE_REQ
+        """
+        assert 1 <= window < SEQ_MOD // 2, "Window must be between 1 and half the sequence number space."
+
+        self.tx_char = tx_char
+        self.rx_char = rx_char
+        self.window = window
+        self.ack_timeout_s = ack_timeout_s
+        self.max_attempts = max_attempts
+        self.segment_size = segment_size
+        self.write_command = write_command
+
+        self.retransmissions = 0
+        self.error = None  # type: (Exception | None)
+
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._closed = True
+        self._thread = None  # type: (threading.Thread | None)
+
+        # Sender state: sequence number of the next segment, unacknowledged segments (seq: [packet, sent at, attempts])
+        self._tx_seq = 0
+        self._unacked = OrderedDict()  # type: OrderedDict[int, list]
+
+        # Receiver state: next expected sequence number, segments not acknowledged yet, message being reassembled
+        self._rx_seq = 0
+        self._rx_pending_acks = 0
+        self._rx_segments = list()  # type: list[bytes]
+        self._rx_messages = deque()  # type: deque[bytes]
+        self._rx_offset = 0  # bytes of the first message already returned by recv()
+
+        # Acknowledgement (next expected sequence number) waiting to be written by the stream thread
+        self._ack_seq = None  # type: (int | None)
+
+    def __enter__(self) -> OpCodeStream:
+        self.open()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def open(self) -> None:
+        """Start receiving stream packets, and the thread writing acknowledgements and retransmissions"""
+        with self._cond:
+            if not self._closed:
+                return
+            self._closed = False
+            self.error = None
+            self._tx_seq = self._rx_seq = 0
+            self._unacked.clear()
+            self._rx_pending_acks = 0
+            self._rx_segments.clear()
+            self._rx_messages.clear()
+            self._rx_offset = 0
+            self._ack_seq = None
+
+        self.rx_char.add_opcode_handler(STREAM_OPCODE, self._on_packet)
+        self._thread = threading.Thread(target=self._run, name="OpCodeStream", daemon=True)
+        self._thread.start()
+
+    def close(self, timeout: float | None = None) -> None:
+        """Wait for the sent segments to be acknowledged, then stop the stream
+
+        :param timeout: maximum time to wait for acknowledgements in seconds
+        """
+        if self._closed:
+            return
+        try:
+            self.flush(timeout)
+        except Ble.DeadlineExceeded:
+            pass
+        finally:
+            with self._cond:
+                self._closed = True
+                self._cond.notify_all()
+            self.rx_char.remove_opcode_handler(STREAM_OPCODE)
+            self._thread.join()
+            self._thread = None
+
+    def segment_limit(self) -> int:
+        """Segment data length in bytes"""
+        if self.segment_size is not None:
+            return self.segment_size
+        mtu = self.tx_char.nrf.actual_att_mtu or DEFAULT_ATT_MTU
+        return mtu - ATT_WRITE_HEADER_LEN - PACKET_HEADER.size
+
+    def send(self, data: bytes, timeout: float | None = None) -> int:
+        """Send a message, blocking while the window is full
+
+        :param data: message, may be empty
+        :param timeout: maximum time to wait for window space in seconds, raises DeadlineExceeded
+        :return: Number of bytes sent
+        """
+        size = self.segment_limit()
+        view = memoryview(bytes(data))
+        segments = [view[i : i + size] for i in range(0, len(view), size)] or [view]
+        end_at = None if timeout is None else time.monotonic() + timeout
+
+        for i, segment in enumerate(segments):
+            kind = PacketKind.DataEnd if i == len(segments) - 1 else PacketKind.Data
+            with self._cond:
+                while len(self._unacked) >= self.window:
+                    self._check()
+                    remaining = None if end_at is None else end_at - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise Ble.DeadlineExceeded(f"Stream window full for {timeout:g} s")
+                    self._cond.wait(remaining)
+                self._check()
+
+                seq = self._tx_seq
+                self._tx_seq = (seq + 1) % SEQ_MOD
+                packet = PACKET_HEADER.pack(STREAM_OPCODE, kind, seq) + segment
+                self._unacked[seq] = [packet, time.monotonic(), 1]
+                self._cond.notify_all()
+
+            self._write(packet)
+
+        return len(view)
+
+    sendall = send
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Wait for every sent segment to be acknowledged
+
+        :param timeout: maximum time to wait in seconds
+        :return: Boolean indicating if every segment was acknowledged
+        """
+        end_at = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._unacked:
+                self._check()
+                remaining = None if end_at is None else end_at - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    def recv(self, bufsize: int, timeout: float | None = None) -> bytes:
+        """Receive bytes of complete messages, ignoring message boundaries
+
+        :param bufsize: maximum number of bytes to return
+        :param timeout: maximum time to wait for a message in seconds, raises DeadlineExceeded
+        :return: Between 1 and bufsize bytes, b"" once the stream is closed and drained
+        """
+        with self._cond:
+            if not self._wait_message(timeout):
+                return bytes()
+
+            chunks = []
+            while self._rx_messages and bufsize > 0:
+                message = self._rx_messages[0]
+                chunk = message[self._rx_offset : self._rx_offset + bufsize]
+                chunks.append(chunk)
+                bufsize -= len(chunk)
+                self._rx_offset += len(chunk)
+                if self._rx_offset >= len(message):
+                    self._rx_messages.popleft()
+                    self._rx_offset = 0
+            return b"".join(chunks)
+
+    def recv_message(self, timeout: float | None = None) -> bytes | None:
+        """Receive the next complete message
+
+        :param timeout: maximum time to wait in seconds, raises DeadlineExceeded
+        :return: Message (the rest of it if partially read by recv()), None once the stream is closed and drained
+        """
+        with self._cond:
+            if not self._wait_message(timeout):
+                return None
+            message = self._rx_messages.popleft()[self._rx_offset :]
+            self._rx_offset = 0
+            return message
+
+    def makefile(self, mode: str = "rb", buffering: int = io.DEFAULT_BUFFER_SIZE) -> io.BufferedIOBase:
+        """File object reading/writing the stream, as socket.makefile()
+
+        :param mode: "rb", "wb" or "rwb"
+        :param buffering: buffer size, every flush of a writer's buffer sends one message
+        :return: Buffered file object
+        """
+        raw = StreamFile(self, mode)
+        if "r" in mode and "w" in mode:
+            return io.BufferedRWPair(raw, raw, buffering)
+        if "w" in mode:
+            return io.BufferedWriter(raw, buffering)
+        return io.BufferedReader(raw, buffering)
+
+    def _wait_message(self, timeout: float | None) -> bool:
+        end_at = None if timeout is None else time.monotonic() + timeout
+        while not self._rx_messages:
+            if self._closed:
+                return False
+            remaining = None if end_at is None else end_at - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                raise Ble.DeadlineExceeded(f"No stream message received within {timeout:g} s")
+            self._cond.wait(remaining)
+        return True
+
+    def _check(self) -> None:
+        if self.error is not None:
+            raise self.error
+        if self._closed:
+            raise ValueError("Stream is closed")
+
+    def _write(self, packet: bytes) -> None:
+        try:
+            with self._write_lock:
+                if self.write_command:
+                    self.tx_char.write_command(payload=packet)
+                else:
+                    self.tx_char.write_request(payload=packet)
+        except Exception as e:
+            # e.g. no free transmit buffers, a lost segment is retransmitted after ack_timeout_s
+            logger.debug(f"Stream packet write failed: {e}")
+
+    def _on_packet(self, opcode: int, data: bytes) -> None:
+        del opcode  # always STREAM_OPCODE
+        if len(data) < PACKET_HEADER.size - 1:
+            logger.error(f"Malformed stream packet: {data.hex(sep=':')}")
+            return
+        kind, seq = struct.unpack_from("<BH", data)
+        if kind == PacketKind.Ack:
+            self._on_ack(seq)
+        else:
+            self._on_data(kind, seq, data[PACKET_HEADER.size - 1 :])
+
+    def _on_ack(self, next_seq: int) -> None:
+        with self._cond:
+            if not self._unacked:
+                return
+            acked = (next_seq - next(iter(self._unacked))) % SEQ_MOD
+            if acked > len(self._unacked):
+                return  # stale acknowledgement
+            for _ in range(acked):
+                self._unacked.popitem(last=False)
+            self._cond.notify_all()
+
+    def _on_data(self, kind: int, seq: int, segment: bytes) -> None:
+        with self._cond:
+            if seq != self._rx_seq:
+                # Duplicate or out of order (an earlier segment was lost), re-acknowledge what was received so far
+                ack = True
+            else:
+                self._rx_seq = (seq + 1) % SEQ_MOD
+                self._rx_segments.append(segment)
+                self._rx_pending_acks += 1
+                if kind == PacketKind.DataEnd:
+                    self._rx_messages.append(b"".join(self._rx_segments))
+                    self._rx_segments.clear()
+                ack = kind == PacketKind.DataEnd or self._rx_pending_acks >= max(1, self.window // 2)
+
+            if ack:
+                # Written by the stream thread: this runs on the notifying thread, possibly the driver's event thread,
+                # where a write request would wait for a response only that thread can deliver
+                self._rx_pending_acks = 0
+                self._ack_seq = self._rx_seq
+            self._cond.notify_all()
+
+    def _run(self) -> None:
+        while True:
+            packets = []
+            with self._cond:
+                if self._closed:
+                    return
+
+                if self._ack_seq is not None:
+                    packets.append(PACKET_HEADER.pack(STREAM_OPCODE, PacketKind.Ack, self._ack_seq))
+                    self._ack_seq = None
+
+                elif self._unacked and self.error is None:
+                    oldest = next(iter(self._unacked.values()))
+                    remaining = oldest[1] + self.ack_timeout_s - time.monotonic()
+                    if remaining > 0:
+                        self._cond.wait(remaining)
+                        continue
+
+                    if oldest[2] >= self.max_attempts:
+                        seq = next(iter(self._unacked))
+                        self.error = Ble.DeadlineExceeded(
+                            f"Stream segment {seq} not acknowledged after {self.max_attempts} attempts"
+                        )
+                        self._cond.notify_all()
+                        continue
+
+                    # Go-back-N, everything after the oldest unacknowledged segment was discarded by the receiver
+                    now = time.monotonic()
+                    for entry in self._unacked.values():
+                        entry[1] = now
+                        entry[2] += 1
+                        packets.append(entry[0])
+                    self.retransmissions += len(packets)
+
+                else:
+                    self._cond.wait()
+                    continue
+
+            for packet in packets:
+                self._write(packet)
+
+
+class StreamFile(io.RawIOBase):
+    """Raw file object over an OpCodeStream, see OpCodeStream.makefile()"""
+
+    def __init__(self, stream: OpCodeStream, mode: str = "rb") -> None:
+        super().__init__()
+        self.stream = stream
+        self.mode = mode
+
+    def readable(self) -> bool:
+        return "r" in self.mode
+
+    def writable(self) -> bool:
+        return "w" in self.mode
+
+    def readinto(self, b) -> int:
+        data = self.stream.recv(len(b))
+        b[: len(data)] = data
+        return len(data)
+
+    def write(self, b) -> int:
+        return self.stream.send(bytes(b))
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3.10
+# -*- coding: utf-8 -*-
+
+"""
+Adaptive opcode response timeouts and retry policies
+"""
+
+from __future__ import annotations
+
+import threading
+
+from dataclasses import dataclass
+
+
+class RttEstimator:
+    """Rolling round trip time estimate of an opcode and the response timeout derived from it
+
+    Smoothed mean and mean deviation are updated as exponentially weighted moving averages (gains 1/8 and 1/4, as TCP
+    does), the timeout being mean + k * deviation clamped to [floor_s, ceiling_s]. Until the first sample the timeout
+    is initial_s. Every missed response doubles the timeout (up to the ceiling) until the next sample.
+    """
+
+    ALPHA = 1 / 8
+    BETA = 1 / 4
+
+    def __init__(self, floor_s: float, ceiling_s: float, initial_s: float | None = None, k: float = 4.0) -> None:
+        """Initialize estimator
+
+        :param floor_s: minimum timeout in seconds
+        :param ceiling_s: maximum timeout in seconds
+        :param initial_s: timeout before the first sample, defaults to the ceiling
+        :param k: deviation multiplier
+        """
+        assert 0 < floor_s <= ceiling_s, "Timeout floor must be positive and not above the ceiling."
+
+        self.floor_s = floor_s
+        self.ceiling_s = ceiling_s
+        self.k = k
+        self.samples = 0
+        self.srtt = None  # type: (float | None)
+        self.rttvar = None  # type: (float | None)
+
+        self._lock = threading.Lock()
+        self._timeout = ceiling_s if initial_s is None else self._clamp(initial_s)
+
+    def timeout(self) -> float:
+        """Current response timeout in seconds"""
+        return self._timeout
+
+    def update(self, rtt_s: float) -> None:
+        """Add a round trip time sample, only of responses that can't belong to an earlier retry
+
+        :param rtt_s: time from writing the opcode to receiving its response in seconds
+        """
+        with self._lock:
+            if self.srtt is None:
+                self.srtt = rtt_s
+                self.rttvar = rtt_s / 2
+            else:
+                self.rttvar += self.BETA * (abs(self.srtt - rtt_s) - self.rttvar)
+                self.srtt += self.ALPHA * (rtt_s - self.srtt)
+            self.samples += 1
+            self._timeout = self._clamp(self.srtt + self.k * self.rttvar)
+
+    def backoff(self) -> None:
+        """Double the timeout after a missed response"""
+        with self._lock:
+            self._timeout = self._clamp(self._timeout * 2)
+
+    def _clamp(self, timeout_s: float) -> float:
+        return min(self.ceiling_s, max(self.floor_s, timeout_s))
+
+
+@dataclass(frozen=True, slots=True)
+class RetryPolicy:
+    """Number of attempts of an idempotent opcode and the pause between them"""
+
+    attempts: int = 1
+    backoff_s: float = 0.0
+    backoff_factor: float = 2.0
+
+    def delay(self, attempt: int) -> float:
+        """Pause before an attempt
+
+        :param attempt: attempt number, from 1
+        :return: Pause in seconds, 0 for the first attempt
+        """
+        return 0.0 if attempt <= 1 else self.backoff_s * self.backoff_factor ** (attempt - 2)
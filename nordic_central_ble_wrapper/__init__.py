@@ -1,3 +1,22 @@
 from central_ble_driver import CentralBleDriver, ConnectionStatus
 from service import Service
+from scan_filter import ScanFilter
+from adv_parser import AdvertisementParser, AdvRecord, address_str
+from discovery import DiscoveryConnector
+from rssi_monitor import RssiMonitor, RssiStats
+from uuid_registry import UuidRegistry
+from deadline import CancellationToken, Cancelled, Deadline, DeadlineExceeded
 from characteristic import Characteristic
+from cache import StaticValueCache
+from bond_store import Bond, BondStore
+from subscription import NotificationSubscription, OverflowPolicy
+from stream_decoder import NotificationStreamDecoder, struct_dtype
+from capture import CaptureReader, CaptureWriter, StreamKind
+from dispatch import DispatchExecutor, InlineDispatcher
+from gatt_scheduler import GattScheduler, GattOperation, Priority, OperationCancelled, OperationExpired
+from gatt_tracker import GattOp, GattRequest, GattRequestTracker
+from daemon import BleDaemon, BleDaemonClient, DaemonError
+from fleet import FleetRunner, DeviceResult
+from recorder import EventRecorder, EventReplayer, read_records
+from hooks import CallTimer, Hook, HookKind, SamplingProfiler, SiteStats, SlowestCallbacks
+from worker import AdapterWorker, EventKind, SharedRing, WorkerError, WorkerEvent
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3.10
+# -*- coding: utf-8 -*-
+
+"""
+Cached advertising data parser with lazy field decoding
+"""
+
+from __future__ import annotations
+
+import functools
+import threading
+import uuid as uuidlib
+
+from collections import OrderedDict
+
+from pc_ble_driver_py import ble_driver as NordicDriver
+
+_TYPES = NordicDriver.BLEAdvData.Types
+
+
+@functools.lru_cache(maxsize=4096)
+def address_str(addr: tuple[int, ...]) -> str:
+    """Hex string of an advertiser address, in the CentralBleDriver format (e.g. "FCAE017C78CE")
+
+    :param addr: address bytes (BLEGapAddr.addr as a tuple)
+    :return: Address hex string
+    """
+    return bytes(addr).hex().upper()
+
+
+class AdvRecord:
+    """Decoded view of a single advertising payload, shared by every report carrying an identical payload
+
+    Fields are decoded on first access only.
+    """
+
+    __slots__ = ("key", "records", "_name", "_uuids16", "_uuids128", "_manufacturer_data", "_tx_power")
+
+    _UNSET = object()
+
+    def __init__(self, key: bytes, records: dict) -> None:
+        self.key = key
+        self.records = records
+        self._name = self._UNSET
+        self._uuids16 = self._UNSET
+        self._uuids128 = self._UNSET
+        self._manufacturer_data = self._UNSET
+        self._tx_power = self._UNSET
+
+    @property
+    def name(self) -> str | None:
+        """Complete local name, or the shortened local name, None if not advertised"""
+        if self._name is self._UNSET:
+            raw = self.records.get(_TYPES.complete_local_name)
+            if raw is None:
+                raw = self.records.get(_TYPES.short_local_name)
+            self._name = None if raw is None else bytes(raw).decode("utf-8", errors="replace")
+        return self._name
+
+    @property
+    def uuids16(self) -> tuple[int, ...]:
+        """Advertised 16-bit service UUIDs (complete and incomplete lists)"""
+        if self._uuids16 is self._UNSET:
+            uuids = []
+            for t in (_TYPES.service_16bit_uuid_complete, _TYPES.service_16bit_uuid_more_available):
+                raw = self.records.get(t, ())
+                uuids += [raw[i] | (raw[i + 1] << 8) for i in range(0, len(raw) - 1, 2)]
+            self._uuids16 = tuple(uuids)
+        return self._uuids16
+
+    @property
+    def uuids128(self) -> tuple[str, ...]:
+        """Advertised 128-bit service UUIDs (complete and incomplete lists) as upper case UUID strings"""
+        if self._uuids128 is self._UNSET:
+            uuids = []
+            for t in (_TYPES.service_128bit_uuid_complete, _TYPES.service_128bit_uuid_more_available):
+                raw = self.records.get(t, ())
+                uuids += [
+                    str(uuidlib.UUID(bytes=bytes(raw[i : i + 16][::-1]))).upper() for i in range(0, len(raw) - 15, 16)
+                ]
+            self._uuids128 = tuple(uuids)
+        return self._uuids128
+
+    @property
+    def manufacturer_data(self) -> tuple[int, bytes] | None:
+        """Tuple (company identifier, manufacturer specific data), None if not advertised"""
+        if self._manufacturer_data is self._UNSET:
+            raw = self.records.get(_TYPES.manufacturer_specific_data)
+            if raw is None or len(raw) < 2:
+                self._manufacturer_data = None
+            else:
+                self._manufacturer_data = (raw[0] | (raw[1] << 8), bytes(raw[2:]))
+        return self._manufacturer_data
+
+    @property
+    def tx_power(self) -> int | None:
+        """Advertised TX power level in dBm, None if not advertised"""
+        if self._tx_power is self._UNSET:
+            raw = self.records.get(_TYPES.tx_power_level)
+            self._tx_power = None if not raw else (raw[0] - 0x100 if raw[0] & 0x80 else raw[0])
+        return self._tx_power
+
+    def __str__(self) -> str:
+        return ", ".join(f"{key.name if hasattr(key, 'name') else key}: {val}" for key, val in self.records.items())
+
+
+class AdvertisementParser:
+    """Memoize decoded advertising payloads in a bounded LRU cache keyed by payload bytes
+
+    Most advertisers repeat identical payloads, so all but the first report of a payload resolve to the same AdvRecord
+    (and its already decoded fields).
+    """
+
+    def __init__(self, maxsize: int = 1024) -> None:
+        """Initialize parser object
+
+        :param maxsize: maximum number of cached payloads
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()  # type: OrderedDict[bytes, AdvRecord]
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    @staticmethod
+    def payload_key(records: dict) -> bytes:
+        """Rebuild the advertising payload (length, AD type, data structures) from split records
+
+        pc-ble-driver-py only hands out the records already split by AD type, re-serializing them gives a compact
+        hashable key equal for identical payloads.
+        """
+        return b"".join(bytes((len(val) + 1, int(key), *val)) for key, val in records.items())
+
+    def parse(self, adv_data: NordicDriver.BLEAdvData) -> AdvRecord:
+        """Get the shared record of an advertising payload
+
+        :param adv_data: advertising data records of a report
+        :return: Shared decoded record
+        """
+        key = self.payload_key(adv_data.records)
+
+        with self._lock:
+            record = self._cache.get(key)
+            if record is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return record
+
+            self.misses += 1
+            record = self._cache[key] = AdvRecord(key, adv_data.records)
+            if len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+            return record
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3.10
+# -*- coding: utf-8 -*-
+
+"""
+Persistent bond (LTK and identity) store keyed by peer address
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any
+
+from cache import atomic_write
+
+logger = logging.getLogger("bond_store")
+
+
+@dataclass(slots=True)
+class Bond:
+    """Keys distributed during bonding with a peer, enough to re-encrypt the link without pairing"""
+
+    address: str
+    ltk: bytes
+    ediv: int
+    rand: bytes
+    auth: bool = False
+    lesc: bool = False
+    ltk_len: int = 16
+    irk: bytes | None = None
+    id_address: str | None = None
+    last_used: float = 0.0
+
+    @classmethod
+    def from_keyset(cls, address: str, keyset: Any) -> Bond | None:
+        """Extract a bond from a pc-ble-driver-py BLEGapSecKeyset
+
+        LESC bonds share a single LTK, stored in the own keys; legacy bonds encrypt with the key distributed by the
+        peer. Fields are read defensively since their presence depends on the negotiated key distribution.
+
+        :param address: peer address in the CentralBleDriver hex format
+        :param keyset: keyset of the connection (BLEAdapter.db_conns[conn_handle]._keyset)
+        :return: Bond object, None if the keyset carries no encryption key
+        """
+        keys_own = getattr(keyset, "keys_own", None)
+        keys_peer = getattr(keyset, "keys_peer", None)
+
+        enc_key = None
+        for keys in (keys_peer, keys_own):
+            candidate = getattr(keys, "enc_key", None)
+            enc_info = getattr(candidate, "enc_info", None)
+            if enc_info is not None and any(getattr(enc_info, "ltk", None) or ()):
+                if enc_key is None or getattr(enc_info, "lesc", False):
+                    enc_key = candidate
+
+        if enc_key is None:
+            return None
+
+        enc_info = enc_key.enc_info
+        master_id = getattr(enc_key, "master_id", None)
+        id_key = getattr(keys_peer, "id_key", None)
+        id_addr_info = getattr(id_key, "id_addr_info", None)
+        irk = getattr(id_key, "irk", None)
+
+        return cls(
+            address=address,
+            ltk=bytes(enc_info.ltk[: getattr(enc_info, "ltk_len", 16)]),
+            ediv=getattr(master_id, "ediv", 0),
+            rand=bytes(getattr(master_id, "rand", None) or bytes(8)),
+            auth=bool(getattr(enc_info, "auth", False)),
+            lesc=bool(getattr(enc_info, "lesc", False)),
+            ltk_len=getattr(enc_info, "ltk_len", 16),
+            irk=bytes(irk) if irk and any(irk) else None,
+            id_address=bytes(id_addr_info.addr).hex().upper() if getattr(id_addr_info, "addr", None) else None,
+        )
+
+    def to_dict(self) -> dict[str, Any]:
+        d = asdict(self)
+        for k in ("ltk", "rand", "irk"):
+            if d[k] is not None:
+                d[k] = d[k].hex()
+        return d
+
+    @classmethod
+    def from_dict(cls, d: dict[str, Any]) -> Bond:
+        d = dict(d)
+        for k in ("ltk", "rand", "irk"):
+            if d.get(k) is not None:
+                d[k] = bytes.fromhex(d[k])
+        return cls(**d)
+
+
+class BondStore:
+    """Bonds of up to max_bonds peers, optionally persisted to a JSON file
+
+    Bonds are looked up by peer address or identity address. When full, storing a new bond evicts the least recently
+    used one. The backing file is rewritten atomically on every change and, holding long-term keys, is only readable by
+    its owner. Lookups only reorder the bonds in memory, the new order being persisted with the next change.
+    """
+
+    def __init__(self, path: str | None = None, max_bonds: int = 32) -> None:
+        """Initialize bond store
+
+        :param path: optional persistent backing file, loaded now and rewritten on every change
+        :param max_bonds: maximum number of stored bonds
+        """
+        self.path = path
+        self.max_bonds = max_bonds
+
+        self._lock = threading.Lock()
+        self._bonds = OrderedDict()  # type: OrderedDict[str, Bond]
+
+        if path is not None and os.path.exists(path):
+            self.load()
+
+    def __len__(self) -> int:
+        return len(self._bonds)
+
+    def __contains__(self, address: str) -> bool:
+        return self.get(address, touch=False) is not None
+
+    def addresses(self) -> list[str]:
+        """Stored peer addresses, least recently used first"""
+        with self._lock:
+            return list(self._bonds)
+
+    def get(self, address: str, touch: bool = True) -> Bond | None:
+        """Look up the bond of a peer
+
+        :param address: peer address or identity address
+        :param touch: mark the bond as most recently used (persisted with the next change, not written now)
+        :return: Bond object, None if the peer isn't bonded
+        """
+        with self._lock:
+            bond = self._bonds.get(address)
+            if bond is None:
+                bond = next((b for b in self._bonds.values() if b.id_address == address), None)
+            if bond is not None and touch:
+                bond.last_used = time.time()
+                self._bonds.move_to_end(bond.address)
+            return bond
+
+    def put(self, bond: Bond) -> None:
+        """Store (or replace) the bond of a peer, evicting the least recently used bonds beyond max_bonds
+
+        :param bond: bond to store
+        """
+        with self._lock:
+            bond.last_used = time.time()
+            self._bonds[bond.address] = bond
+            self._bonds.move_to_end(bond.address)
+
+            while len(self._bonds) > self.max_bonds:
+                evicted, _ = self._bonds.popitem(last=False)
+                logger.info(f"Evicted bond of 0x{evicted}")
+
+            self._save()
+
+    def remove(self, address: str) -> bool:
+        """Forget the bond of a peer, e.g. after the peer lost its keys
+
+        :param address: peer address
+        :return: Boolean indicating if a bond was removed
+        """
+        with self._lock:
+            if self._bonds.pop(address, None) is None:
+                return False
+            self._save()
+            return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._bonds.clear()
+            self._save()
+
+    def load(self) -> None:
+        """Load bonds from the backing file"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                bonds = [Bond.from_dict(d) for d in json.load(f)["bonds"]]
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Ignoring unreadable bond file {self.path}: {e}")
+            return
+
+        with self._lock:
+            for bond in sorted(bonds, key=lambda b: b.last_used)[-self.max_bonds :]:
+                self._bonds[bond.address] = bond
+
+    def _save(self) -> None:
+        if self.path is None:
+            return
+
+        # atomic_write's temporary file is created with owner-only permissions, which the rename preserves
+        atomic_write(self.path, json.dumps({"bonds": [b.to_dict() for b in self._bonds.values()]}).encode("utf-8"))
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3.10
+# -*- coding: utf-8 -*-
+
+"""
+TTL cache of static characteristic values keyed by peer address
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger("cache")
+
+
+def atomic_write(path: str, data: bytes) -> None:
+    """Replace a file's content atomically (write to a temporary file in the same directory, then rename)
+
+    :param path: file path to write
+    :param data: file content
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class StaticValueCache:
+    """Read-through cache of static characteristic values
+
+    Entries are keyed by (peer address, firmware revision, characteristic UUID value), so a firmware update on the peer
+    naturally misses the cache. Entries expire after ttl_s seconds and are optionally persisted to a JSON file so
+    separate sessions with the same device skip the reads. Changes only mark the cache dirty, flush() (or close())
+    once per pass of reads writes them to the file.
+    """
+
+    TKey = tuple[str, str, int]
+
+    def __init__(self, ttl_s: float | None = None, path: str | None = None) -> None:
+        """Initialize cache object
+
+        :param ttl_s: entry time-to-live in seconds, None never expires entries
+        :param path: optional persistent backing file, loaded now and rewritten by flush()
+        """
+        self.ttl_s = ttl_s
+        self.path = path
+
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._entries = dict()  # type: dict[StaticValueCache.TKey, tuple[bytes, float]]
+        self._dirty = False
+
+        if path is not None and os.path.exists(path):
+            self.load()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: TKey) -> bytes | None:
+        """Get a cached value
+
+        :param key: (peer address, firmware revision, characteristic UUID value)
+        :return: Cached value, None if missing or expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl_s is not None and time.time() - entry[1] > self.ttl_s:
+                del self._entries[key]
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: TKey, value: bytes) -> None:
+        """Store a value
+
+        :param key: (peer address, firmware revision, characteristic UUID value)
+        :param value: characteristic value
+        """
+        with self._lock:
+            self._entries[key] = (bytes(value), time.time())
+            self._dirty = True
+
+    def invalidate(self, peer: str | None = None, revision: str | None = None, uuid: int | None = None) -> int:
+        """Drop matching entries, no arguments drops every entry
+
+        :param peer: only drop entries of this peer address
+        :param revision: only drop entries of this firmware revision
+        :param uuid: only drop entries of this characteristic UUID value
+        :return: Number of dropped entries
+        """
+        with self._lock:
+            keys = [
+                k
+                for k in self._entries
+                if (peer is None or k[0] == peer)
+                and (revision is None or k[1] == revision)
+                and (uuid is None or k[2] == uuid)
+            ]
+            for k in keys:
+                del self._entries[k]
+
+            if keys:
+                self._dirty = True
+            return len(keys)
+
+    def flush(self) -> None:
+        """Write the entries to the backing file if they changed since the last flush"""
+        with self._lock:
+            if self._dirty:
+                self._save()
+                self._dirty = False
+
+    def close(self) -> None:
+        self.flush()
+
+    def load(self) -> None:
+        """Load entries from the backing file, dropping expired ones"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                entries = json.load(f)["entries"]
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable cache file {self.path}: {e}")
+            return
+
+        now = time.time()
+        with self._lock:
+            for peer, revision, uuid, value, stored_at in entries:
+                if self.ttl_s is None or now - stored_at <= self.ttl_s:
+                    self._entries[(peer, revision, uuid)] = (bytes.fromhex(value), stored_at)
+
+    def _save(self) -> None:
+        if self.path is None:
+            return
+
+        entries = [[*k, v.hex(), stored_at] for k, (v, stored_at) in self._entries.items()]
+        atomic_write(self.path, json.dumps({"entries": entries}).encode("utf-8"))
@@ -0,0 +1,380 @@
+#!/usr/bin/env python3.10
+# -*- coding: utf-8 -*-
+
+"""
+Memory-mapped capture files for long notification and advertising report recordings
+
+A capture file is a HEADER_SIZE byte header followed by fixed size records:
+
+    header = MAGIC, version (u32), header size (u32), record size (u32), payload size (u32), record count (u64),
+             record capacity (u64), wall clock start time (f64), stream count (u32), then at STREAM_TABLE_OFFSET
+             the stream index, MAX_STREAMS entries of kind (u8) and UTF-8 name (31 bytes, NUL padded)
+
+    record = monotonic timestamp relative to the start of the capture (f64), stream id (u16), advertising type (u8,
+             0xFF for notifications), RSSI (i8), original payload length (u16), peer address (6 bytes), padding,
+             payload (payload size bytes, zero padded, truncated beyond it)
+
+The record count in the header is only updated once a record is complete, so a capture cut short (crash, power loss)
+is still readable up to its last complete record. NumPy is an optional dependency of CaptureReader.records.
+"""
+
+from __future__ import annotations
+
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+
+from enum import IntEnum
+from typing import TYPE_CHECKING, Any, Iterator
+
+from adv_parser import AdvertisementParser
+
+if TYPE_CHECKING:
+    import numpy as np
+
+    from pc_ble_driver_py import ble_driver as NordicDriver
+
+    from central_ble_driver import CentralBleDriver
+    from characteristic import Characteristic
+
+logger = logging.getLogger("capture")
+
+MAGIC = b"NBLECAP\x01"
+VERSION = 1
+
+HEADER = struct.Struct("<8sIIIIQQdI")
+HEADER_SIZE = 4096
+COUNT_OFFSET = 24  # offset of the record count in HEADER
+
+STREAM_TABLE_OFFSET = 64
+STREAM_ENTRY = struct.Struct("<B31s")
+MAX_STREAMS = (HEADER_SIZE - STREAM_TABLE_OFFSET) // STREAM_ENTRY.size
+
+RECORD_HEADER = struct.Struct("<dHBbH6s4x")
+
+ADV_TYPE_NONE = 0xFF
+
+
+class StreamKind(IntEnum):
+    Notification = 0
+    AdvReport = 1
+
+
+def _record_size(payload_size: int) -> int:
+    # Keep records 8-byte aligned so the timestamps of a zero-copy array are aligned too
+    return (RECORD_HEADER.size + payload_size + 7) & ~7
+
+
+class CaptureWriter:
+    """Append timestamped notification and advertising report records to a preallocated memory-mapped file
+
+    The file grows by grow_records records whenever it is full, one truncate and remap instead of a write per packet,
+    and is trimmed to the records written on close(). Streams (a characteristic or the scan reports of a driver) are
+    listed in the header index, each record referring to its stream by id. Writing is thread-safe, records are written
+    on the notifying/event thread.
+    """
+
+    def __init__(self, path: str, payload_size: int = 244, capacity: int = 65536, grow_records: int | None = None):
+        """Create (overwrite) a capture file
+
+        :param path: capture file path
+        :param payload_size: maximum stored payload length, longer payloads are truncated (244 fits an ATT MTU of 247,
+                             advertising payloads need 31 or up to 255 for extended advertising)
+        :param capacity: number of records preallocated
+        :param grow_records: number of records added when the file is full, defaults to the initial capacity
+        """
+        self.path = path
+        self.payload_size = payload_size
+        self.record_size = _record_size(payload_size)
+        self.grow_records = grow_records or capacity
+        self.truncated = 0
+
+        self.count = 0
+        self.capacity = capacity
+        self.streams = list()  # type: list[tuple[StreamKind, str]]
+
+        self._lock = threading.Lock()
+        self._t0 = time.monotonic()
+        self._created = time.time()
+        self._attached = list()  # type: list[tuple[list, Any]]
+
+        self._file = open(path, "w+b")
+        self._file.truncate(HEADER_SIZE + capacity * self.record_size)
+        self._mm = mmap.mmap(self._file.fileno(), 0)
+        self._write_header()
+
+    def __enter__(self) -> CaptureWriter:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    @property
+    def closed(self) -> bool:
+        return self._mm is None
+
+    def add_stream(self, name: str, kind: StreamKind = StreamKind.Notification) -> int:
+        """Add a stream to the header index
+
+        :param name: stream name (e.g. the characteristic class name), at most 31 bytes of UTF-8
+        :param kind: stream kind
+        :return: Stream id to write records with
+        """
+        encoded = name.encode("utf-8")
+        if len(encoded) > STREAM_ENTRY.size - 1:
+            raise ValueError(f"Stream name {name!r} is longer than {STREAM_ENTRY.size - 1} bytes")
+
+        with self._lock:
+            if len(self.streams) >= MAX_STREAMS:
+                raise ValueError(f"A capture holds at most {MAX_STREAMS} streams")
+            stream = len(self.streams)
+            self.streams.append((kind, name))
+            STREAM_ENTRY.pack_into(self._mm, STREAM_TABLE_OFFSET + stream * STREAM_ENTRY.size, kind, encoded)
+            self._write_header()
+            return stream
+
+    def write(
+        self,
+        stream: int,
+        payload: bytes,
+        rssi: int = 0,
+        adv_type: int = ADV_TYPE_NONE,
+        address: bytes = bytes(6),
+        t: float | None = None,
+    ) -> None:
+        """Append a record
+
+        :param stream: stream id returned by add_stream()
+        :param payload: notification payload or advertising data
+        :param rssi: RSSI of advertising reports
+        :param adv_type: advertising type of advertising reports
+        :param address: peer address (6 bytes, little endian as in BLEGapAddr.addr)
+        :param t: time.monotonic() timestamp, defaults to now
+        """
+        t = (time.monotonic() if t is None else t) - self._t0
+        length = len(payload)
+        stored = min(length, self.payload_size)
+
+        with self._lock:
+            if self._mm is None:
+                return
+            if self.count == self.capacity:
+                self._grow()
+
+            offset = HEADER_SIZE + self.count * self.record_size
+            RECORD_HEADER.pack_into(self._mm, offset, t, stream, adv_type, rssi, length, address)
+            start = offset + RECORD_HEADER.size
+            # The rest of the payload field is zero already, records are never rewritten and truncate() zero-fills
+            self._mm[start : start + stored] = payload[:stored]
+
+            self.count += 1
+            struct.pack_into("<Q", self._mm, COUNT_OFFSET, self.count)
+
+        if stored < length:
+            self.truncated += 1
+
+    def attach(self, characteristic: Characteristic, name: str | None = None) -> int:
+        """Capture a characteristic's notifications/indications
+
+        :param characteristic: characteristic to listen to
+        :param name: stream name, defaults to the characteristic class name
+        :return: Stream id of the characteristic
+        """
+        stream = self.add_stream(name or characteristic.__class__.__name__, StreamKind.Notification)
+
+        def listener(payload: bytes) -> None:
+            self.write(stream, payload)
+
+        characteristic.notification_listeners.append(listener)
+        self._attached.append((characteristic.notification_listeners, listener))
+        return stream
+
+    def attach_scan(self, nrf: CentralBleDriver, name: str = "scan") -> int:
+        """Capture the advertising reports of a driver passing its scan filter
+
+        :param nrf: central BLE driver
+        :param name: stream name
+        :return: Stream id of the reports
+        """
+        stream = self.add_stream(name, StreamKind.AdvReport)
+
+        def listener(peer_addr: NordicDriver.BLEGapAddr, rssi: int, adv_type: Any, adv_data: Any) -> None:
+            self.write(
+                stream,
+                AdvertisementParser.payload_key(adv_data.records),
+                rssi=rssi,
+                adv_type=ADV_TYPE_NONE if adv_type is None else int(adv_type),
+                address=bytes(peer_addr.addr),
+            )
+
+        nrf.adv_report_listeners.append(listener)
+        self._attached.append((nrf.adv_report_listeners, listener))
+        return stream
+
+    def detach(self) -> None:
+        """Stop capturing every attached characteristic and driver"""
+        for listeners, listener in self._attached:
+            if listener in listeners:
+                listeners.remove(listener)
+        self._attached.clear()
+
+    def flush(self) -> None:
+        """Write the mapped records through to the file"""
+        with self._lock:
+            if self._mm is not None:
+                self._mm.flush()
+
+    def close(self) -> None:
+        """Detach, then trim the file to the records written and close it"""
+        self.detach()
+        with self._lock:
+            if self._mm is None:
+                return
+            self.capacity = self.count
+            self._write_header()
+            self._mm.flush()
+            self._mm.close()
+            self._mm = None
+            self._file.truncate(HEADER_SIZE + self.count * self.record_size)
+            self._file.close()
+
+        if self.truncated:
+            logger.warning(f"{self.truncated} payloads longer than {self.payload_size} bytes were truncated")
+
+    def _grow(self) -> None:
+        self.capacity += self.grow_records
+        self._mm.flush()
+        self._mm.close()
+        self._file.truncate(HEADER_SIZE + self.capacity * self.record_size)
+        self._mm = mmap.mmap(self._file.fileno(), 0)
+        self._write_header()
+        logger.debug(f"Capture {self.path} grown to {self.capacity} records")
+
+    def _write_header(self) -> None:
+        HEADER.pack_into(
+            self._mm,
+            0,
+            MAGIC,
+            VERSION,
+            HEADER_SIZE,
+            self.record_size,
+            self.payload_size,
+            self.count,
+            self.capacity,
+            self._created,
+            len(self.streams),
+        )
+
+
+class CaptureReader:
+    """Read-only memory map of a capture file
+
+    records is a zero-copy NumPy structured array over the mapped file. Arrays taken from it stay valid after close(),
+    the mapping being released once the last of them is gone.
+    """
+
+    def __init__(self, path: str) -> None:
+        """Open a capture file
+
+        :param path: capture file path
+        """
+        self.path = path
+
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < HEADER_SIZE:
+                raise ValueError(f"{path} is not a capture file")
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (
+            magic,
+            version,
+            self.header_size,
+            self.record_size,
+            self.payload_size,
+            count,
+            _,
+            self.created,
+            stream_count,
+        ) = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} capture file")
+
+        # A capture cut short may have grown its file before the header was rewritten, never trust more than the file
+        self.count = min(count, (size - self.header_size) // self.record_size)
+
+        self.streams = list()  # type: list[tuple[StreamKind, str]]
+        for i in range(stream_count):
+            kind, name = STREAM_ENTRY.unpack_from(self._mm, STREAM_TABLE_OFFSET + i * STREAM_ENTRY.size)
+            self.streams.append((StreamKind(kind), name.rstrip(b"\x00").decode("utf-8")))
+
+        self._records = None  # type: (np.ndarray | None)
+
+    def __enter__(self) -> CaptureReader:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __iter__(self) -> Iterator[tuple[float, int, int, int, bytes, bytes]]:
+        """Records as (timestamp, stream id, advertising type, RSSI, address, payload) tuples, without NumPy"""
+        view = memoryview(self._mm)
+        for i in range(self.count):
+            offset = self.header_size + i * self.record_size
+            t, stream, adv_type, rssi, length, address = RECORD_HEADER.unpack_from(view, offset)
+            start = offset + RECORD_HEADER.size
+            yield t, stream, adv_type, rssi, address, bytes(view[start : start + min(length, self.payload_size)])
+
+    def stream_id(self, name: str) -> int:
+        """Look up a stream id by name"""
+        for stream, (_, stream_name) in enumerate(self.streams):
+            if stream_name == name:
+                return stream
+        raise KeyError(name)
+
+    def dtype(self) -> np.dtype:
+        """NumPy structured dtype of a record"""
+        import numpy as np  # optional dependency, only needed for array access
+
+        return np.dtype(
+            {
+                "names": ["t", "stream", "adv_type", "rssi", "length", "address", "payload"],
+                "formats": ["<f8", "<u2", "u1", "i1", "<u2", ("u1", 6), ("u1", self.payload_size)],
+                "offsets": [0, 8, 10, 11, 12, 14, RECORD_HEADER.size],
+                "itemsize": self.record_size,
+            }
+        )
+
+    @property
+    def records(self) -> np.ndarray:
+        """Zero-copy structured array of every record"""
+        if self._records is None:
+            import numpy as np  # optional dependency, only needed for array access
+
+            self._records = np.frombuffer(self._mm, dtype=self.dtype(), count=self.count, offset=self.header_size)
+        return self._records
+
+    def stream(self, stream: int | str) -> np.ndarray:
+        """Records of a single stream
+
+        :param stream: stream id or name
+        :return: Structured array of the stream's records (a copy, selected by boolean mask)
+        """
+        if isinstance(stream, str):
+            stream = self.stream_id(stream)
+        records = self.records
+        return records[records["stream"] == stream]
+
+    def close(self) -> None:
+        self._records = None
+        try:
+            self._mm.close()
+        except BufferError:
+            # Arrays handed out still reference the mapping, it is unmapped when the last one is collected
+            pass
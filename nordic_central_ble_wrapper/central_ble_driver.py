@@ -8,11 +8,11 @@ NRF52 central BLE driver wrapper
 from __future__ import annotations
 
 import logging
-import time
+import threading
 
 from enum import IntEnum
 from queue import Queue, Empty
-from typing import Literal, Any
+from typing import Callable, Iterable, Literal, Any
 
 # noinspection PyGlobalUndefined
 from pc_ble_driver_py import config
@@ -25,7 +25,18 @@ logger = logging.getLogger("central_ble_driver")
 # noinspection PyUnresolvedReferences
 from pc_ble_driver_py import ble_driver as NordicDriver, ble_adapter as NordicAdapter
 
+from adv_parser import AdvertisementParser, address_str
+from bond_store import Bond, BondStore
+from deadline import Cancelled, Deadline, DeadlineExceeded
+from discovery import DiscoveryConnector
+from dispatch import InlineDispatcher
+from gatt_scheduler import GattOperation, GattScheduler, Priority
+from gatt_tracker import GattOp, GattRequestTracker
+from hooks import Hook, HookChain
+from rssi_monitor import RssiMonitor
+from scan_filter import ScanFilter
 from service import Service
+from uuid_registry import UuidRegistry
 
 
 class ConnectionStatus(IntEnum):
@@ -41,25 +52,52 @@ class CentralBleDriver(NordicAdapter.BLEDriverObserver, NordicAdapter.BLEAdapter
     TScanDataDict = dict[str, dict[(NordicDriver.BLEAdvData.Types | Literal["rssi", "name"]), Any]]
     TServicesDict = dict[NordicDriver.BLEUUID, Service]
 
+    GATT_RSP_TIMEOUT_S = 10
+    CCCD_UUID = 0x2902
+
     def __init__(
         self,
         log_severity_level: int = logging.DEBUG,
         driver_log_severity_level: int = logging.DEBUG,
         rcp_log_severity_level: NordicDriver.RpcLogSeverity = NordicDriver.RpcLogSeverity.info,
+        dispatcher: InlineDispatcher | None = None,
+        bond_store: BondStore | None = None,
     ):
         """Initialize Central BLE Nordic Driver object
 
         :param log_severity_level:
         :param driver_log_severity_level:
         :param rcp_log_severity_level:
+        :param dispatcher:  executor running user-level callbacks (characteristic notifications/indications, passkey
+                            waits). Defaults to running them inline on the driver's event thread. Protocol-level
+                            handling (connection, MTU, GATT response events) always stays on the event thread.
+        :param bond_store:  keys of bonded peers, stored by pair() and used to re-encrypt links upon connect
         """
         super().__init__()
 
         self.adapter = None
+        self.uuid_registry = UuidRegistry()
+        self.hooks = HookChain()
 
         self.target_addr = None
         self.conn_handle = None
         self.bd_address = None
+        self.peer_addr = None  # type: (str | None)
+        self.connection_count = 0
+
+        self.max_links = None  # type: (int | None)
+        self.links = dict()  # type: dict[str, int]
+        self.discovery = None  # type: (DiscoveryConnector | None)
+
+        self.bond_store = bond_store
+        self.security_levels = dict()  # type: dict[int, int]
+
+        self.rssi_monitors = dict()  # type: dict[int, RssiMonitor]
+
+        # Last CCCD values written per connection (conn_handle: {cccd_handle: value}), and the CCCD configuration
+        # requested per peer address (address: {characteristic UUID value: (characteristic, value)}) for restoring
+        self.cccd_values = dict()  # type: dict[int, dict[int, int]]
+        self.cccd_subscriptions = dict()  # type: dict[str, dict[int, tuple[NordicDriver.BLEUUID, int]]]
 
         self.driver_log_level = driver_log_severity_level
         self.rcp_log_level = rcp_log_severity_level
@@ -70,12 +108,26 @@ class CentralBleDriver(NordicAdapter.BLEDriverObserver, NordicAdapter.BLEAdapter
         self.connection_status = ConnectionStatus.NoConnection
 
         self.scan_data = dict()  # type: CentralBleDriver.TScanDataDict
+        self.scan_filter = None  # type: (ScanFilter | None)
+        self.adv_parser = AdvertisementParser()
         self.services = dict()  # type: CentralBleDriver.TServicesDict
 
+        self.dispatcher = dispatcher if dispatcher is not None else InlineDispatcher()
+
+        self.gatt_requests = GattRequestTracker()
+        self.gatt_scheduler = GattScheduler()
+
         self.passkey_q = Queue()
 
         self.conn_q = Queue()
 
+        # Raw notification/indication listeners, called as listener(conn_handle, uuid, data) on the event thread
+        self.notification_listeners = list()  # type: list[Callable[[int, NordicDriver.BLEUUID, list[int]], None]]
+
+        # Raw advertising report listeners for reports passing the scan filter, called as
+        # listener(peer_addr, rssi, adv_type, adv_data) on the event thread
+        self.adv_report_listeners = list()  # type: list[Callable[[NordicDriver.BLEGapAddr, int, Any, Any], None]]
+
         self.actual_att_mtu = None
         self.actual_conn_params = None
 
@@ -93,6 +145,8 @@ class CentralBleDriver(NordicAdapter.BLEDriverObserver, NordicAdapter.BLEAdapter
         auto_flash: bool = False,
         retransmission_interval: int = 300,
         response_timeout: int = 1500,
+        max_links: int | None = None,
+        uuid_bases: Iterable[NordicDriver.BLEUUIDBase] = (),
     ) -> None:
         """Open a UART connection with the nRF52 device
 
@@ -101,6 +155,9 @@ class CentralBleDriver(NordicAdapter.BLEDriverObserver, NordicAdapter.BLEAdapter
         :param auto_flash:              automatically flash the device with hex firmware
         :param retransmission_interval: UART retransmission interval
         :param response_timeout:        UART response timeout
+        :param max_links:               number of simultaneous central links to configure the SoftDevice for, None
+                                        keeps the SoftDevice default
+        :param uuid_bases:              vendor specific UUID bases to register, in addition to those registered before
         """
         logger.info(f"Opening nRF52 on {com}")
 
@@ -121,6 +178,7 @@ class CentralBleDriver(NordicAdapter.BLEDriverObserver, NordicAdapter.BLEAdapter
         self.adapter.observer_register(self)
         self.adapter.driver.observer_register(self)
         self.adapter.default_mtu = 256
+        self.hooks.wrap_driver(self.adapter.driver)
 
         try:
             self.adapter.driver.open()
@@ -128,15 +186,35 @@ class CentralBleDriver(NordicAdapter.BLEDriverObserver, NordicAdapter.BLEAdapter
             gatt_cfg = NordicDriver.BLEConfigConnGatt(self.adapter.default_mtu)
             gatt_cfg.tag = 1
             self.adapter.driver.ble_cfg_set(NordicDriver.BLEConfig.conn_gatt, gatt_cfg)
+
+            if max_links is not None:
+                role_cfg = NordicDriver.BLEConfigGapRoleCount(
+                    central_role_count=max_links, periph_role_count=0, central_sec_count=max_links
+                )
+                self.adapter.driver.ble_cfg_set(NordicDriver.BLEConfig.role_count, role_cfg)
+
+                gap_cfg = NordicDriver.BLEConfigConnGap(conn_count=max_links)
+                gap_cfg.tag = 1
+                self.adapter.driver.ble_cfg_set(NordicDriver.BLEConfig.conn_gap, gap_cfg)
+
+            self.max_links = max_links
             self.adapter.driver.ble_enable()
 
+            self.uuid_registry.bind(self.adapter.driver)
+            for base in uuid_bases:
+                self.uuid_registry.register(base)
+
         except NordicAdapter.NordicSemiException:
             logger.error("Error opening BLE driver! Restart dev board, check COM port, and rerun.")
             self.adapter = None
             # raise e
 
     def close(self) -> None:
-        """Close connection with nRF52 device"""
+        """Close connection with nRF52 device
+
+        Stops every thread the driver started: the GATT scheduler workers and the dispatcher, which doesn't accept
+        callbacks afterwards (reopening needs a new dispatcher).
+        """
         logger.info("Closing...")
 
         try:
@@ -144,16 +222,49 @@ class CentralBleDriver(NordicAdapter.BLEDriverObserver, NordicAdapter.BLEAdapter
         except:
             pass
         finally:
+            # Fail outstanding requests first, so running operations return instead of waiting for their timeout
+            for conn_handle in self.gatt_scheduler.connections():
+                self.gatt_requests.fail_connection(conn_handle, "driver closed")
+            self.gatt_scheduler.close("driver closed", timeout=self.GATT_RSP_TIMEOUT_S)
+            self.dispatcher.shutdown()
+
             self.adapter.close()
             self.adapter = None
+            self.uuid_registry.unbind()
+            self.discovery = None
+            self.links.clear()
             self.connection_status = ConnectionStatus.NoConnection
 
+    def install_hook(self, hook: Hook) -> None:
+        """Install a hook called around every outbound adapter.driver.ble_* call and every on_* observer callback
+
+        Methods are only wrapped while hooks are installed, without hooks calls and callbacks aren't intercepted.
+
+        :param hook: hook object, e.g. a CallTimer, SlowestCallbacks or SamplingProfiler
+        """
+        self.hooks.install(self, hook)
+
+    def remove_hook(self, hook: Hook) -> None:
+        """Remove a hook, the original methods are restored once the last hook is removed
+
+        :param hook: installed hook object
+        """
+        self.hooks.remove(hook)
+
     def add_service_handler(self, service_handler: Service):
         self.services[service_handler.uuid] = service_handler
 
-    def scan(self, scan_params: NordicDriver.BLEGapScanParams = None):
+    def scan(
+        self,
+        scan_params: NordicDriver.BLEGapScanParams = None,
+        scan_filter: ScanFilter | None = None,
+        deadline: Deadline | None = None,
+    ):
         """
         :param scan_params:
+        :param scan_filter: only store advertisers accepted by the filter (replaces self.scan_filter)
+        :param deadline:    ends the scan early when it expires, cancelling its token stops scanning and raises
+                            Cancelled
         """
         logger.info("Scanning...")
         self.scan_data = dict()
@@ -161,6 +272,9 @@ class CentralBleDriver(NordicAdapter.BLEDriverObserver, NordicAdapter.BLEAdapter
         if scan_params is not None:
             self.scan_parameters = scan_params
 
+        if scan_filter is not None:
+            self.scan_filter = scan_filter
+
         if self.connection_status == ConnectionStatus.NoConnection:
             self.connection_status = ConnectionStatus.Scanning
             try:
@@ -168,15 +282,16 @@ class CentralBleDriver(NordicAdapter.BLEDriverObserver, NordicAdapter.BLEAdapter
             except:
                 pass
 
-        time.sleep(self.scan_parameters.timeout_s)
-
-        if self.connection_status == ConnectionStatus.Scanning:
-            try:
-                self.adapter.driver.ble_gap_scan_stop()
-            except:
-                pass
-            self.connection_status = ConnectionStatus.NoConnection
-            self.get_scan_data()
+        try:
+            (deadline or Deadline()).sleep(self.scan_parameters.timeout_s)
+        finally:
+            if self.connection_status == ConnectionStatus.Scanning:
+                try:
+                    self.adapter.driver.ble_gap_scan_stop()
+                except:
+                    pass
+                self.connection_status = ConnectionStatus.NoConnection
+                self.get_scan_data()
 
     def get_scan_data(self) -> CentralBleDriver.TScanDataDict:
         """Retrieve dictionary of scan data"""
@@ -184,12 +299,8 @@ class CentralBleDriver(NordicAdapter.BLEDriverObserver, NordicAdapter.BLEAdapter
         scan_data = self.scan_data.copy()
 
         for addr, data in scan_data.items():
-            if NordicDriver.BLEAdvData.Types.complete_local_name in data:
-                name = "".join(chr(e) for e in data[NordicDriver.BLEAdvData.Types.complete_local_name])
-            elif NordicDriver.BLEAdvData.Types.short_local_name in data:
-                name = "".join(chr(e) for e in data[NordicDriver.BLEAdvData.Types.short_local_name])
-            else:
-                name = "N/A"
+            # Local names are decoded once per distinct advertising payload by the parser in on_gap_evt_adv_report
+            name = data.get("name", "N/A")
 
             logger.info(
                 f'Address: 0x{addr}, Device Name: {name} {", ".join([f"{repr(key)}: {val}" for key, val in data.items()])}'
@@ -208,15 +319,24 @@ class CentralBleDriver(NordicAdapter.BLEDriverObserver, NordicAdapter.BLEAdapter
         uuid_base: NordicDriver.BLEUUIDBase = None,
         exchange_att_mcu_upon_connect: bool = True,
         discover_services_upon_connect: bool = True,
+        deadline: Deadline | None = None,
+        encrypt_upon_connect: bool = True,
     ) -> None:
         """Request a connection to the target_mac_address
 
+        Without a deadline, failures are logged and leave conn_handle None. With a deadline, the whole flow (scan,
+        connect, encryption, MTU exchange, service discovery) is bounded by it and failures raise: DeadlineExceeded
+        when out of time, Cancelled when its token is cancelled, the adapter's error otherwise (an established link is
+        kept, disconnect() it if needed).
+
         :param target_mac_address:
         :param connection_parameters:
         :param scan_parameters:
         :param uuid_base:
         :param exchange_att_mcu_upon_connect:
         :param discover_services_upon_connect:
+        :param deadline:
+        :param encrypt_upon_connect:    re-encrypt with the stored keys if the peer is in the bond store
         """
         logger.info(f"Scanning for 0x{target_mac_address}")
 
@@ -240,14 +360,29 @@ class CentralBleDriver(NordicAdapter.BLEDriverObserver, NordicAdapter.BLEAdapter
             except:
                 pass
 
+        connected = False
         try:
             self.connection_status = ConnectionStatus.Connecting
             self.adapter.driver.ble_gap_scan_start(scan_params=self.scan_parameters)
 
-            self.conn_handle = self.conn_q.get(timeout=self.scan_parameters.timeout_s)
+            if deadline is None:
+                self.conn_handle = self.conn_q.get(timeout=self.scan_parameters.timeout_s)
+            else:
+                self.conn_handle = deadline.get(
+                    self.conn_q, timeout=self.scan_parameters.timeout_s, what=f"connect to 0x{target_mac_address}"
+                )
+            connected = True
+        except (Cancelled, DeadlineExceeded):
+            logger.error(f"Aborted connecting to target 0x{target_mac_address}")
+            try:
+                self.adapter.driver.ble_gap_scan_stop()
+            except NordicAdapter.NordicSemiException:
+                pass
+            self.connection_status = ConnectionStatus.NoConnection
+            raise
+
         except Empty:
             logger.error(f"Timeout...target 0x{target_mac_address}")
-            time.sleep(1)
 
             try:
                 self.adapter.driver.ble_gap_scan_stop()
@@ -259,20 +394,166 @@ class CentralBleDriver(NordicAdapter.BLEDriverObserver, NordicAdapter.BLEAdapter
 
         except NordicAdapter.NordicSemiException:
             logger.error(f"Error connecting to target 0x{target_mac_address}")
-            time.sleep(1)
             # logger.exception(e)
             self.connection_status = ConnectionStatus.NoConnection
+            if deadline is not None:
+                raise
 
+        if not connected:
+            return
+
+        step = None
         try:
+            if encrypt_upon_connect and self.bond_store is not None:
+                step = f"encryption with 0x{target_mac_address}"
+                self._run_bounded(deadline, step, self.encrypt)
+
             if exchange_att_mcu_upon_connect:
-                self.adapter.att_mtu_exchange(self.conn_handle, self.adapter.default_mtu)
+                step = f"ATT MTU exchange with 0x{target_mac_address}"
+                self._run_bounded(
+                    deadline, step, self.adapter.att_mtu_exchange, self.conn_handle, self.adapter.default_mtu
+                )
 
             if discover_services_upon_connect:
+                step = f"service discovery on 0x{target_mac_address}"
                 logger.debug("Discovering all services")
-                self.adapter.service_discovery(self.conn_handle)
-        except:
+                self._run_bounded(deadline, step, self.adapter.service_discovery, self.conn_handle)
+        except (Cancelled, DeadlineExceeded):
+            raise
+        except Exception as e:
+            logger.error(f"{step} failed: {e!r}")
+            if deadline is not None:
+                raise
+
+    @staticmethod
+    def _run_bounded(deadline: Deadline | None, what: str, fn: Callable[..., Any], *args) -> Any:
+        """Run a blocking adapter step, bounded by the remaining budget of a deadline
+
+        The adapter's calls take no timeout, so with a deadline the step runs on a helper thread. A step outliving the
+        deadline keeps running there until the adapter's own wait ends, its result being discarded.
+
+        :param deadline: bounding deadline, None runs the step on the calling thread
+        :param what: description of the step, included in errors
+        :param fn: step to run
+        :return: Value returned by the step
+        """
+        if deadline is None:
+            return fn(*args)
+
+        deadline.check(what)
+        done = threading.Event()
+        outcome = dict()  # type: dict[str, Any]
+
+        def run() -> None:
+            try:
+                outcome["value"] = fn(*args)
+            except BaseException as e:
+                outcome["error"] = e
+            finally:
+                done.set()
+
+        threading.Thread(target=run, name="ConnectStep", daemon=True).start()
+        deadline.wait(done, what=what)
+
+        if "error" in outcome:
+            raise outcome["error"]
+        return outcome.get("value")
+
+    def connect_on_discovery(
+        self,
+        targets: list[str] | set[str] | None = None,
+        predicate: DiscoveryConnector.T_Predicate | None = None,
+        on_connected: DiscoveryConnector.T_OnConnected | None = None,
+        max_links: int | None = None,
+        connection_parameters: NordicDriver.BLEGapConnParams = None,
+        scan_parameters: NordicDriver.BLEGapScanParams = None,
+    ) -> DiscoveryConnector:
+        """Start a continuous scan connecting to every matching advertiser as it is discovered
+
+        Matching advertisers are connected one at a time (the SoftDevice runs a single connection procedure) up to the
+        link limit; advertisers matched while busy are queued and connected once the procedure completes or a link is
+        released. Scanning keeps running while links are up, until every target is connected or stop_discovery() is
+        called. Don't use connect() while discovery is running.
+
+        :param targets:                 peer addresses in the CentralBleDriver hex format, None accepts any advertiser
+                                        passing the predicate
+        :param predicate:               called as predicate(address, rssi, adv_record) on the event thread, returns
+                                        whether to connect to the advertiser
+        :param on_connected:            called as on_connected(address, conn_handle) on a new thread once a link is
+                                        established (e.g. to exchange the MTU and discover services)
+        :param max_links:               maximum number of simultaneous links, defaults to the max_links passed to open()
+                                        or 1
+        :param connection_parameters:
+        :param scan_parameters:         scan parameters, use a timeout of 0 to scan until stopped
+
+        :return: Discovery state, wait() on it for every target to be connected
+        """
+        if max_links is None:
+            max_links = self.max_links or 1
+
+        if connection_parameters is not None:
+            self.connection_parameters = connection_parameters
+
+        if scan_parameters is not None:
+            self.scan_parameters = scan_parameters
+
+        self.discovery = DiscoveryConnector(
+            targets=targets, predicate=predicate, max_links=max_links, on_connected=on_connected
+        )
+
+        logger.info(f"Discovering {len(targets) if targets is not None else 'matching'} devices, {max_links} links")
+        self._discovery_scan()
+        return self.discovery
+
+    def stop_discovery(self) -> dict[str, int]:
+        """Stop connecting on discovery and stop scanning, established links are kept
+
+        :return: Dictionary of the links established by discovery that are still up, address: conn_handle
+        """
+        discovery, self.discovery = self.discovery, None
+        if discovery is None:
+            return dict()
+
+        try:
+            self.adapter.driver.ble_gap_scan_stop()
+        except NordicAdapter.NordicSemiException:
             pass
 
+        return {addr: conn_handle for conn_handle, addr in discovery.handles.items()}
+
+    def _discovery_scan(self) -> None:
+        try:
+            self.adapter.driver.ble_gap_scan_start(scan_params=self.scan_parameters)
+        except NordicAdapter.NordicSemiException as e:
+            # Already scanning
+            logger.debug(e)
+
+    def _discovery_connect(self, addr: str, peer_addr: NordicDriver.BLEGapAddr) -> None:
+        logger.info(f"Connecting to discovered 0x{addr}")
+        try:
+            self.adapter.connect(address=peer_addr, conn_params=self.connection_parameters, tag=1)
+        except NordicAdapter.NordicSemiException as e:
+            logger.error(f"failed to connect to 0x{addr}: {e}")
+            self.discovery.link_failed()
+            self._discovery_next()
+
+    def _discovery_next(self) -> None:
+        """Connect to the next queued advertiser if a link slot is free, otherwise keep scanning"""
+        discovery = self.discovery
+        if discovery is None:
+            return
+
+        pending = discovery.next(discovery.max_links - len(self.links))
+        if pending is not None:
+            self._discovery_connect(*pending)
+        elif discovery.complete:
+            try:
+                self.adapter.driver.ble_gap_scan_stop()
+            except NordicAdapter.NordicSemiException:
+                pass
+        elif discovery.connecting is None:
+            self._discovery_scan()
+
     def pair(
         self,
         bond: bool = True,
@@ -291,8 +572,13 @@ class CentralBleDriver(NordicAdapter.BLEDriverObserver, NordicAdapter.BLEAdapter
         id_peer: bool = False,
         sign_peer: bool = False,
         link_peer: bool = False,
-    ) -> None:
-        self.adapter.authenticate(
+    ) -> NordicDriver.BLEGapSecStatus | None:
+        """Pair (and bond) with the connected peer. Bonding keys are saved to the bond store, if any.
+
+        :return: Authentication status, None if the authentication didn't complete
+        """
+        conn_handle = self.conn_handle
+        status = self.adapter.authenticate(
             conn_handle=self.conn_handle,
             _role=None,
             bond=bond,
@@ -313,65 +599,215 @@ class CentralBleDriver(NordicAdapter.BLEDriverObserver, NordicAdapter.BLEAdapter
             link_peer=link_peer,
         )
 
+        if bond and self.bond_store is not None and status == NordicDriver.BLEGapSecStatus.success:
+            keyset = getattr(self.adapter.db_conns.get(conn_handle), "_keyset", None)
+            peer = self.peer_addr or self._link_address(conn_handle)
+            stored = Bond.from_keyset(peer, keyset) if peer is not None else None
+            if stored is not None:
+                self.bond_store.put(stored)
+                logger.info(f"Stored bond of 0x{peer}")
+            else:
+                logger.warning(f"conn_handle {conn_handle}: no encryption key distributed, bond not stored")
+
+        return status
+
+    def encrypt(self, conn_handle: int | None = None) -> bool:
+        """Re-encrypt a link with the keys stored in the bond store, skipping pairing
+
+        :param conn_handle: connection to encrypt, defaults to the connection made by connect()
+        :return: Boolean indicating if the link is encrypted, False if the peer isn't bonded or encryption failed
+        """
+        if conn_handle is None:
+            conn_handle = self.conn_handle
+
+        peer = self._link_address(conn_handle)
+        bond = self.bond_store.get(peer) if self.bond_store is not None and peer is not None else None
+        if bond is None:
+            return False
+
+        logger.info(f"Encrypting link to 0x{peer} with stored keys")
+        try:
+            conn_sec = self.adapter.encrypt(
+                conn_handle,
+                bond.ediv,
+                list(bond.rand),
+                list(bond.ltk),
+                auth=int(bond.auth),
+                lesc=int(bond.lesc),
+                ltk_len=bond.ltk_len,
+            )
+        except NordicAdapter.NordicSemiException as e:
+            logger.warning(f"Encryption with stored keys failed on 0x{peer}: {e}")
+            return False
+
+        # Take the level from the BLEGapConnSec adapter.encrypt() waited for: the adapter observes the driver ahead of
+        # us, so on_gap_evt_conn_sec_update may not have stored it yet
+        level = conn_sec.sec_mode.lv
+        self.security_levels[conn_handle] = level
+
+        encrypted = level > 1
+        if not encrypted:
+            # The peer most likely lost its keys, pair() again to replace the bond
+            logger.warning(f"Peer 0x{peer} rejected the stored keys")
+        return encrypted
+
+    def start_rssi_monitor(
+        self, conn_handle: int | None = None, threshold_dbm: int = 1, skip_count: int = 0, window: int = 64
+    ) -> RssiMonitor:
+        """Start RSSI reporting on a connection, feeding a monitor with rolling statistics and threshold callbacks
+
+        :param conn_handle:     connection to monitor, defaults to the connection made by connect()
+        :param threshold_dbm:   minimum RSSI change in dBm reported by the SoftDevice
+        :param skip_count:      number of RSSI samples with a change of threshold_dbm or more before reporting
+        :param window:          number of samples the monitor's statistics are computed over
+        :return: RSSI monitor of the connection (the running one if already monitored)
+        """
+        if conn_handle is None:
+            conn_handle = self.conn_handle
+
+        monitor = self.rssi_monitors.get(conn_handle)
+        if monitor is None:
+            monitor = self.rssi_monitors[conn_handle] = RssiMonitor(conn_handle, window=window)
+            try:
+                self.adapter.driver.ble_gap_rssi_start(conn_handle, threshold_dbm, skip_count)
+            except NordicAdapter.NordicSemiException:
+                del self.rssi_monitors[conn_handle]
+                raise
+        return monitor
+
+    def stop_rssi_monitor(self, conn_handle: int | None = None) -> RssiMonitor | None:
+        """Stop RSSI reporting on a connection
+
+        :param conn_handle: monitored connection, defaults to the connection made by connect()
+        :return: The stopped monitor, keeping its last statistics, None if the connection wasn't monitored
+        """
+        if conn_handle is None:
+            conn_handle = self.conn_handle
+
+        monitor = self.rssi_monitors.pop(conn_handle, None)
+        if monitor is not None:
+            try:
+                self.adapter.driver.ble_gap_rssi_stop(conn_handle)
+            except NordicAdapter.NordicSemiException as e:
+                logger.warning(f"Stopping RSSI reporting on {conn_handle} failed: {e}")
+        return monitor
+
+    def _link_address(self, conn_handle: int) -> str | None:
+        return next((addr for addr, handle in self.links.items() if handle == conn_handle), None)
+
     def disconnect(self) -> None:
         self.adapter.disconnect(self.conn_handle)
         self.connection_status = ConnectionStatus.NoConnection
 
+    def find_characteristic_handle(
+        self,
+        characteristic: NordicDriver.BLEUUID,
+        service: Service = None,
+        conn_handle: int | None = None,
+    ) -> int:
+        """Find the value handle of a discovered characteristic
+
+        :param characteristic:  characteristic to find
+        :param service:         service containing characteristic, None searches every service
+        :param conn_handle:     connection to search, defaults to the connection made by connect()
+
+        :return: Characteristic value handle
+        """
+        handle = None
+
+        for serv in self.adapter.db_conns[self.conn_handle if conn_handle is None else conn_handle].services:
+            if service is None or serv.uuid.value == service.uuid.value:
+                for char in serv.chars:
+                    if char.uuid.value == characteristic.value:
+                        handle = char.handle_value
+
+        if handle is None:
+            raise NordicAdapter.NordicSemiException(f"Characteristic {str(characteristic)} not found")
+
+        return handle
+
     def characteristic_read(
-        self, characteristic: NordicDriver.BLEUUID, service: Service = None
+        self,
+        characteristic: NordicDriver.BLEUUID,
+        service: Service = None,
+        priority: Priority = Priority.Normal,
+        deadline: Deadline | float | None = None,
+        conn_handle: int | None = None,
     ) -> (NordicDriver.BLEGattStatusCode, bytes):
         """Perform GATT READ on characteristic
 
         :param characteristic:  characteristic to read from
         :param service:         service containing characteristic
+        :param priority:        scheduling priority against other operations on the connection
+        :param deadline:        Deadline bounding the whole read (raises DeadlineExceeded/Cancelled), or a
+                                time.monotonic() time after which the read is no longer worth issuing
+        :param conn_handle:     connection to read on, defaults to the connection made by connect()
 
         :return:  Tuple (GATT response status,
                          return data payload)
         """
-        if service is not None:
-            handle = None  # find handle to read from
-            for svc in self.adapter.db_conns[self.conn_handle].services:
-                if svc.uuid.value == service.uuid.value:
-                    for char in svc.chars:
-                        if char.uuid.value == characteristic.value:
-                            handle = char.handle_value
-
-            self.adapter.driver.ble_gattc_read(self.conn_handle, handle, 0)
-            ret = self.adapter.evt_sync[self.conn_handle].wait(evt=NordicDriver.BLEEvtID.gattc_evt_write_rsp)
-            return ret["status"], ret["data"]
-
-        if service is None:
-            gatt_rsp, data = self.adapter.read_req(self.conn_handle, characteristic)
-            return gatt_rsp, bytes(data)
+        if conn_handle is None:
+            conn_handle = self.conn_handle
+        handle = self.find_characteristic_handle(characteristic, service, conn_handle=conn_handle)
+
+        rsp_deadline = deadline if isinstance(deadline, Deadline) else None
+
+        def read():
+            request = self.gatt_requests.begin(conn_handle, GattOp.Read, handle)
+            try:
+                self.adapter.driver.ble_gattc_read(conn_handle, handle, 0)
+                return request.wait(timeout=self.GATT_RSP_TIMEOUT_S, deadline=rsp_deadline)
+            finally:
+                self.gatt_requests.cancel(request)
+
+        ret = self.gatt_scheduler.run(conn_handle, read, priority=priority, deadline=deadline)
+        return ret["status"], bytes(ret["data"] or [])
 
     def characteristic_write_request(
         self,
         characteristic: NordicDriver.BLEUUID,
         payload: bytes,
         service: Service = None,
-    ) -> None:
+        priority: Priority = Priority.Normal,
+        deadline: Deadline | float | None = None,
+        conn_handle: int | None = None,
+    ) -> NordicDriver.BLEGattStatusCode:
         """Perform GATT WRITE_REQ on characteristic
 
         :param characteristic:  characteristic to write to
         :param payload:         data payload to write
         :param service:         service containing characteristic
+        :param priority:        scheduling priority against other operations on the connection
+        :param deadline:        Deadline bounding the whole write (raises DeadlineExceeded/Cancelled), or a
+                                time.monotonic() time after which the write is no longer worth issuing
+        :param conn_handle:     connection to write on, defaults to the connection made by connect()
+
+        :return: GATT response status
         """
-        handle = None  # find handle to write to
-
-        if service is not None:
-            for serv in self.adapter.db_conns[self.conn_handle].services:
-                if serv.uuid.value == service.uuid.value:
-                    for char in serv.chars:
-                        if char.uuid.value == characteristic.value:
-                            handle = char.handle_value
-        else:
-            for serv in self.adapter.db_conns[self.conn_handle].services:
-                for char in serv.chars:
-                    if char.uuid.value == characteristic.value:
-                        handle = char.handle_value
+        handle = self.find_characteristic_handle(characteristic, service, conn_handle=conn_handle)
+        return self._write_request(handle, payload, priority=priority, deadline=deadline, conn_handle=conn_handle)
 
-        if handle is None:
-            raise NordicAdapter.NordicSemiException(f"Characteristic {str(characteristic)} not found")
+    def _write_request(
+        self,
+        handle: int,
+        payload: bytes | list[int],
+        priority: Priority = Priority.Normal,
+        deadline: Deadline | float | None = None,
+        conn_handle: int | None = None,
+    ) -> NordicDriver.BLEGattStatusCode:
+        op = self._submit_write_request(handle, payload, priority=priority, deadline=deadline, conn_handle=conn_handle)
+        return self.gatt_scheduler.wait(op, deadline=deadline)
+
+    def _submit_write_request(
+        self,
+        handle: int,
+        payload: bytes | list[int],
+        priority: Priority = Priority.Normal,
+        deadline: Deadline | float | None = None,
+        conn_handle: int | None = None,
+    ) -> GattOperation:
+        if conn_handle is None:
+            conn_handle = self.conn_handle
 
         write_params = NordicDriver.BLEGattcWriteParams(
             write_op=NordicDriver.BLEGattWriteOperation.write_req,
@@ -381,37 +817,35 @@ class CentralBleDriver(NordicAdapter.BLEDriverObserver, NordicAdapter.BLEAdapter
             offset=0,
         )
 
-        self.adapter.driver.ble_gattc_write(self.conn_handle, write_params)
-        self.adapter.evt_sync[self.conn_handle].wait(evt=NordicDriver.BLEEvtID.gattc_evt_write_rsp, timeout=10)
+        rsp_deadline = deadline if isinstance(deadline, Deadline) else None
+
+        def write():
+            request = self.gatt_requests.begin(conn_handle, GattOp.Write, handle)
+            try:
+                self.adapter.driver.ble_gattc_write(conn_handle, write_params)
+                return request.wait(timeout=self.GATT_RSP_TIMEOUT_S, deadline=rsp_deadline)["status"]
+            finally:
+                self.gatt_requests.cancel(request)
+
+        return self.gatt_scheduler.submit(conn_handle, write, priority=priority, deadline=deadline)
 
     def characteristic_write_command(
         self,
         characteristic: NordicDriver.BLEUUID,
         payload: bytes,
         service: Service = None,
+        conn_handle: int | None = None,
     ) -> None:
         """Perform GATT WRITE_CMD on characteristic
 
         :param characteristic:  characteristic to write to
         :param payload:         data payload to write
         :param service:         service containing characteristic
+        :param conn_handle:     connection to write on, defaults to the connection made by connect()
         """
-        handle = None  # find handle to write to
-
-        if service is not None:
-            for serv in self.adapter.db_conns[self.conn_handle].services:
-                if serv.uuid.value == service.uuid.value:
-                    for char in serv.chars:
-                        if char.uuid.value == characteristic.value:
-                            handle = char.handle_value
-        else:
-            for serv in self.adapter.db_conns[self.conn_handle].services:
-                for char in serv.chars:
-                    if char.uuid.value == characteristic.value:
-                        handle = char.handle_value
-
-        if handle is None:
-            raise NordicAdapter.NordicSemiException(f"Characteristic {str(characteristic)} not found")
+        if conn_handle is None:
+            conn_handle = self.conn_handle
+        handle = self.find_characteristic_handle(characteristic, service, conn_handle=conn_handle)
 
         write_params = NordicDriver.BLEGattcWriteParams(
             write_op=NordicDriver.BLEGattWriteOperation.write_cmd,
@@ -421,7 +855,7 @@ class CentralBleDriver(NordicAdapter.BLEDriverObserver, NordicAdapter.BLEAdapter
             offset=0,
         )
 
-        self.adapter.driver.ble_gattc_write(self.conn_handle, write_params)
+        self.adapter.driver.ble_gattc_write(conn_handle, write_params)
 
     def configure_client_characteristic_descriptor(
         self,
@@ -429,6 +863,8 @@ class CentralBleDriver(NordicAdapter.BLEDriverObserver, NordicAdapter.BLEAdapter
         en_ind: bool,
         en_ntf: bool,
         attr_handle: int | None = None,
+        conn_handle: int | None = None,
+        deadline: Deadline | None = None,
     ):
         """Update the characteristic's CCCD value to enable/disable indications and/or notifications
 
@@ -436,39 +872,127 @@ class CentralBleDriver(NordicAdapter.BLEDriverObserver, NordicAdapter.BLEAdapter
         :param en_ind:          enable/disable indications for characteristic
         :param en_ntf:          enable/disable notifications for characteristic
         :param attr_handle:     attribute handle
+        :param conn_handle:     connection to configure, defaults to the connection made by connect()
+        :param deadline:        deadline bounding the CCCD write
         """
         logger.debug(f"Configuring client characteristic descriptor on {characteristic}")
 
         assert isinstance(characteristic, NordicDriver.BLEUUID), "Invalid argument type"
 
-        if characteristic.base.base is not None and characteristic.base.type is None:
-            self.adapter.driver.ble_uuid_decode(characteristic.base.base, characteristic)
+        self.uuid_registry.normalize(characteristic)
 
-        assert isinstance(characteristic, NordicDriver.BLEUUID), "Invalid argument type"
-
-        if characteristic.base.base is not None and characteristic.base.type is None:
-            self.adapter.driver.ble_uuid_decode(characteristic.base.base, characteristic)
+        cccd = (0x01 if en_ntf else 0) | (0x02 if en_ind else 0)
 
-        cccd_list = [0, 0]
-        if en_ntf:
-            cccd_list[0] |= 0x01
-        if en_ind:
-            cccd_list[0] |= 0x02
+        if conn_handle is None:
+            conn_handle = self.conn_handle
 
-        cccd_handle: int | None = self.adapter.db_conns[self.conn_handle].get_cccd_handle(characteristic, attr_handle)
+        cccd_handle: int | None = self.adapter.db_conns[conn_handle].get_cccd_handle(characteristic, attr_handle)
         if cccd_handle is None:
             raise NordicAdapter.NordicSemiException("CCCD not found")
 
-        write_params = NordicDriver.BLEGattcWriteParams(
-            NordicDriver.BLEGattWriteOperation.write_req,
-            NordicDriver.BLEGattExecWriteFlag.unused,
-            cccd_handle,
-            cccd_list,
-            0,
+        self._request_cccd(conn_handle, characteristic, cccd)
+        status = self._write_request(
+            cccd_handle, [cccd, 0], priority=Priority.Control, deadline=deadline, conn_handle=conn_handle
         )
-        self.adapter.driver.ble_gattc_write(self.conn_handle, write_params)
-        result = self.adapter.evt_sync[self.conn_handle].wait(evt=NordicDriver.BLEEvtID.gattc_evt_write_rsp)
-        return result["status"]
+        if status == NordicDriver.BLEGattStatusCode.success:
+            self.cccd_values.setdefault(conn_handle, dict())[cccd_handle] = cccd
+        return status
+
+    def subscribe_many(
+        self,
+        notifications: Iterable[NordicDriver.BLEUUID] = (),
+        indications: Iterable[NordicDriver.BLEUUID] = (),
+        disable: Iterable[NordicDriver.BLEUUID] = (),
+        conn_handle: int | None = None,
+        deadline: Deadline | None = None,
+    ) -> dict[int, NordicDriver.BLEGattStatusCode]:
+        """Configure the CCCDs of many characteristics at once
+
+        Every CCCD handle is resolved from a single pass over the discovered attributes, writes whose value matches the
+        last value written on this connection are skipped, and the remaining writes are queued together so the
+        connection's scheduler issues them back-to-back (ATT allows a single outstanding write request per link).
+
+        :param notifications:   characteristics to enable notifications on
+        :param indications:     characteristics to enable indications on (combined with notifications if in both)
+        :param disable:         characteristics to disable notifications and indications on
+        :param conn_handle:     connection to configure, defaults to the connection made by connect()
+        :param deadline:        deadline bounding the writes
+
+        :return: Dictionary of GATT statuses by characteristic UUID value (success for skipped writes)
+        """
+        config = {char.value: (char, 0) for char in disable}  # type: dict[int, tuple[NordicDriver.BLEUUID, int]]
+        for bit, characteristics in ((0x01, notifications), (0x02, indications)):
+            for char in characteristics:
+                config[char.value] = (char, config.get(char.value, (char, 0))[1] | bit)
+
+        return self._configure_cccds(self.conn_handle if conn_handle is None else conn_handle, config, deadline)
+
+    def restore_subscriptions(
+        self, conn_handle: int | None = None, deadline: Deadline | None = None
+    ) -> dict[int, NordicDriver.BLEGattStatusCode]:
+        """Re-enable every notification/indication previously configured on the peer, e.g. after a reconnect
+
+        :param conn_handle:     connection to configure, defaults to the connection made by connect()
+        :param deadline:        deadline bounding the writes
+
+        :return: Dictionary of GATT statuses by characteristic UUID value
+        """
+        if conn_handle is None:
+            conn_handle = self.conn_handle
+
+        requested = self.cccd_subscriptions.get(self._link_address(conn_handle), dict())
+        return self._configure_cccds(conn_handle, {k: v for k, v in requested.items() if v[1]}, deadline)
+
+    def _cccd_index(self, conn_handle: int) -> dict[int, int]:
+        """Map characteristic UUID values to their CCCD handle in one pass over the discovered attributes"""
+        index = dict()
+        for serv in self.adapter.db_conns[conn_handle].services:
+            for char in serv.chars:
+                for desc in char.descs:
+                    if desc.uuid.value == self.CCCD_UUID:
+                        index.setdefault(char.uuid.value, desc.handle)
+                        break
+        return index
+
+    def _request_cccd(self, conn_handle: int, characteristic: NordicDriver.BLEUUID, cccd: int) -> None:
+        peer = self._link_address(conn_handle)
+        if peer is not None:
+            self.cccd_subscriptions.setdefault(peer, dict())[characteristic.value] = (characteristic, cccd)
+
+    def _configure_cccds(
+        self,
+        conn_handle: int,
+        config: dict[int, tuple[NordicDriver.BLEUUID, int]],
+        deadline: Deadline | None,
+    ) -> dict[int, NordicDriver.BLEGattStatusCode]:
+        index = self._cccd_index(conn_handle)
+        missing = [str(char) for value, (char, _) in config.items() if value not in index]
+        if missing:
+            raise NordicAdapter.NordicSemiException(f"CCCD not found for {', '.join(missing)}")
+
+        known = self.cccd_values.setdefault(conn_handle, dict())
+        statuses = dict()  # type: dict[int, NordicDriver.BLEGattStatusCode]
+        pending = []  # type: list[tuple[int, int, int, GattOperation]]
+
+        for value, (char, cccd) in config.items():
+            self._request_cccd(conn_handle, char, cccd)
+            handle = index[value]
+            if known.get(handle) == cccd:
+                statuses[value] = NordicDriver.BLEGattStatusCode.success
+                continue
+            op = self._submit_write_request(
+                handle, [cccd, 0], priority=Priority.Control, deadline=deadline, conn_handle=conn_handle
+            )
+            pending.append((value, handle, cccd, op))
+
+        logger.debug(f"conn_handle {conn_handle}: {len(pending)} CCCD writes, {len(statuses)} already configured")
+
+        for value, handle, cccd, op in pending:
+            statuses[value] = self.gatt_scheduler.wait(op, deadline=deadline)
+            if statuses[value] == NordicDriver.BLEGattStatusCode.success:
+                known[handle] = cccd
+
+        return statuses
 
     def enable_notification(self, characteristic: NordicDriver.BLEUUID) -> None:
         """Enable notifications on characteristic
@@ -476,7 +1000,7 @@ class CentralBleDriver(NordicAdapter.BLEDriverObserver, NordicAdapter.BLEAdapter
         :param characteristic:  characteristic to enable notifications on
         """
         logger.debug(f"Enabling notifications on {characteristic}")
-        self.adapter.enable_notification(self.conn_handle, characteristic)
+        self.configure_client_characteristic_descriptor(characteristic, en_ind=False, en_ntf=True)
 
     def disable_notification(self, characteristic: NordicDriver.BLEUUID) -> None:
         """Disable notifications on characteristic
@@ -484,14 +1008,16 @@ class CentralBleDriver(NordicAdapter.BLEDriverObserver, NordicAdapter.BLEAdapter
         :param characteristic:  characteristics to disable notifications on
         """
         logger.debug(f"Disabling notifications on {characteristic}")
-        self.adapter.disable_notification(self.conn_handle, characteristic)
+        self.configure_client_characteristic_descriptor(characteristic, en_ind=False, en_ntf=False)
 
     def on_notification(self, ble_adapter, conn_handle, uuid, data):
         logger.debug(f"conn_handle {conn_handle}: {uuid} = {data}")
+        for listener in self.notification_listeners:
+            listener(conn_handle, uuid, data)
         for svc in self.services.values():
             for char_uuid, char in svc.characteristics.items():
                 if char_uuid == uuid:
-                    char.on_notification(payload=data)
+                    self.dispatcher.submit((conn_handle, char_uuid), char.handle_notification, payload=data)
 
     def enable_indication(self, characteristic: NordicDriver.BLEUUID) -> None:
         """Enable indications on characteristic
@@ -499,7 +1025,7 @@ class CentralBleDriver(NordicAdapter.BLEDriverObserver, NordicAdapter.BLEAdapter
         :param characteristic:  characteristic to enable indications on
         """
         logger.debug(f"Enabling indications on {characteristic}")
-        self.adapter.enable_indication(self.conn_handle, characteristic)
+        self.configure_client_characteristic_descriptor(characteristic, en_ind=True, en_ntf=False)
 
     def disable_indication(self, characteristic: NordicDriver.BLEUUID):
         """Disable notifications on characteristic
@@ -507,21 +1033,23 @@ class CentralBleDriver(NordicAdapter.BLEDriverObserver, NordicAdapter.BLEAdapter
         :param characteristic:  characteristics to disable notifications on
         """
         logger.debug(f"Disabling indications on {characteristic}")
-        self.adapter.disable_notification(self.conn_handle, characteristic)
+        self.configure_client_characteristic_descriptor(characteristic, en_ind=False, en_ntf=False)
 
     def on_indication(self, ble_adapter, conn_handle, uuid, data):
         logger.debug(f"conn_handle {conn_handle}: {uuid} = {data}")
+        for listener in self.notification_listeners:
+            listener(conn_handle, uuid, data)
         for svc in self.services.values():
             for char_uuid, char in svc.characteristics.items():
                 if char_uuid == uuid:
-                    char.on_indication(payload=data)
+                    self.dispatcher.submit((conn_handle, char_uuid), char.handle_indication, payload=data)
 
     def add_base_uuid(self, base: NordicDriver.BLEUUIDBase) -> None:
         """Add base UUID to BLE driver for scanning and connecting
 
-        :param base: base UUID to add
+        :param base: base UUID to add, only registered with the adapter once (see uuid_registry)
         """
-        self.adapter.driver.ble_vs_uuid_add(base)
+        self.uuid_registry.register(base)
 
     def get_discovered_services(
         self,
@@ -553,21 +1081,50 @@ class CentralBleDriver(NordicAdapter.BLEDriverObserver, NordicAdapter.BLEAdapter
         return "\n".join(lines)
 
     def on_gap_evt_connected(self, ble_driver, conn_handle, peer_addr, role, conn_params):
+        addr = address_str(tuple(peer_addr.addr))
+        logger.info(f"Connected to 0x{addr}")
+
+        self.links[addr] = conn_handle
+        self.connection_count += 1
+
+        discovery = self.discovery
+        if discovery is not None and discovery.link_up(addr, conn_handle):
+            if discovery.on_connected is not None:
+                threading.Thread(
+                    target=discovery.on_connected, args=(addr, conn_handle), name=f"Discovery-{addr}", daemon=True
+                ).start()
+            self._discovery_next()
+            return
+
         self.bd_address = peer_addr.addr.copy()
         self.bd_address.reverse()
 
-        addr = "".join("{0:02X}".format(b) for b in peer_addr.addr)
-        logger.info(f"Connected to 0x{addr}")
+        self.peer_addr = addr
 
         self.actual_conn_params = conn_params
         self.conn_q.put(conn_handle)
 
     def on_gap_evt_disconnected(self, ble_driver, conn_handle, reason):
         logger.warning(f"Disconnected: {conn_handle} {reason}")
-        self.conn_handle = None
-        self.actual_conn_params = None
-        self.actual_att_mtu = None
-        self.connection_status = ConnectionStatus.NoConnection
+        self.gatt_requests.fail_connection(conn_handle, reason)
+        self.gatt_scheduler.close_connection(conn_handle, reason)
+
+        for addr, handle in list(self.links.items()):
+            if handle == conn_handle:
+                del self.links[addr]
+        self.security_levels.pop(conn_handle, None)
+        self.cccd_values.pop(conn_handle, None)
+        self.rssi_monitors.pop(conn_handle, None)
+
+        if self.discovery is None or self.discovery.link_down(conn_handle) is None:
+            self.conn_handle = None
+            self.peer_addr = None
+            self.actual_conn_params = None
+            self.actual_att_mtu = None
+            self.connection_status = ConnectionStatus.NoConnection
+
+        # A link slot was released, connect to the next queued advertiser
+        self._discovery_next()
 
     def on_gap_evt_sec_params_request(self, ble_driver, conn_handle, peer_params):
         logger.debug(peer_params)
@@ -595,6 +1152,13 @@ class CentralBleDriver(NordicAdapter.BLEDriverObserver, NordicAdapter.BLEAdapter
 
     def on_gap_evt_timeout(self, ble_driver, conn_handle, src):
         logger.debug(f"src={src}")
+        if src == NordicDriver.BLEGapTimeoutSrc.conn and self.discovery is not None:
+            addr = self.discovery.link_failed()
+            if addr is not None:
+                logger.warning(f"Timeout connecting to discovered 0x{addr}")
+                self._discovery_next()
+                return
+
         if src in [
             NordicDriver.BLEGapTimeoutSrc.scan,
             NordicDriver.BLEGapTimeoutSrc.conn,
@@ -602,29 +1166,41 @@ class CentralBleDriver(NordicAdapter.BLEDriverObserver, NordicAdapter.BLEAdapter
             ble_driver.ble_gap_scan_start()
 
     def on_gap_evt_adv_report(self, ble_driver, conn_handle, peer_addr, rssi, adv_type, adv_data):
-        addr_str = "".join("{0:02X}".format(b) for b in peer_addr.addr)
-
-        if addr_str not in self.scan_data:
-            self.scan_data[addr_str] = dict()
-
-        for key, val in adv_data.records.items():
-            if key not in self.scan_data[addr_str]:
-                self.scan_data[addr_str][key] = []
-            self.scan_data[addr_str][key] = val
-
-        if NordicDriver.BLEAdvData.Types.complete_local_name in adv_data.records:
-            name = f'{"".join(chr(e) for e in adv_data.records[NordicDriver.BLEAdvData.Types.complete_local_name])}, '
-        elif NordicDriver.BLEAdvData.Types.short_local_name in adv_data.records:
-            name = f'{"".join(chr(e) for e in adv_data.records[NordicDriver.BLEAdvData.Types.short_local_name])}, '
-        else:
-            name = "N/A"
-
-        self.scan_data[addr_str]["rssi"] = rssi
-
-        logger.debug(
-            f"Address: 0x{addr_str}, Device Name: {name}: "
-            f'{[key + ": " + str(val) if isinstance(key, str) else key.name + ": " + str(val) for key, val in self.scan_data[addr_str].items()]}'
-        )
+        addr_str = address_str(tuple(peer_addr.addr))
+
+        # Reject filtered advertisers before anything is decoded or stored (only the connect() target bypasses it)
+        if (
+            self.scan_filter is not None
+            and addr_str != self.target_addr
+            and not self.scan_filter.matches(peer_addr, rssi, adv_data)
+        ):
+            return
+
+        for listener in self.adv_report_listeners:
+            listener(peer_addr, rssi, adv_type, adv_data)
+
+        adv = self.adv_parser.parse(adv_data)
+
+        entry = self.scan_data.get(addr_str)
+        if entry is None:
+            entry = self.scan_data[addr_str] = dict()
+
+        entry.update(adv.records)
+        entry["rssi"] = rssi
+        if adv.name is not None:
+            entry["name"] = adv.name
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Address: 0x{addr_str}, Device Name: {entry.get('name', 'N/A')}, rssi: {rssi}, {adv}")
+
+        discovery = self.discovery
+        if discovery is not None:
+            if discovery.wants(addr_str, rssi, adv):
+                if discovery.offer(addr_str, peer_addr, discovery.max_links - len(self.links)):
+                    self._discovery_connect(addr_str, peer_addr)
+                else:
+                    logger.debug(f"Queued discovered 0x{addr_str}")
+            return
 
         if self.connection_status is ConnectionStatus.Connecting and self.target_addr == addr_str:
             logger.info(f"Connecting to 0x{addr_str}")
@@ -661,16 +1237,39 @@ class CentralBleDriver(NordicAdapter.BLEDriverObserver, NordicAdapter.BLEAdapter
         logger.debug(f"Authentication status: {str(auth_status)}")
 
     def on_gap_evt_auth_key_request(self, ble_driver, conn_handle, key_type):
-        passkey = self.passkey_q.get(timeout=10)
+        # Reply on the event thread when the passkey is already queued, otherwise wait for it off the event thread
+        try:
+            self._auth_key_reply(ble_driver, conn_handle, key_type, self.passkey_q.get_nowait())
+        except Empty:
+            self.dispatcher.submit(
+                ("auth_key", conn_handle), self._wait_auth_key_reply, ble_driver, conn_handle, key_type
+            )
+
+    def _wait_auth_key_reply(self, ble_driver, conn_handle, key_type):
+        try:
+            passkey = self.passkey_q.get(timeout=10)
+        except Empty:
+            logger.error(f"conn_handle {conn_handle}: no passkey provided")
+            return
+        self._auth_key_reply(ble_driver, conn_handle, key_type, passkey)
+
+    @staticmethod
+    def _auth_key_reply(ble_driver, conn_handle, key_type, passkey):
         pk = NordicDriver.util.list_to_uint8_array(passkey)
         NordicDriver.driver.sd_ble_gap_auth_key_reply(ble_driver.rpc_adapter, conn_handle, key_type, pk.cast())
 
     def on_gap_evt_conn_sec_update(self, ble_driver, conn_handle, conn_sec):
         logger.debug(f"conn_sec={conn_sec}")
+        self.security_levels[conn_handle] = conn_sec.sec_mode.lv
 
     def on_gap_evt_rssi_changed(self, ble_driver, conn_handle, rssi):
         logger.debug(f"rssi={rssi}")
 
+        monitor = self.rssi_monitors.get(conn_handle)
+        if monitor is not None:
+            for callback, rising in monitor.update(rssi):
+                self.dispatcher.submit(("rssi", conn_handle), callback, conn_handle, rssi, rising)
+
     def on_gattc_evt_write_rsp(
         self,
         ble_driver,
@@ -686,11 +1285,24 @@ class CentralBleDriver(NordicAdapter.BLEDriverObserver, NordicAdapter.BLEAdapter
             f"status={status}, error_handle={error_handle}, attr_handle={attr_handle}, "
             f"write_op={write_op}, offset={offset}, data={data}"
         )
+        self.gatt_requests.complete(
+            conn_handle,
+            GattOp.Write,
+            attr_handle,
+            error_handle=error_handle,
+            status=status,
+            write_op=write_op,
+            offset=offset,
+            data=data,
+        )
 
     def on_gattc_evt_read_rsp(self, ble_driver, conn_handle, status, error_handle, attr_handle, offset, data):
         logger.debug(
             f"status={status}, error_handle={error_handle}, attr_handle={attr_handle}, " f"offset={offset}, data={data}"
         )
+        self.gatt_requests.complete(
+            conn_handle, GattOp.Read, attr_handle, error_handle=error_handle, status=status, offset=offset, data=data
+        )
 
     def on_gattc_evt_hvx(self, ble_driver, conn_handle, status, error_handle, attr_handle, hvx_type, data):
         logger.debug(
@@ -7,11 +7,15 @@ BLE Characteristic object
 
 from __future__ import annotations
 
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Callable
 import logging
 
 from pc_ble_driver_py import ble_driver as NordicDriver
 
+from deadline import Deadline
+from gatt_scheduler import Priority
+from subscription import NotificationSubscription, OverflowPolicy
+
 
 if TYPE_CHECKING:
     from central_ble_driver import CentralBleDriver
@@ -22,6 +26,8 @@ class Characteristic:
     """Characteristic interface for handling specific characteristic"""
 
     uuid = None  # type: (NordicDriver.BLEUUID | None)
+    static = False  # value never changes for a given peer and firmware revision, reads may be served from cache
+    priority = Priority.Normal  # scheduling priority of the characteristic's reads and write requests
 
     def __init__(self, nrf: CentralBleDriver, service: Service) -> None:
         self.nrf = nrf
@@ -33,34 +39,59 @@ class Characteristic:
         self.rx_bytes = bytes()
         self.data = dict()
 
-    def read(self) -> bool:
+        self.notification_listeners = list()  # type: list[Callable[[bytes], None]]
+        self.subscriptions = list()  # type: list[NotificationSubscription]
+
+    def read(self, deadline: Deadline | None = None) -> bool:
         """Perform GATT READ on characteristic and stores the read bytes in characteristic object's rx_bytes variable.
 
+        :param deadline: deadline bounding the read, raises DeadlineExceeded or Cancelled
         :return: Boolean indicating if the GATT status was success or not
         """
         # self.nrf.adapter.service_discovery(self.nrf.conn_handle, self.service.uuid)
 
+        cache_key = None
+        if self.static and self.service.cache is not None:
+            cache_key = self.service.cache_key()
+            if cache_key is not None:
+                cache_key += (self.uuid.value,)
+                rx_bytes = self.service.cache.get(cache_key)
+                if rx_bytes is not None:
+                    self.status, self.rx_bytes = NordicDriver.BLEGattStatusCode.success, rx_bytes
+                    return True
+
         # By default, don't use service (mainly for custom services with same Characteristic UUIDs)
-        self.status, self.rx_bytes = self.nrf.characteristic_read(characteristic=self.uuid, service=None)
+        self.status, self.rx_bytes = self.nrf.characteristic_read(
+            characteristic=self.uuid, service=None, priority=self.priority, deadline=deadline
+        )
 
         if self.status is not NordicDriver.BLEGattStatusCode.success:
             self.logger.error(str(self.status))
             return False
 
+        if cache_key is not None:
+            self.service.cache.put(cache_key, self.rx_bytes)
+
         return True
 
     def write_request(self, *args, **kwargs) -> None:
         """Perform GATT WRITE_REQ on characteristic
 
         :param args:
-        :param kwargs:
+        :param kwargs: payload, and optionally a deadline bounding the write
         :return: None
         """
         del args  # unused
 
         # By default, don't use service (mainly for custom services with same Characteristic UUIDs)
         if "payload" in kwargs:
-            self.nrf.characteristic_write_request(characteristic=self.uuid, payload=kwargs["payload"], service=None)
+            self.nrf.characteristic_write_request(
+                characteristic=self.uuid,
+                payload=kwargs["payload"],
+                service=None,
+                priority=self.priority,
+                deadline=kwargs.get("deadline"),
+            )
 
     def write_command(self, *args, **kwargs) -> None:
         """Perform GATT WRITE_CMD on characteristic
@@ -87,6 +118,49 @@ class Characteristic:
     def disable_indication(self) -> None:
         self.nrf.disable_indication(characteristic=self.uuid)
 
+    def subscribe(
+        self,
+        maxsize: int = 1024,
+        overflow_policy: OverflowPolicy = OverflowPolicy.DropOldest,
+        block_timeout: float | None = None,
+    ) -> NotificationSubscription:
+        """Create a bounded subscription queue receiving this characteristic's notification and indication payloads
+
+        :param maxsize: maximum number of queued payloads
+        :param overflow_policy: behavior when a payload arrives while the queue is full
+        :param block_timeout: maximum time the event thread blocks with OverflowPolicy.Block before dropping
+        :return: Subscription object, close it to stop receiving payloads
+        """
+        subscription = NotificationSubscription(
+            characteristic=self, maxsize=maxsize, overflow_policy=overflow_policy, block_timeout=block_timeout
+        )
+        self.subscriptions.append(subscription)
+        self.notification_listeners.append(subscription.put)
+        return subscription
+
+    def unsubscribe(self, subscription: NotificationSubscription) -> None:
+        """Stop delivering payloads to a subscription
+
+        :param subscription: subscription returned by subscribe()
+        """
+        if subscription in self.subscriptions:
+            self.subscriptions.remove(subscription)
+            self.notification_listeners.remove(subscription.put)
+
+    def handle_notification(self, payload: bytes) -> None:
+        """Deliver a notification payload to listeners/subscriptions, then to on_notification"""
+        payload = bytes(payload)
+        for listener in self.notification_listeners:
+            listener(payload)
+        self.on_notification(payload=payload)
+
+    def handle_indication(self, payload: bytes) -> None:
+        """Deliver an indication payload to listeners/subscriptions, then to on_indication"""
+        payload = bytes(payload)
+        for listener in self.notification_listeners:
+            listener(payload)
+        self.on_indication(payload=payload)
+
     def on_notification(self, payload: bytes):
         pass
 
@@ -0,0 +1,597 @@
+#!/usr/bin/env python3.10
+# -*- coding: utf-8 -*-
+
+"""
+Long-lived BLE adapter daemon with a local Unix-domain socket RPC
+
+The daemon owns one or more opened CentralBleDriver objects and keeps their connections warm between client
+sessions, so short scripts skip the open/ble_enable/connect/MTU exchange/discovery cost of every run.
+
+Wire protocol (little-endian), every message is a fixed header followed by a payload:
+
+    header  = type (u8), status (u8), request id (u16), payload length (u32)
+
+Request payloads always start with the adapter index (u8). UUIDs are sent as their 16-bit value, resolved against the
+discovered characteristics of the connection, and peer addresses as the 6 raw address bytes (same order as the hex
+strings used by CentralBleDriver).
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import os
+import socket
+import socketserver
+import struct
+import threading
+
+from enum import IntEnum
+from queue import Queue, Empty, Full
+from typing import Callable
+
+from pc_ble_driver_py import ble_driver as NordicDriver
+
+from central_ble_driver import CentralBleDriver, ConnectionStatus
+from deadline import Deadline
+
+logger = logging.getLogger("daemon")
+
+HEADER = struct.Struct("<BBHI")
+
+_ADAPTER = struct.Struct("<B")
+_SCAN_REQ = struct.Struct("<BI")  # adapter, timeout (ms)
+_SCAN_ENTRY = struct.Struct("<6sbB")  # address, rssi, name length
+_CONNECT_REQ = struct.Struct("<B6sB")  # adapter, address, flags
+_CONNECT_RSP = struct.Struct("<HH")  # conn_handle, att mtu
+_UUID_REQ = struct.Struct("<BH")  # adapter, uuid
+_READ_RSP = struct.Struct("<B")  # gatt status
+_OPCODE_REQ = struct.Struct("<BHHIB")  # adapter, tx uuid, rx uuid, timeout (ms), opcode
+_NOTIFICATION = struct.Struct("<BHH")  # adapter, conn_handle, uuid
+
+CONNECT_FLAG_EXCHANGE_MTU = 0x01
+CONNECT_FLAG_DISCOVER_SERVICES = 0x02
+
+# Outbound messages queued per client, a client falling further behind on notifications is dropped
+CLIENT_OUTBOX_SIZE = 1024
+
+
+class MessageType(IntEnum):
+    Status = 0x01
+    Scan = 0x02
+    Connect = 0x03
+    Disconnect = 0x04
+    Read = 0x05
+    WriteRequest = 0x06
+    WriteCommand = 0x07
+    OpCode = 0x08
+    Subscribe = 0x09
+    Unsubscribe = 0x0A
+    Notification = 0x80
+
+
+class MessageStatus(IntEnum):
+    Ok = 0x00
+    Error = 0x01
+
+
+class DaemonError(Exception):
+    """Error reported by the daemon for a request"""
+
+
+def pack_message(msg_type: int, req_id: int, payload: bytes = bytes(), status: int = MessageStatus.Ok) -> bytes:
+    """Pack a single protocol message
+
+    :param msg_type: message type
+    :param req_id: request id the message belongs to (0 for unsolicited messages)
+    :param payload: message payload
+    :param status: message status
+    :return: Packed message bytes
+    """
+    return HEADER.pack(msg_type, status, req_id, len(payload)) + payload
+
+
+def recv_exact(sock: socket.socket, n: int) -> bytes:
+    """Receive exactly n bytes from a socket
+
+    :param sock: socket to receive from
+    :param n: number of bytes
+    :return: Received bytes
+    """
+    buf = bytearray(n)
+    view = memoryview(buf)
+    while n:
+        read = sock.recv_into(view[-n:], n)
+        if read == 0:
+            raise ConnectionResetError("Socket closed")
+        n -= read
+    return bytes(buf)
+
+
+def recv_message(sock: socket.socket) -> tuple[int, int, int, bytes]:
+    """Receive a single protocol message
+
+    :param sock: socket to receive from
+    :return: Tuple (message type, status, request id, payload)
+    """
+    msg_type, status, req_id, length = HEADER.unpack(recv_exact(sock, HEADER.size))
+    return msg_type, status, req_id, recv_exact(sock, length) if length else bytes()
+
+
+class _AdapterSlot:
+    """Daemon bookkeeping for a single owned adapter"""
+
+    def __init__(self, index: int, nrf: CentralBleDriver) -> None:
+        self.index = index
+        self.nrf = nrf
+        self.lock = threading.RLock()
+        self.enabled_ntf = set()  # type: set[int]
+        self.opcode_waiters = dict()  # type: dict[tuple[int, int], list[Queue]]
+        self.waiters_lock = threading.Lock()  # never held while waiting, unlike lock
+        self.subscribers = dict()  # type: dict[int, set[_DaemonRequestHandler]]
+
+        nrf.notification_listeners.append(self.on_notification)
+
+    def on_notification(self, conn_handle: int, uuid: NordicDriver.BLEUUID, data: list[int]) -> None:
+        # Runs on the driver's event thread: only queue, clients write from their own threads
+        if data:
+            # Same-opcode requests of several clients are answered in the order they were written
+            with self.waiters_lock:
+                waiters = self.opcode_waiters.get((uuid.value, data[0]))
+                q = waiters.pop(0) if waiters else None
+                if waiters is not None and not waiters:
+                    del self.opcode_waiters[(uuid.value, data[0])]
+            if q is not None:
+                q.put(bytes(data[1:]))
+
+        payload = _NOTIFICATION.pack(self.index, conn_handle, uuid.value) + bytes(data)
+        for handler in tuple(self.subscribers.get(uuid.value, ())):
+            handler.notify(pack_message(MessageType.Notification, 0, payload))
+
+    def characteristic_uuid(self, uuid: int) -> NordicDriver.BLEUUID:
+        """Look up the UUID of a discovered characteristic by its 16-bit value
+
+        The protocol only carries the value, the discovered UUID also carries the (vendor specific) base type that
+        CCCD lookups compare.
+
+        :param uuid: characteristic UUID value
+        :return: UUID object of the discovered characteristic
+        """
+        for service in self.nrf.adapter.db_conns[self.nrf.conn_handle].services:
+            for char in service.chars:
+                if char.uuid.value == uuid:
+                    return char.uuid
+        raise DaemonError(f"Characteristic 0x{uuid:04X} not discovered on adapter {self.index}")
+
+    def ensure_notifications(self, uuid: int) -> None:
+        if uuid not in self.enabled_ntf:
+            self.nrf.enable_notification(characteristic=self.characteristic_uuid(uuid))
+            self.enabled_ntf.add(uuid)
+
+    def add_opcode_waiter(self, key: tuple[int, int], q: Queue) -> None:
+        with self.waiters_lock:
+            self.opcode_waiters.setdefault(key, []).append(q)
+
+    def remove_opcode_waiter(self, key: tuple[int, int], q: Queue) -> None:
+        with self.waiters_lock:
+            waiters = self.opcode_waiters.get(key)
+            if waiters and q in waiters:
+                waiters.remove(q)
+            if not waiters:
+                self.opcode_waiters.pop(key, None)
+
+    def on_disconnected(self) -> None:
+        self.enabled_ntf.clear()
+
+
+class _DaemonRequestHandler(socketserver.BaseRequestHandler):
+    """Per-client request handler, one thread per client connection"""
+
+    server: BleDaemon
+
+    def setup(self) -> None:
+        self.outbox = Queue(maxsize=CLIENT_OUTBOX_SIZE)  # type: Queue[bytes | None]
+        self.dropped = False
+        self.writer = threading.Thread(target=self._write_loop, name="BleDaemonClientWriter", daemon=True)
+        self.writer.start()
+
+    def send(self, data: bytes) -> None:
+        """Queue a response, called from the client's own thread"""
+        self.outbox.put(data)
+
+    def notify(self, data: bytes) -> None:
+        """Queue a notification without blocking, dropping the client if its outbox is full"""
+        try:
+            self.outbox.put_nowait(data)
+        except Full:
+            if not self.dropped:
+                self.dropped = True
+                logger.warning("Dropping client not keeping up with notifications")
+                try:
+                    # Wakes up handle(), whose finish() unsubscribes the client
+                    self.request.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+    def _write_loop(self) -> None:
+        failed = False
+        while True:
+            data = self.outbox.get()
+            if data is None:
+                return
+            if failed:
+                continue  # keep draining so send() never blocks on a dead client
+            try:
+                self.request.sendall(data)
+            except OSError:
+                failed = True
+
+    def handle(self) -> None:
+        while True:
+            try:
+                msg_type, _, req_id, payload = recv_message(self.request)
+            except (ConnectionResetError, OSError):
+                break
+
+            try:
+                rsp = self.server.dispatch(self, msg_type, payload)
+            except Exception as e:
+                logger.error(f"Request 0x{msg_type:02X} failed: {e}")
+                self.send(pack_message(msg_type, req_id, str(e).encode("utf-8"), status=MessageStatus.Error))
+            else:
+                self.send(pack_message(msg_type, req_id, rsp))
+
+    def finish(self) -> None:
+        self.server.drop_subscriber(self)
+
+        # Unblock the writer even if the outbox is full, its socket is closed anyway
+        while True:
+            try:
+                self.outbox.put_nowait(None)
+                break
+            except Full:
+                try:
+                    self.outbox.get_nowait()
+                except Empty:
+                    pass
+        self.writer.join()
+
+
+class BleDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Unix-domain socket server owning opened CentralBleDriver objects"""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, drivers: list[CentralBleDriver]) -> None:
+        """Initialize daemon server
+
+        :param socket_path: Unix-domain socket path to listen on
+        :param drivers: opened central BLE driver objects owned by the daemon, addressed by list index
+        """
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+        self.socket_path = socket_path
+        self.adapters = [_AdapterSlot(i, nrf) for i, nrf in enumerate(drivers)]
+        self._handlers = {
+            MessageType.Status: self._status,
+            MessageType.Scan: self._scan,
+            MessageType.Connect: self._connect,
+            MessageType.Disconnect: self._disconnect,
+            MessageType.Read: self._read,
+            MessageType.WriteRequest: self._write_request,
+            MessageType.WriteCommand: self._write_command,
+            MessageType.OpCode: self._opcode,
+            MessageType.Subscribe: self._subscribe,
+            MessageType.Unsubscribe: self._unsubscribe,
+        }  # type: dict[int, Callable[[_DaemonRequestHandler, bytes], bytes]]
+
+        super().__init__(socket_path, _DaemonRequestHandler)
+
+    def server_close(self) -> None:
+        super().server_close()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+    def dispatch(self, handler: _DaemonRequestHandler, msg_type: int, payload: bytes) -> bytes:
+        try:
+            fn = self._handlers[msg_type]
+        except KeyError:
+            raise DaemonError(f"Unknown message type 0x{msg_type:02X}")
+        return fn(handler, payload)
+
+    def drop_subscriber(self, handler: _DaemonRequestHandler) -> None:
+        for slot in self.adapters:
+            with slot.lock:
+                for subscribers in slot.subscribers.values():
+                    subscribers.discard(handler)
+
+    def _slot(self, payload: bytes) -> _AdapterSlot:
+        (index,) = _ADAPTER.unpack_from(payload)
+        try:
+            return self.adapters[index]
+        except IndexError:
+            raise DaemonError(f"Unknown adapter {index}")
+
+    @staticmethod
+    def _require_connection(slot: _AdapterSlot) -> None:
+        if slot.nrf.conn_handle is None:
+            slot.on_disconnected()
+            raise DaemonError(f"Adapter {slot.index} not connected")
+
+    def _status(self, handler: _DaemonRequestHandler, payload: bytes) -> bytes:
+        slot = self._slot(payload)
+        conn_handle = slot.nrf.conn_handle if slot.nrf.conn_handle is not None else 0xFFFF
+        addr = bytes.fromhex(slot.nrf.target_addr) if slot.nrf.target_addr else bytes(6)
+        return struct.pack("<BH6s", slot.nrf.connection_status, conn_handle, addr)
+
+    def _scan(self, handler: _DaemonRequestHandler, payload: bytes) -> bytes:
+        slot = self._slot(payload)
+        _, timeout_ms = _SCAN_REQ.unpack_from(payload)
+
+        with slot.lock:
+            # The SoftDevice timeout has whole seconds, the deadline stops the scan at the requested time
+            scan_params = NordicDriver.BLEGapScanParams(
+                interval_ms=slot.nrf.scan_parameters.interval_ms,
+                window_ms=slot.nrf.scan_parameters.window_ms,
+                timeout_s=max(1, math.ceil(timeout_ms / 1000)),
+            )
+            slot.nrf.scan(scan_params=scan_params, deadline=Deadline(timeout_ms / 1000))
+            scan_data = slot.nrf.get_scan_data()
+
+        entries = [struct.pack("<H", len(scan_data))]
+        for addr, data in scan_data.items():
+            name = data.get("name", "").encode("utf-8")[:0xFF]
+            entries.append(_SCAN_ENTRY.pack(bytes.fromhex(addr), data.get("rssi", 0), len(name)) + name)
+        return b"".join(entries)
+
+    def _connect(self, handler: _DaemonRequestHandler, payload: bytes) -> bytes:
+        slot = self._slot(payload)
+        _, addr, flags = _CONNECT_REQ.unpack_from(payload)
+        target = addr.hex().upper()
+
+        with slot.lock:
+            nrf = slot.nrf
+            warm = nrf.conn_handle is not None and nrf.target_addr == target
+            if not warm:
+                if nrf.conn_handle is not None:
+                    nrf.disconnect()
+                slot.on_disconnected()
+                nrf.connect(
+                    target_mac_address=target,
+                    exchange_att_mcu_upon_connect=bool(flags & CONNECT_FLAG_EXCHANGE_MTU),
+                    discover_services_upon_connect=bool(flags & CONNECT_FLAG_DISCOVER_SERVICES),
+                )
+            if nrf.conn_handle is None:
+                raise DaemonError(f"Failed to connect to 0x{target}")
+
+            return _CONNECT_RSP.pack(nrf.conn_handle, nrf.actual_att_mtu or 0)
+
+    def _disconnect(self, handler: _DaemonRequestHandler, payload: bytes) -> bytes:
+        slot = self._slot(payload)
+        with slot.lock:
+            if slot.nrf.conn_handle is not None:
+                slot.nrf.disconnect()
+            slot.on_disconnected()
+        return bytes()
+
+    def _read(self, handler: _DaemonRequestHandler, payload: bytes) -> bytes:
+        slot = self._slot(payload)
+        _, uuid = _UUID_REQ.unpack_from(payload)
+
+        with slot.lock:
+            self._require_connection(slot)
+            status, data = slot.nrf.characteristic_read(characteristic=slot.characteristic_uuid(uuid))
+
+        return _READ_RSP.pack(status) + data
+
+    def _write_request(self, handler: _DaemonRequestHandler, payload: bytes) -> bytes:
+        slot = self._slot(payload)
+        _, uuid = _UUID_REQ.unpack_from(payload)
+
+        with slot.lock:
+            self._require_connection(slot)
+            slot.nrf.characteristic_write_request(
+                characteristic=slot.characteristic_uuid(uuid), payload=payload[_UUID_REQ.size :]
+            )
+        return bytes()
+
+    def _write_command(self, handler: _DaemonRequestHandler, payload: bytes) -> bytes:
+        slot = self._slot(payload)
+        _, uuid = _UUID_REQ.unpack_from(payload)
+
+        with slot.lock:
+            self._require_connection(slot)
+            slot.nrf.characteristic_write_command(
+                characteristic=slot.characteristic_uuid(uuid), payload=payload[_UUID_REQ.size :]
+            )
+        return bytes()
+
+    def _opcode(self, handler: _DaemonRequestHandler, payload: bytes) -> bytes:
+        """Write an opcode to the TX characteristic and wait for the notification on the RX characteristic whose
+        first byte echoes the opcode (OpCodes service convention)
+        """
+        slot = self._slot(payload)
+        _, tx_uuid, rx_uuid, timeout_ms, opcode = _OPCODE_REQ.unpack_from(payload)
+        data = payload[_OPCODE_REQ.size :]
+
+        key = (rx_uuid, opcode)
+        resp_q = Queue()
+        try:
+            # Only the write holds the adapter, other clients' requests proceed while the response is awaited. Waiters
+            # register under the adapter lock, so they queue up in write order.
+            with slot.lock:
+                self._require_connection(slot)
+                slot.ensure_notifications(rx_uuid)
+                slot.add_opcode_waiter(key, resp_q)
+                slot.nrf.characteristic_write_request(
+                    characteristic=slot.characteristic_uuid(tx_uuid), payload=bytes([opcode]) + data
+                )
+            return resp_q.get(timeout=timeout_ms / 1000)
+        except Empty:
+            raise DaemonError(f"No response received for opcode 0x{opcode:02X}")
+        finally:
+            slot.remove_opcode_waiter(key, resp_q)
+
+    def _subscribe(self, handler: _DaemonRequestHandler, payload: bytes) -> bytes:
+        slot = self._slot(payload)
+        _, uuid = _UUID_REQ.unpack_from(payload)
+
+        with slot.lock:
+            self._require_connection(slot)
+            slot.ensure_notifications(uuid)
+            slot.subscribers.setdefault(uuid, set()).add(handler)
+        return bytes()
+
+    def _unsubscribe(self, handler: _DaemonRequestHandler, payload: bytes) -> bytes:
+        slot = self._slot(payload)
+        _, uuid = _UUID_REQ.unpack_from(payload)
+
+        with slot.lock:
+            slot.subscribers.get(uuid, set()).discard(handler)
+        return bytes()
+
+
+class BleDaemonClient:
+    """Client for a running BleDaemon"""
+
+    T_NtfCallback = Callable[[int, int, int, bytes], None]
+
+    def __init__(self, socket_path: str, timeout: float = 30) -> None:
+        """Connect to a running daemon
+
+        :param socket_path: daemon Unix-domain socket path
+        :param timeout: default response timeout in seconds
+        """
+        self.timeout = timeout
+        self.on_notification = None  # type: (BleDaemonClient.T_NtfCallback | None)
+
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.connect(socket_path)
+        self._send_lock = threading.Lock()
+        self._req_id = 0
+        self._pending = dict()  # type: dict[int, Queue]
+
+        self._reader = threading.Thread(target=self._read_loop, name="BleDaemonClient", daemon=True)
+        self._reader.start()
+
+    def close(self) -> None:
+        try:
+            self._sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._sock.close()
+
+    def __enter__(self) -> BleDaemonClient:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _read_loop(self) -> None:
+        while True:
+            try:
+                msg_type, status, req_id, payload = recv_message(self._sock)
+            except (ConnectionResetError, OSError):
+                break
+
+            if msg_type == MessageType.Notification:
+                if self.on_notification is not None:
+                    adapter, conn_handle, uuid = _NOTIFICATION.unpack_from(payload)
+                    self.on_notification(adapter, conn_handle, uuid, payload[_NOTIFICATION.size :])
+            elif req_id in self._pending:
+                self._pending[req_id].put((status, payload))
+
+        for q in tuple(self._pending.values()):
+            q.put((MessageStatus.Error, b"Daemon connection closed"))
+
+    def request(self, msg_type: MessageType, payload: bytes, timeout: float | None = None) -> bytes:
+        """Send a request and wait for its response
+
+        :param msg_type: request message type
+        :param payload: request payload
+        :param timeout: response timeout in seconds, defaults to the client timeout
+        :return: Response payload
+        """
+        q = Queue()
+        with self._send_lock:
+            self._req_id = (self._req_id + 1) & 0xFFFF or 1
+            req_id = self._req_id
+            self._pending[req_id] = q
+            self._sock.sendall(pack_message(msg_type, req_id, payload))
+
+        try:
+            status, rsp = q.get(timeout=self.timeout if timeout is None else timeout)
+        except Empty:
+            raise DaemonError(f"Timeout waiting for {msg_type.name} response")
+        finally:
+            self._pending.pop(req_id, None)
+
+        if status != MessageStatus.Ok:
+            raise DaemonError(rsp.decode("utf-8", errors="replace"))
+        return rsp
+
+    def status(self, adapter: int = 0) -> tuple[ConnectionStatus, int | None, str | None]:
+        """:return: Tuple (connection status, conn_handle, connected address)"""
+        status, conn_handle, addr = struct.unpack("<BH6s", self.request(MessageType.Status, _ADAPTER.pack(adapter)))
+        return (
+            ConnectionStatus(status),
+            None if conn_handle == 0xFFFF else conn_handle,
+            addr.hex().upper() if any(addr) else None,
+        )
+
+    def scan(self, adapter: int = 0, timeout_s: float = 1) -> dict[str, tuple[int, str]]:
+        """:return: Dictionary {address: (rssi, name)}"""
+        rsp = self.request(
+            MessageType.Scan, _SCAN_REQ.pack(adapter, int(timeout_s * 1000)), timeout=self.timeout + timeout_s
+        )
+        (count,) = struct.unpack_from("<H", rsp)
+        offset = 2
+        ret = dict()
+        for _ in range(count):
+            addr, rssi, name_len = _SCAN_ENTRY.unpack_from(rsp, offset)
+            offset += _SCAN_ENTRY.size
+            ret[addr.hex().upper()] = (rssi, rsp[offset : offset + name_len].decode("utf-8", errors="replace"))
+            offset += name_len
+        return ret
+
+    def connect(
+        self, target_mac_address: str, adapter: int = 0, exchange_att_mtu: bool = True, discover_services: bool = True
+    ) -> tuple[int, int]:
+        """:return: Tuple (conn_handle, ATT MTU)"""
+        flags = (CONNECT_FLAG_EXCHANGE_MTU if exchange_att_mtu else 0) | (
+            CONNECT_FLAG_DISCOVER_SERVICES if discover_services else 0
+        )
+        rsp = self.request(MessageType.Connect, _CONNECT_REQ.pack(adapter, bytes.fromhex(target_mac_address), flags))
+        return _CONNECT_RSP.unpack(rsp)
+
+    def disconnect(self, adapter: int = 0) -> None:
+        self.request(MessageType.Disconnect, _ADAPTER.pack(adapter))
+
+    def read(self, uuid: int, adapter: int = 0) -> tuple[NordicDriver.BLEGattStatusCode, bytes]:
+        """:return: Tuple (GATT response status, return data payload)"""
+        rsp = self.request(MessageType.Read, _UUID_REQ.pack(adapter, uuid))
+        return NordicDriver.BLEGattStatusCode(rsp[0]), rsp[_READ_RSP.size :]
+
+    def write_request(self, uuid: int, payload: bytes, adapter: int = 0) -> None:
+        self.request(MessageType.WriteRequest, _UUID_REQ.pack(adapter, uuid) + payload)
+
+    def write_command(self, uuid: int, payload: bytes, adapter: int = 0) -> None:
+        self.request(MessageType.WriteCommand, _UUID_REQ.pack(adapter, uuid) + payload)
+
+    def opcode(
+        self, tx_uuid: int, rx_uuid: int, opcode: int, data: bytes = bytes(), timeout_s: float = 10, adapter: int = 0
+    ) -> bytes:
+        """Write an opcode and wait for its notification response
+
+        :return: Response data (opcode byte stripped)
+        """
+        req = _OPCODE_REQ.pack(adapter, tx_uuid, rx_uuid, int(timeout_s * 1000), opcode) + data
+        return self.request(MessageType.OpCode, req, timeout=self.timeout + timeout_s)
+
+    def subscribe(self, uuid: int, adapter: int = 0) -> None:
+        """Forward notifications of the characteristic to on_notification(adapter, conn_handle, uuid, data)"""
+        self.request(MessageType.Subscribe, _UUID_REQ.pack(adapter, uuid))
+
+    def unsubscribe(self, uuid: int, adapter: int = 0) -> None:
+        self.request(MessageType.Unsubscribe, _UUID_REQ.pack(adapter, uuid))
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3.10
+# -*- coding: utf-8 -*-
+
+"""
+Deadlines and cancellation tokens for blocking operations
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+
+from queue import Queue, Empty
+from typing import Any, Callable
+
+from pc_ble_driver_py import ble_adapter as NordicAdapter
+
+
+class Cancelled(NordicAdapter.NordicSemiException):
+    """Operation was aborted through its cancellation token"""
+
+
+class DeadlineExceeded(NordicAdapter.NordicSemiException):
+    """Operation ran out of time, either its own step timeout or the overall deadline"""
+
+
+class CancellationToken:
+    """Thread-safe flag aborting every blocking operation waiting with a deadline bound to it"""
+
+    def __init__(self) -> None:
+        self.reason = None  # type: Any
+        self._event = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: Any = None) -> None:
+        """Request cancellation, may be called from any thread
+
+        :param reason: reason included in the Cancelled errors
+        """
+        if not self._event.is_set():
+            self.reason = reason
+            self._event.set()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """Sleep until cancelled or the timeout expires
+
+        :param timeout: maximum time to wait in seconds
+        :return: Boolean indicating if the token was cancelled
+        """
+        return self._event.wait(timeout)
+
+
+class Deadline:
+    """Overall time budget of a (multi-step) operation with an optional cancellation token
+
+    Every blocking step waits for at most the smaller of its own timeout and the remaining budget, then raises
+    DeadlineExceeded naming the step and the limit that expired. Waits bound to a token wake up within POLL_S of a
+    cancellation and raise Cancelled.
+    """
+
+    POLL_S = 0.05
+
+    __slots__ = ("budget_s", "expires_at", "token")
+
+    def __init__(self, timeout_s: float | None = None, token: CancellationToken | None = None) -> None:
+        """Start a deadline
+
+        :param timeout_s: budget in seconds from now, None for no time limit (cancellation only)
+        :param token: cancellation token
+        """
+        self.budget_s = timeout_s
+        self.expires_at = None if timeout_s is None else time.monotonic() + timeout_s
+        self.token = token
+
+    def __repr__(self) -> str:
+        return f"Deadline(remaining={self.remaining()}, cancelled={self.token is not None and self.token.cancelled})"
+
+    def remaining(self) -> float | None:
+        """Remaining budget in seconds (never negative), None if unlimited"""
+        return None if self.expires_at is None else max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+    def timeout(self, timeout: float | None = None) -> float | None:
+        """Timeout of a single step, bounded by the remaining budget
+
+        :param timeout: step timeout in seconds, None for no step limit
+        :return: Smaller of the step timeout and the remaining budget, None if neither is limited
+        """
+        remaining = self.remaining()
+        if remaining is None:
+            return timeout
+        return remaining if timeout is None else min(timeout, remaining)
+
+    def check(self, what: str = "operation") -> None:
+        """Raise if cancelled or out of time
+
+        :param what: description of the step, included in the error
+        """
+        if self.token is not None and self.token.cancelled:
+            raise Cancelled(f"{what}: cancelled ({self.token.reason})")
+        if self.expired:
+            raise DeadlineExceeded(f"{what}: deadline of {self.budget_s:g} s exceeded")
+
+    def sleep(self, seconds: float) -> None:
+        """Sleep for the given time or until the deadline, whichever comes first
+
+        :param seconds: time to sleep in seconds
+        """
+        timeout = max(0.0, self.timeout(seconds))
+        if self.token is None:
+            time.sleep(timeout)
+        elif self.token.wait(timeout):
+            self.check("sleep")
+
+    def wait(self, event: threading.Event, timeout: float | None = None, what: str = "operation") -> None:
+        """Wait for an event
+
+        :param event: event to wait for
+        :param timeout: step timeout in seconds, None waits for the rest of the budget
+        :param what: description of the step, included in errors
+        """
+        self._until(lambda t: (event.wait(t), None), timeout, what)
+
+    def get(self, q: Queue, timeout: float | None = None, what: str = "operation") -> Any:
+        """Wait for a queue item
+
+        :param q: queue to get from
+        :param timeout: step timeout in seconds, None waits for the rest of the budget
+        :param what: description of the step, included in errors
+        :return: Queue item
+        """
+
+        def attempt(t: float | None) -> tuple[bool, Any]:
+            try:
+                return True, q.get(timeout=t)
+            except Empty:
+                return False, None
+
+        return self._until(attempt, timeout, what)
+
+    def _until(self, attempt: Callable[[float | None], tuple[bool, Any]], timeout: float | None, what: str) -> Any:
+        step_end = None if timeout is None else time.monotonic() + timeout
+
+        while True:
+            ends = [t for t in (step_end, self.expires_at) if t is not None]
+            wait = max(0.0, min(ends) - time.monotonic()) if ends else None
+            if self.token is not None:
+                wait = self.POLL_S if wait is None else min(wait, self.POLL_S)
+
+            done, value = attempt(wait)
+            if done:
+                return value
+
+            self.check(what)
+            if step_end is not None and time.monotonic() >= step_end:
+                raise DeadlineExceeded(f"{what}: timed out after {timeout:g} s")
+
+
+def monotonic_deadline(deadline: Deadline | float | None) -> float | None:
+    """Absolute time.monotonic() expiry of a Deadline, or an absolute expiry passed as is
+
+    :param deadline: Deadline object, time.monotonic() time or None
+    :return: time.monotonic() time or None
+    """
+    return deadline.expires_at if isinstance(deadline, Deadline) else deadline
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3.10
+# -*- coding: utf-8 -*-
+
+"""
+Connect-on-discovery bookkeeping for many target peripherals
+"""
+
+from __future__ import annotations
+
+import threading
+
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Callable
+
+from pc_ble_driver_py import ble_driver as NordicDriver
+
+if TYPE_CHECKING:
+    from adv_parser import AdvRecord
+
+
+class DiscoveryConnector:
+    """Decide which advertisers to connect to while a single scan keeps running
+
+    The SoftDevice runs one connection procedure at a time, so advertisers wanted while a connection is being
+    established, or while every link slot is in use, wait in a FIFO backlog and are connected as soon as the procedure
+    completes or a link is released. Every address is connected at most once per discovery session.
+    """
+
+    T_Predicate = Callable[[str, int, "AdvRecord"], bool]
+    T_OnConnected = Callable[[str, int], None]
+
+    def __init__(
+        self,
+        targets: list[str] | set[str] | None = None,
+        predicate: T_Predicate | None = None,
+        max_links: int = 1,
+        on_connected: T_OnConnected | None = None,
+    ) -> None:
+        """Initialize discovery state
+
+        :param targets: peer addresses in the CentralBleDriver hex format (e.g. "FCAE017C78CE"), None accepts any
+        :param predicate: called as predicate(address, rssi, adv_record) for advertisers passing targets, returns
+                          whether to connect
+        :param max_links: maximum number of simultaneous links on the adapter
+        :param on_connected: called as on_connected(address, conn_handle) on a new thread once a link is established
+        """
+        assert targets is not None or predicate is not None, "Either targets or a predicate is required."
+
+        self.targets = None if targets is None else frozenset(a.upper() for a in targets)
+        self.predicate = predicate
+        self.max_links = max_links
+        self.on_connected = on_connected
+
+        self.connecting = None  # type: (str | None)
+        self.backlog = OrderedDict()  # type: OrderedDict[str, NordicDriver.BLEGapAddr]
+        self.handles = dict()  # type: dict[int, str]
+        self.connected = set()  # type: set[str]
+
+        self._lock = threading.Lock()
+        self._complete = threading.Event()
+
+    @property
+    def complete(self) -> bool:
+        """Every target was connected (never true for predicate-only discovery)"""
+        return self._complete.is_set()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """Wait for every target to be connected
+
+        :param timeout: maximum time to wait in seconds
+        :return: Boolean indicating if every target was connected
+        """
+        return self._complete.wait(timeout)
+
+    def wants(self, addr: str, rssi: int, adv: AdvRecord) -> bool:
+        """Check if an advertiser should be connected to
+
+        :param addr: advertiser address
+        :param rssi: report RSSI
+        :param adv: decoded advertising payload
+        :return: Boolean indicating if the advertiser is a new match
+        """
+        if addr in self.connected or addr in self.backlog or addr == self.connecting:
+            return False
+        if self.targets is not None and addr not in self.targets:
+            return False
+        return self.predicate is None or self.predicate(addr, rssi, adv)
+
+    def offer(self, addr: str, peer_addr: NordicDriver.BLEGapAddr, free_slots: int) -> bool:
+        """Claim the connection procedure for a matching advertiser, or queue it if busy
+
+        :param addr: advertiser address
+        :param peer_addr: advertiser address object to connect to
+        :param free_slots: number of unused link slots on the adapter
+        :return: Boolean indicating if the caller should connect to the advertiser now
+        """
+        with self._lock:
+            if self.connecting is not None or free_slots < 1:
+                self.backlog[addr] = peer_addr
+                return False
+            self.connecting = addr
+            return True
+
+    def next(self, free_slots: int) -> tuple[str, NordicDriver.BLEGapAddr] | None:
+        """Claim the connection procedure for the oldest queued advertiser
+
+        :param free_slots: number of unused link slots on the adapter
+        :return: Tuple (address, address object) to connect to now, None if busy or nothing is queued
+        """
+        with self._lock:
+            if self.connecting is not None or free_slots < 1 or not self.backlog:
+                return None
+            addr, peer_addr = self.backlog.popitem(last=False)
+            self.connecting = addr
+            return addr, peer_addr
+
+    def link_up(self, addr: str, conn_handle: int) -> bool:
+        """Record an established link
+
+        :param addr: peer address
+        :param conn_handle: connection handle
+        :return: Boolean indicating if the link was initiated by discovery
+        """
+        with self._lock:
+            if addr != self.connecting:
+                return False
+            self.connecting = None
+            self.handles[conn_handle] = addr
+            self.connected.add(addr)
+            if self.targets is not None and self.targets <= self.connected:
+                self._complete.set()
+            return True
+
+    def link_failed(self) -> str | None:
+        """Release the connection procedure after a failed or timed out attempt, the address may be matched again
+
+        :return: Address that was being connected to, None if none
+        """
+        with self._lock:
+            addr, self.connecting = self.connecting, None
+            return addr
+
+    def link_down(self, conn_handle: int) -> str | None:
+        """Record a disconnection
+
+        :param conn_handle: connection handle
+        :return: Peer address if the link was initiated by discovery, None otherwise
+        """
+        with self._lock:
+            return self.handles.pop(conn_handle, None)
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3.10
+# -*- coding: utf-8 -*-
+
+"""
+Dispatch executors for marshalling user-level callbacks off the driver's event thread
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Hashable
+
+logger = logging.getLogger("dispatch")
+
+
+class InlineDispatcher:
+    """Run callbacks immediately on the calling (driver event) thread"""
+
+    def submit(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> None:
+        """Run a callback
+
+        :param key: ordering key, unused since callbacks always run in call order
+        :param fn: callback to run
+        """
+        del key  # unused
+        fn(*args, **kwargs)
+
+    def shutdown(self, wait: bool = True) -> None:
+        pass
+
+
+class DispatchExecutor(InlineDispatcher):
+    """Run callbacks on a thread pool while preserving the submission order of callbacks sharing a key
+
+    Every key owns a lane (FIFO). At most one worker drains a lane at a time, so callbacks for the same key (e.g. the
+    same characteristic on the same connection) never run concurrently or out of order, while different keys run in
+    parallel and a slow callback only delays its own lane.
+    """
+
+    def __init__(self, max_workers: int = 4, thread_name_prefix: str = "BleDispatch") -> None:
+        """Initialize dispatch executor
+
+        :param max_workers: number of worker threads
+        :param thread_name_prefix: worker thread name prefix
+        """
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=thread_name_prefix)
+        self._lock = threading.Lock()
+        self._lanes = dict()  # type: dict[Hashable, deque[tuple[Callable[..., Any], tuple, dict]]]
+
+    def submit(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> None:
+        """Queue a callback on the lane of key
+
+        :param key: ordering key, callbacks with equal keys run sequentially in submission order
+        :param fn: callback to run
+        """
+        with self._lock:
+            lane = self._lanes.get(key)
+            if lane is not None:
+                lane.append((fn, args, kwargs))
+                return
+
+            self._lanes[key] = deque(((fn, args, kwargs),))
+
+        self._pool.submit(self._run_lane, key)
+
+    def _run_lane(self, key: Hashable) -> None:
+        lane = self._lanes[key]
+        while True:
+            with self._lock:
+                if not lane:
+                    del self._lanes[key]
+                    return
+                fn, args, kwargs = lane.popleft()
+
+            try:
+                fn(*args, **kwargs)
+            except Exception as e:
+                logger.error(f"Dispatched callback {getattr(fn, '__qualname__', fn)} failed")
+                logger.exception(e)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop accepting callbacks, optionally waiting for queued ones to finish"""
+        self._pool.shutdown(wait=wait)
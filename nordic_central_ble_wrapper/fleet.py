@@ -0,0 +1,186 @@
+#!/usr/bin/env python3.10
+# -*- coding: utf-8 -*-
+
+"""
+Parallel fleet test runner across many peripherals and adapters
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+
+from dataclasses import dataclass
+from queue import Queue, Empty
+from typing import Any, Callable, Iterator
+
+from central_ble_driver import CentralBleDriver
+
+logger = logging.getLogger("fleet")
+
+
+@dataclass(slots=True)
+class DeviceResult:
+    """Outcome of the test plan for a single device"""
+
+    address: str
+    passed: bool
+    attempts: int
+    port: str | None = None
+    duration_s: float = 0.0
+    result: Any = None
+    error: str | None = None
+
+
+class FleetRunner:
+    """Run a test plan on many peripherals in parallel, one worker per adapter
+
+    Every CentralBleDriver tracks a single connection, so each adapter serves one device at a time and throughput scales
+    with the number of adapters. Devices are pulled from a shared work queue, so a failed device may be retried on a
+    different adapter.
+    """
+
+    T_TestPlan = Callable[[CentralBleDriver, str], Any]
+    T_ScanFilter = Callable[[str, dict], bool]
+
+    def __init__(
+        self,
+        ports: list[str],
+        test_plan: T_TestPlan,
+        retries: int = 1,
+        driver_factory: Callable[[], CentralBleDriver] = CentralBleDriver,
+        open_kwargs: dict[str, Any] | None = None,
+        connect_kwargs: dict[str, Any] | None = None,
+    ) -> None:
+        """Initialize fleet runner
+
+        :param ports: COM ports of the adapters to use
+        :param test_plan: called as test_plan(nrf, address) once connected to a device. The returned value is stored
+                          in the device result, raising an exception fails the attempt.
+        :param retries: number of additional attempts for a failed device
+        :param driver_factory: creates an unopened driver object per adapter
+        :param open_kwargs: additional CentralBleDriver.open() arguments
+        :param connect_kwargs: additional CentralBleDriver.connect() arguments
+        """
+        assert len(ports) > 0, "At least a single adapter is required."
+
+        self.ports = ports
+        self.test_plan = test_plan
+        self.retries = retries
+        self.driver_factory = driver_factory
+        self.open_kwargs = open_kwargs or dict()
+        self.connect_kwargs = connect_kwargs or dict()
+
+        self._work_q = Queue()  # type: Queue[tuple[str, int] | None]
+        self._result_q = Queue()  # type: Queue[DeviceResult | None]
+
+    def discover(self, scan_filter: T_ScanFilter, port: str | None = None) -> list[str]:
+        """Scan on a single adapter and return the addresses of devices accepted by the filter
+
+        :param scan_filter: called as scan_filter(address, scan_data) for every advertiser found
+        :param port: adapter to scan with, defaults to the first port
+        :return: List of matching addresses
+        """
+        nrf = self.driver_factory()
+        nrf.open(com=port or self.ports[0], **self.open_kwargs)
+        if nrf.adapter is None:
+            raise RuntimeError(f"Failed to open adapter on {port or self.ports[0]}")
+
+        try:
+            nrf.scan()
+            return [addr for addr, data in nrf.get_scan_data().items() if scan_filter(addr, data)]
+        finally:
+            nrf.close()
+
+    def run(self, addresses: list[str]) -> Iterator[DeviceResult]:
+        """Run the test plan on every device, yielding each device's final result as soon as it is known
+
+        :param addresses: device addresses to test
+        :return: Iterator of device results in completion order
+        """
+        pending = len(addresses)
+        if pending == 0:
+            return
+
+        self._work_q = Queue()
+        self._result_q = Queue()
+        for address in addresses:
+            self._work_q.put((address, 1))
+
+        workers = [
+            threading.Thread(target=self._worker, args=(port,), name=f"FleetRunner-{port}", daemon=True)
+            for port in self.ports
+        ]
+        for worker in workers:
+            worker.start()
+
+        alive = len(workers)
+        try:
+            while pending and alive:
+                result = self._result_q.get()
+                if result is None:  # worker could not open its adapter
+                    alive -= 1
+                    continue
+                pending -= 1
+                yield result
+        finally:
+            for _ in workers:
+                self._work_q.put(None)
+
+        # Every adapter failed, report the devices left untested
+        while pending:
+            try:
+                item = self._work_q.get_nowait()
+            except Empty:
+                break
+            if item is not None:
+                pending -= 1
+                yield DeviceResult(address=item[0], passed=False, attempts=item[1] - 1, error="No adapter available")
+
+    def _worker(self, port: str) -> None:
+        nrf = self.driver_factory()
+        nrf.open(com=port, **self.open_kwargs)
+        if nrf.adapter is None:
+            logger.error(f"Failed to open adapter on {port}")
+            self._result_q.put(None)
+            return
+
+        try:
+            while True:
+                item = self._work_q.get()
+                if item is None:
+                    return
+
+                address, attempt = item
+                result = self._run_device(nrf, port, address, attempt)
+                if not result.passed and attempt <= self.retries:
+                    logger.warning(f"{port}: 0x{address} failed attempt {attempt}, retrying ({result.error})")
+                    self._work_q.put((address, attempt + 1))
+                else:
+                    self._result_q.put(result)
+        finally:
+            nrf.close()
+
+    def _run_device(self, nrf: CentralBleDriver, port: str, address: str, attempt: int) -> DeviceResult:
+        start = time.perf_counter()
+        result = DeviceResult(address=address, passed=False, attempts=attempt, port=port)
+
+        try:
+            nrf.connect(target_mac_address=address, **self.connect_kwargs)
+            if nrf.conn_handle is None:
+                raise ConnectionError(f"Failed to connect to 0x{address}")
+
+            result.result = self.test_plan(nrf, address)
+            result.passed = True
+        except Exception as e:
+            result.error = f"{e.__class__.__name__}: {e}"
+        finally:
+            if nrf.conn_handle is not None:
+                try:
+                    nrf.disconnect()
+                except Exception as e:
+                    logger.error(f"{port}: failed to disconnect from 0x{address}: {e}")
+
+        result.duration_s = time.perf_counter() - start
+        return result
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3.10
+# -*- coding: utf-8 -*-
+
+"""
+Prioritized per-connection GATT operation scheduler
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+
+from collections import OrderedDict, deque
+from enum import IntEnum
+from typing import Any, Callable, Hashable
+
+from deadline import Cancelled, Deadline, DeadlineExceeded, monotonic_deadline
+
+logger = logging.getLogger("gatt_scheduler")
+
+
+class Priority(IntEnum):
+    Control = 0
+    """Time-critical control traffic (opcodes, CCCD configuration)"""
+
+    Normal = 1
+    """Regular reads/writes"""
+
+    Bulk = 2
+    """Background reads and transfers using the remaining link capacity"""
+
+
+class OperationCancelled(Cancelled):
+    """Operation was cancelled or its connection went away before it ran"""
+
+
+class OperationExpired(DeadlineExceeded):
+    """Operation's deadline passed before it could run"""
+
+
+class GattOperation:
+    """Queued GATT operation, a future completed by the connection's scheduler worker"""
+
+    __slots__ = ("fn", "priority", "caller", "deadline", "_result", "_error", "_done", "_started", "_lock")
+
+    def __init__(self, fn: Callable[[], Any], priority: Priority, caller: Hashable, deadline: float | None) -> None:
+        self.fn = fn
+        self.priority = priority
+        self.caller = caller
+        self.deadline = deadline
+        self._result = None
+        self._error = None  # type: (BaseException | None)
+        self._done = threading.Event()
+        self._started = False
+        self._lock = threading.Lock()
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def cancel(self) -> bool:
+        """Cancel the operation if it hasn't started running yet
+
+        :return: Boolean indicating if the operation was cancelled
+        """
+        with self._lock:
+            if self._started or self.done:
+                return False
+            self._error = OperationCancelled("GATT operation cancelled")
+            self._done.set()
+            return True
+
+    def result(self, timeout: float | None = None) -> Any:
+        """Wait for the operation to run
+
+        :param timeout: maximum time to wait in seconds
+        :return: Value returned by the operation
+        """
+        if not self._done.wait(timeout):
+            raise OperationExpired("Timeout waiting for GATT operation")
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+    def _run(self) -> None:
+        with self._lock:
+            if self.done:
+                return
+            self._started = True
+
+        try:
+            self._result = self.fn()
+        except BaseException as e:
+            self._error = e
+        self._done.set()
+
+    def _fail(self, error: BaseException) -> None:
+        with self._lock:
+            if self._started or self.done:
+                return
+            self._error = error
+            self._done.set()
+
+
+class _ConnectionQueue:
+    """Operations of a single connection: one round-robin set of caller FIFOs per priority level"""
+
+    def __init__(self) -> None:
+        self.levels = {p: OrderedDict() for p in Priority}  # type: dict[Priority, OrderedDict[Hashable, deque]]
+        self.worker = None  # type: (threading.Thread | None)
+        self.closed = False
+
+    def push(self, op: GattOperation) -> None:
+        self.levels[op.priority].setdefault(op.caller, deque()).append(op)
+
+    def pop(self) -> GattOperation | None:
+        for callers in self.levels.values():
+            while callers:
+                # Take the head of the first caller's FIFO, then rotate that caller to the back for fairness
+                caller, ops = next(iter(callers.items()))
+                op = ops.popleft()
+                if ops:
+                    callers.move_to_end(caller)
+                else:
+                    del callers[caller]
+                if not op.done:
+                    return op
+        return None
+
+    def drain(self) -> list[GattOperation]:
+        ops = [op for callers in self.levels.values() for fifo in callers.values() for op in fifo]
+        for callers in self.levels.values():
+            callers.clear()
+        return ops
+
+
+class GattScheduler:
+    """Serialize GATT operations per connection by priority, with fairness between callers
+
+    ATT allows a single outstanding request per link, so every connection gets a worker thread that runs one operation
+    at a time: the highest priority level first, round-robin between the callers queued at that level. Queued
+    operations can be cancelled, and operations whose deadline passed before they started fail without being issued.
+    """
+
+    def __init__(self) -> None:
+        self._cond = threading.Condition()
+        self._conns = dict()  # type: dict[int, _ConnectionQueue]
+
+    def submit(
+        self,
+        conn_handle: int,
+        fn: Callable[[], Any],
+        priority: Priority = Priority.Normal,
+        caller: Hashable | None = None,
+        deadline: Deadline | float | None = None,
+    ) -> GattOperation:
+        """Queue an operation
+
+        :param conn_handle: connection handle the operation runs on
+        :param fn: operation, issues the request and waits for its response
+        :param priority: operation priority
+        :param caller: fairness group, defaults to the calling thread
+        :param deadline: Deadline or time.monotonic() time after which the operation is no longer worth starting
+        :return: Operation future
+        """
+        caller = threading.get_ident() if caller is None else caller
+        op = GattOperation(fn, priority, caller, monotonic_deadline(deadline))
+
+        with self._cond:
+            conn = self._conns.get(conn_handle)
+            if conn is None:
+                conn = self._conns[conn_handle] = _ConnectionQueue()
+
+            # Nested operation from the worker itself (e.g. an operation issuing a read), run it inline below
+            nested = conn.worker is threading.current_thread()
+            if not nested:
+                conn.push(op)
+                if conn.worker is None:
+                    conn.worker = threading.Thread(
+                        target=self._worker, args=(conn_handle, conn), name=f"GattScheduler-{conn_handle}", daemon=True
+                    )
+                    conn.worker.start()
+                self._cond.notify_all()
+
+        if nested:
+            op._run()
+
+        return op
+
+    def run(
+        self,
+        conn_handle: int,
+        fn: Callable[[], Any],
+        priority: Priority = Priority.Normal,
+        caller: Hashable | None = None,
+        deadline: Deadline | float | None = None,
+    ) -> Any:
+        """Queue an operation and wait for its result, see submit() and wait()"""
+        op = self.submit(conn_handle, fn, priority=priority, caller=caller, deadline=deadline)
+        return self.wait(op, deadline=deadline)
+
+    @staticmethod
+    def wait(op: GattOperation, deadline: Deadline | float | None = None) -> Any:
+        """Wait for the result of a submitted operation
+
+        :param op: operation future returned by submit()
+        :param deadline: with a Deadline object, an operation still queued when it expires or its token is cancelled is
+                         withdrawn and the wait raises immediately
+        :return: Value returned by the operation
+        """
+        if isinstance(deadline, Deadline):
+            try:
+                deadline.wait(op._done, what="queued GATT operation")
+            except (Cancelled, DeadlineExceeded):
+                # Once started, the operation bounds its own wait
+                if op.cancel():
+                    raise
+
+        return op.result()
+
+    def close_connection(self, conn_handle: int, reason: Any = None) -> None:
+        """Fail every queued operation of a connection and stop its worker
+
+        :param conn_handle: connection handle
+        :param reason: failure reason included in the error
+        """
+        with self._cond:
+            conn = self._conns.pop(conn_handle, None)
+            if conn is None:
+                return
+            conn.closed = True
+            ops = conn.drain()
+            self._cond.notify_all()
+
+        for op in ops:
+            op._fail(OperationCancelled(f"conn_handle {conn_handle}: disconnected ({reason})"))
+
+    def connections(self) -> list[int]:
+        """Handles of the connections with a worker"""
+        with self._cond:
+            return list(self._conns)
+
+    def close(self, reason: Any = None, timeout: float | None = None) -> None:
+        """Close every connection and wait for the workers to finish their running operation
+
+        :param reason: failure reason included in the errors of queued operations
+        :param timeout: maximum time to wait for each worker in seconds
+        """
+        with self._cond:
+            conns = dict(self._conns)
+
+        for conn_handle in conns:
+            self.close_connection(conn_handle, reason)
+
+        for conn in conns.values():
+            if conn.worker is not None and conn.worker is not threading.current_thread():
+                conn.worker.join(timeout)
+
+    def _worker(self, conn_handle: int, conn: _ConnectionQueue) -> None:
+        while True:
+            with self._cond:
+                op = conn.pop()
+                while op is None and not conn.closed:
+                    self._cond.wait()
+                    op = conn.pop()
+                if op is None:
+                    return
+
+            if op.deadline is not None and time.monotonic() > op.deadline:
+                op._fail(OperationExpired(f"conn_handle {conn_handle}: GATT operation deadline passed while queued"))
+                continue
+
+            op._run()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3.10
+# -*- coding: utf-8 -*-
+
+"""
+Correlated GATT request tracker
+"""
+
+from __future__ import annotations
+
+import threading
+
+from collections import deque
+from enum import IntEnum
+from typing import Any
+
+from pc_ble_driver_py import ble_adapter as NordicAdapter
+
+from deadline import Deadline
+
+
+class GattOp(IntEnum):
+    Read = 0
+    Write = 1
+
+
+class GattRequest:
+    """Outstanding ATT request, completed by the matching response event"""
+
+    __slots__ = ("key", "result", "error", "_done")
+
+    def __init__(self, key: tuple[int, GattOp, int]) -> None:
+        self.key = key
+        self.result = None  # type: (dict[str, Any] | None)
+        self.error = None  # type: (str | None)
+        self._done = threading.Event()
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def set_result(self, result: dict[str, Any]) -> None:
+        self.result = result
+        self._done.set()
+
+    def set_error(self, error: str) -> None:
+        self.error = error
+        self._done.set()
+
+    def wait(self, timeout: float | None = None, deadline: Deadline | None = None) -> dict[str, Any]:
+        """Wait for the response event
+
+        :param timeout: maximum time to wait in seconds
+        :param deadline: overall deadline/cancellation token also bounding the wait, raises DeadlineExceeded or
+                         Cancelled
+        :return: Response event arguments (status, error_handle, attr_handle, ...)
+        """
+        conn_handle, op, attr_handle = self.key
+
+        if deadline is not None:
+            deadline.wait(
+                self._done, timeout, what=f"conn_handle {conn_handle}: {op.name} response on handle 0x{attr_handle:04X}"
+            )
+        elif not self._done.wait(timeout):
+            raise NordicAdapter.NordicSemiException(
+                f"conn_handle {conn_handle}: timeout waiting for {op.name} response on handle 0x{attr_handle:04X}"
+            )
+
+        if self.error is not None:
+            raise NordicAdapter.NordicSemiException(self.error)
+
+        return self.result
+
+
+class GattRequestTracker:
+    """Track outstanding ATT operations by (conn_handle, op type, attribute handle)
+
+    Every outbound request is registered before it is issued, and the response events complete exactly the request
+    with the same key, so operations outstanding on different connections (or attributes) never pick up each other's
+    responses. Requests sharing a key complete in issue order.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._pending = dict()  # type: dict[tuple[int, GattOp, int], deque[GattRequest]]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(q) for q in self._pending.values())
+
+    def begin(self, conn_handle: int, op: GattOp, attr_handle: int) -> GattRequest:
+        """Register a request, call before issuing it to the driver
+
+        :param conn_handle: connection handle
+        :param op: ATT operation type
+        :param attr_handle: attribute handle the request targets
+        :return: Request object to wait on
+        """
+        request = GattRequest((conn_handle, GattOp(op), attr_handle))
+        with self._lock:
+            self._pending.setdefault(request.key, deque()).append(request)
+        return request
+
+    def cancel(self, request: GattRequest) -> None:
+        """Unregister a request that was never issued or is no longer waited on"""
+        with self._lock:
+            q = self._pending.get(request.key)
+            if q is not None and request in q:
+                q.remove(request)
+                if not q:
+                    del self._pending[request.key]
+
+    def complete(self, conn_handle: int, op: GattOp, attr_handle: int, error_handle: int = 0, **result) -> bool:
+        """Complete the oldest request matching a response event
+
+        :param conn_handle: connection handle of the response
+        :param op: ATT operation type of the response
+        :param attr_handle: attribute handle of the response
+        :param error_handle: handle that caused an error response, used when no request matches attr_handle
+        :param result: remaining response event arguments
+        :return: Boolean indicating if a request was completed
+        """
+        with self._lock:
+            for handle in (attr_handle, error_handle):
+                q = self._pending.get((conn_handle, op, handle))
+                if q:
+                    request = q.popleft()
+                    if not q:
+                        del self._pending[(conn_handle, op, handle)]
+                    break
+            else:
+                return False
+
+        request.set_result(dict(result, attr_handle=attr_handle, error_handle=error_handle))
+        return True
+
+    def fail_connection(self, conn_handle: int, reason: Any = None) -> None:
+        """Fail every request outstanding on a connection, e.g. when it disconnects
+
+        :param conn_handle: connection handle
+        :param reason: failure reason included in the error
+        """
+        with self._lock:
+            keys = [key for key in self._pending if key[0] == conn_handle]
+            requests = [request for key in keys for request in self._pending.pop(key)]
+
+        for request in requests:
+            request.set_error(f"conn_handle {conn_handle}: disconnected ({reason}) with {request.key[1].name} pending")
@@ -0,0 +1,362 @@
+#!/usr/bin/env python3.10
+# -*- coding: utf-8 -*-
+
+"""
+Profiling hooks around outbound driver calls and observer callbacks
+
+Wrappers are only installed while at least one hook is, a driver without hooks runs its methods unwrapped.
+"""
+
+from __future__ import annotations
+
+import heapq
+import itertools
+import logging
+import os
+import sys
+import threading
+import time
+
+from collections import Counter
+from dataclasses import dataclass
+from enum import IntEnum
+from typing import TYPE_CHECKING, Any, Callable
+
+if TYPE_CHECKING:
+    from central_ble_driver import CentralBleDriver
+
+logger = logging.getLogger("hooks")
+
+
+class HookKind(IntEnum):
+    Call = 0  # outbound adapter.driver.ble_* call
+    Callback = 1  # on_* observer callback
+
+
+class Hook:
+    """Base class of hooks, called around every wrapped call on the calling thread
+
+    before() returns a state object handed back to after(). Exceptions raised by hooks are logged and ignored.
+    """
+
+    def before(self, kind: HookKind, name: str, args: tuple, kwargs: dict[str, Any]) -> Any:
+        """Called before the call
+
+        :param kind: call kind
+        :param name: method name
+        :param args: positional arguments (callbacks include the driver/adapter argument)
+        :param kwargs: keyword arguments
+        :return: State passed to after()
+        """
+        return None
+
+    def after(self, kind: HookKind, name: str, state: Any, elapsed_s: float, error: BaseException | None) -> None:
+        """Called after the call returned or raised
+
+        :param kind: call kind
+        :param name: method name
+        :param state: value returned by before()
+        :param elapsed_s: wall time of the call in seconds (hooks excluded)
+        :param error: exception raised by the call, None if it returned
+        """
+
+
+class HookChain:
+    """Hooks installed on a CentralBleDriver and the wrappers calling them"""
+
+    def __init__(self) -> None:
+        self.hooks = tuple()  # type: tuple[Hook, ...]
+        self._lock = threading.Lock()
+        self._wrapped = list()  # type: list[tuple[Any, str, Callable]]
+
+    def __bool__(self) -> bool:
+        return bool(self.hooks)
+
+    def install(self, nrf: CentralBleDriver, hook: Hook) -> None:
+        """Add a hook, wrapping the driver's callbacks and outbound calls when it is the first one
+
+        :param nrf: central BLE driver
+        :param hook: hook to add
+        """
+        with self._lock:
+            if hook in self.hooks:
+                return
+            if not self.hooks:
+                self._wrap(nrf, HookKind.Callback, "on_")
+                if nrf.adapter is not None:
+                    self._wrap(nrf.adapter.driver, HookKind.Call, "ble_")
+            self.hooks += (hook,)
+
+    def remove(self, hook: Hook) -> None:
+        """Remove a hook, restoring the original methods when it was the last one
+
+        :param hook: hook to remove
+        """
+        with self._lock:
+            if hook not in self.hooks:
+                return
+            self.hooks = tuple(h for h in self.hooks if h is not hook)
+            if not self.hooks:
+                self._unwrap()
+
+    def wrap_driver(self, driver: Any) -> None:
+        """Wrap the outbound calls of a driver opened while hooks are installed
+
+        :param driver: BLE driver of the adapter
+        """
+        with self._lock:
+            if self.hooks:
+                self._wrap(driver, HookKind.Call, "ble_")
+
+    def _wrap(self, obj: Any, kind: HookKind, prefix: str) -> None:
+        for name in dir(type(obj)):
+            if name.startswith(prefix) and callable(getattr(obj, name)):
+                fn = getattr(obj, name)
+                setattr(obj, name, self._wrapper(kind, name, fn))
+                self._wrapped.append((obj, name, fn))
+
+    def _unwrap(self) -> None:
+        # Restore in reverse, in case something else (e.g. an EventRecorder) wrapped the same methods in between
+        for obj, name, fn in reversed(self._wrapped):
+            if getattr(getattr(obj, name, None), "__wrapped__", None) is not fn:
+                continue
+            if getattr(type(obj), name, None) is getattr(fn, "__func__", None):
+                delattr(obj, name)
+            else:
+                setattr(obj, name, fn)
+        self._wrapped.clear()
+
+    def _wrapper(self, kind: HookKind, name: str, fn: Callable) -> Callable:
+        def wrapper(*args, **kwargs):
+            hooks = self.hooks
+            states = []
+            for hook in hooks:
+                try:
+                    states.append(hook.before(kind, name, args, kwargs))
+                except Exception:
+                    logger.exception(f"{type(hook).__name__}.before() failed")
+                    states.append(None)
+
+            error = None
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            except BaseException as e:
+                error = e
+                raise
+            finally:
+                elapsed = time.perf_counter() - start
+                for hook, state in zip(hooks, states):
+                    try:
+                        hook.after(kind, name, state, elapsed, error)
+                    except Exception:
+                        logger.exception(f"{type(hook).__name__}.after() failed")
+
+        wrapper.__wrapped__ = fn
+        return wrapper
+
+
+@dataclass(slots=True)
+class SiteStats:
+    kind: HookKind
+    name: str
+    calls: int = 0
+    errors: int = 0
+    total_s: float = 0.0
+    max_s: float = 0.0
+
+    @property
+    def mean_s(self) -> float:
+        return self.total_s / self.calls if self.calls else 0.0
+
+
+class CallTimer(Hook):
+    """Wall time accounting per call site (driver call or callback name)"""
+
+    def __init__(self) -> None:
+        self.sites = dict()  # type: dict[tuple[HookKind, str], SiteStats]
+        self._lock = threading.Lock()
+
+    def after(self, kind: HookKind, name: str, state: Any, elapsed_s: float, error: BaseException | None) -> None:
+        with self._lock:
+            stats = self.sites.get((kind, name))
+            if stats is None:
+                stats = self.sites[(kind, name)] = SiteStats(kind, name)
+            stats.calls += 1
+            stats.errors += error is not None
+            stats.total_s += elapsed_s
+            stats.max_s = max(stats.max_s, elapsed_s)
+
+    def stats(self) -> list[SiteStats]:
+        """Statistics of every call site, highest total time first"""
+        with self._lock:
+            return sorted(self.sites.values(), key=lambda s: s.total_s, reverse=True)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.sites.clear()
+
+    def report(self, n: int | None = None) -> str:
+        """Format the statistics as a table
+
+        :param n: number of call sites to include, all by default
+        :return: Table of the call sites with the highest total time
+        """
+        lines = [f"{'kind':<8} {'name':<40} {'calls':>8} {'errors':>6} {'total ms':>10} {'mean ms':>9} {'max ms':>9}"]
+        for s in self.stats()[:n]:
+            lines.append(
+                f"{s.kind.name:<8} {s.name:<40} {s.calls:>8} {s.errors:>6} {s.total_s * 1e3:>10.3f} "
+                f"{s.mean_s * 1e3:>9.3f} {s.max_s * 1e3:>9.3f}"
+            )
+        return "\n".join(lines)
+
+
+class SlowestCallbacks(Hook):
+    """Keep the n slowest individual calls, by default of observer callbacks only"""
+
+    def __init__(self, n: int = 10, kinds: tuple[HookKind, ...] = (HookKind.Callback,)) -> None:
+        """Initialize hook
+
+        :param n: number of calls to keep
+        :param kinds: call kinds to consider
+        """
+        self.n = n
+        self.kinds = kinds
+        self._lock = threading.Lock()
+        self._heap = list()  # type: list[tuple[float, int, str, float, bool]]
+        self._seq = itertools.count()
+
+    def after(self, kind: HookKind, name: str, state: Any, elapsed_s: float, error: BaseException | None) -> None:
+        if kind not in self.kinds:
+            return
+        entry = (elapsed_s, next(self._seq), name, time.time(), error is not None)
+        with self._lock:
+            if len(self._heap) < self.n:
+                heapq.heappush(self._heap, entry)
+            elif elapsed_s > self._heap[0][0]:
+                heapq.heapreplace(self._heap, entry)
+
+    def slowest(self) -> list[tuple[str, float, float, bool]]:
+        """Slowest calls as (name, elapsed seconds, wall clock time, raised) tuples, slowest first"""
+        with self._lock:
+            entries = sorted(self._heap, reverse=True)
+        return [(name, elapsed, t, raised) for elapsed, _, name, t, raised in entries]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._heap.clear()
+
+    def report(self) -> str:
+        lines = [f"{'name':<40} {'ms':>9}  time"]
+        for name, elapsed, t, raised in self.slowest():
+            stamp = time.strftime("%H:%M:%S", time.localtime(t)) + f".{int(t % 1 * 1e3):03d}"
+            lines.append(f"{name:<40} {elapsed * 1e3:>9.3f}  {stamp}{'  (raised)' if raised else ''}")
+        return "\n".join(lines)
+
+
+class SamplingProfiler(Hook):
+    """Statistical profiler sampling the stacks of threads inside a hooked call
+
+    While enabled, a background thread samples the stack of every thread currently running a driver call or callback
+    every interval_s seconds. Samples are aggregated per stack in collapsed (flame graph) format, so time spent in our
+    handlers, the wrapper and the native driver bindings shows up separately.
+    """
+
+    def __init__(self, interval_s: float = 0.001, max_depth: int = 48) -> None:
+        """Initialize profiler, disabled until start()
+
+        :param interval_s: sampling interval in seconds
+        :param max_depth: maximum number of frames per sampled stack
+        """
+        self.interval_s = interval_s
+        self.max_depth = max_depth
+        self.samples = Counter()  # type: Counter[str]
+
+        self._lock = threading.Lock()
+        self._active = dict()  # type: dict[int, int]
+        self._stop = threading.Event()
+        self._thread = None  # type: (threading.Thread | None)
+
+    @property
+    def enabled(self) -> bool:
+        return self._thread is not None
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="SamplingProfiler", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def toggle(self) -> bool:
+        """Start or stop sampling
+
+        :return: Boolean indicating if the profiler is now enabled
+        """
+        self.stop() if self.enabled else self.start()
+        return self.enabled
+
+    def before(self, kind: HookKind, name: str, args: tuple, kwargs: dict[str, Any]) -> Any:
+        ident = threading.get_ident()
+        with self._lock:
+            self._active[ident] = self._active.get(ident, 0) + 1
+        return ident
+
+    def after(self, kind: HookKind, name: str, state: Any, elapsed_s: float, error: BaseException | None) -> None:
+        with self._lock:
+            depth = self._active.pop(state, 1) - 1
+            if depth:
+                self._active[state] = depth
+
+    def collapsed(self) -> str:
+        """Samples in collapsed stack format ("frame;frame;frame count" per line), as read by flamegraph tools"""
+        with self._lock:
+            samples = self.samples.most_common()
+        return "\n".join(f"{stack} {count}" for stack, count in samples)
+
+    def top(self, n: int = 20) -> list[tuple[str, int]]:
+        """Functions most often on top of the sampled stacks (self time)
+
+        :param n: number of functions
+        :return: List of (frame, samples) tuples
+        """
+        own = Counter()  # type: Counter[str]
+        with self._lock:
+            for stack, count in self.samples.items():
+                own[stack.rsplit(";", 1)[-1]] += count
+        return own.most_common(n)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.samples.clear()
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval_s):
+            with self._lock:
+                active = [ident for ident in self._active if ident != own]
+            if not active:
+                continue
+
+            frames = sys._current_frames()
+            stacks = []
+            for ident in active:
+                frame = frames.get(ident)
+                if frame is not None:
+                    stacks.append(self._collapse(frame))
+
+            with self._lock:
+                self.samples.update(stacks)
+
+    def _collapse(self, frame: Any) -> str:
+        stack = []
+        while frame is not None and len(stack) < self.max_depth:
+            code = frame.f_code
+            stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+            frame = frame.f_back
+        return ";".join(reversed(stack))
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3.10
+# -*- coding: utf-8 -*-
+
+"""
+Binary record/replay of driver event streams
+
+A log file starts with MAGIC followed by append-only records:
+
+    record header = kind (u8), monotonic timestamp relative to the start of the recording (f64), name id (u16),
+                    payload length (u32)
+
+Name records (RecordKind.Name) define a name id once, its payload being the UTF-8 method name. Callback and call
+records carry the pickled (driver keyword, args, kwargs) of the observer callback or outbound driver call. Arguments
+that can't be pickled are stored as their repr() string.
+
+Only replay logs from trusted sources, since payloads are unpickled.
+"""
+
+from __future__ import annotations
+
+import logging
+import pickle
+import struct
+import threading
+import time
+
+from dataclasses import dataclass
+from enum import IntEnum
+from typing import TYPE_CHECKING, Any, BinaryIO, Iterator
+
+if TYPE_CHECKING:
+    from central_ble_driver import CentralBleDriver
+
+logger = logging.getLogger("recorder")
+
+MAGIC = b"NBLEREC\x01"
+RECORD_HEADER = struct.Struct("<BdHI")
+
+# Name of the first (driver/adapter) argument of observer callbacks, replaced by the replay target's driver
+_DRIVER_ARGS = ("ble_driver", "ble_adapter")
+
+
+class RecordKind(IntEnum):
+    Name = 0
+    Callback = 1
+    Call = 2
+
+
+@dataclass(frozen=True, slots=True)
+class Record:
+    kind: RecordKind
+    t: float
+    name: str
+    driver_kw: str | None
+    args: tuple
+    kwargs: dict[str, Any]
+
+
+def _dumps(obj: Any) -> bytes:
+    try:
+        return pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+    except Exception:
+        driver_kw, args, kwargs = obj
+        return pickle.dumps(
+            (driver_kw, tuple(_picklable(a) for a in args), {k: _picklable(v) for k, v in kwargs.items()}),
+            protocol=pickle.HIGHEST_PROTOCOL,
+        )
+
+
+def _picklable(obj: Any) -> Any:
+    try:
+        pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+        return obj
+    except Exception:
+        return repr(obj)
+
+
+class EventRecorder:
+    """Capture every observer callback a CentralBleDriver receives and every outbound driver call into a log file"""
+
+    def __init__(self, path: str) -> None:
+        """Initialize recorder object
+
+        :param path: log file to create (truncated if it exists)
+        """
+        self.path = path
+        self.records = 0
+
+        self._f = open(path, "wb")  # type: BinaryIO
+        self._f.write(MAGIC)
+        self._lock = threading.Lock()
+        self._names = dict()  # type: dict[str, int]
+        self._t0 = time.monotonic()
+        self._nrf = None  # type: (CentralBleDriver | None)
+        self._driver = None
+        self._wrapped = list()  # type: list[tuple[Any, str, Any, Any]]
+
+    def attach(self, nrf: CentralBleDriver) -> None:
+        """Start recording a driver object. Outbound calls are only captured when attached after CentralBleDriver.open()
+
+        :param nrf: central BLE driver object to record
+        """
+        assert self._nrf is None, "Recorder is already attached."
+        self._nrf = nrf
+
+        self._install(nrf, RecordKind.Callback, "on_")
+        if nrf.adapter is not None:
+            self._driver = nrf.adapter.driver
+            self._install(self._driver, RecordKind.Call, "ble_")
+
+    def detach(self) -> None:
+        """Stop recording, restoring the driver object's original methods"""
+        if self._nrf is None:
+            return
+
+        # Only undo our own wrappers, methods wrapped again since (e.g. by hooks) are left alone
+        for obj, name, original, wrapper in reversed(self._wrapped):
+            if vars(obj).get(name) is not wrapper:
+                continue
+            if getattr(type(obj), name, None) is getattr(original, "__func__", None):
+                delattr(obj, name)
+            else:
+                setattr(obj, name, original)
+        self._wrapped.clear()
+
+        self._nrf = None
+        self._driver = None
+        with self._lock:
+            self._f.flush()
+
+    def close(self) -> None:
+        self.detach()
+        with self._lock:
+            self._f.close()
+
+    def __enter__(self) -> EventRecorder:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def write(self, kind: RecordKind, name: str, driver_kw: str | None, args: tuple, kwargs: dict[str, Any]) -> None:
+        """Append a record
+
+        :param kind: record kind
+        :param name: callback/call method name
+        :param driver_kw: keyword the driver argument was passed with, None if passed positionally or absent
+        :param args: positional arguments, without the driver argument
+        :param kwargs: keyword arguments, without the driver argument
+        """
+        t = time.monotonic() - self._t0
+        payload = _dumps((driver_kw, args, kwargs))
+
+        with self._lock:
+            if self._f.closed:
+                return
+
+            name_id = self._names.get(name)
+            if name_id is None:
+                name_id = self._names[name] = len(self._names)
+                encoded = name.encode("utf-8")
+                self._f.write(RECORD_HEADER.pack(RecordKind.Name, 0.0, name_id, len(encoded)) + encoded)
+
+            self._f.write(RECORD_HEADER.pack(kind, t, name_id, len(payload)))
+            self._f.write(payload)
+            self.records += 1
+
+    def _install(self, obj: Any, kind: RecordKind, prefix: str) -> None:
+        for name in dir(type(obj)):
+            if name.startswith(prefix) and callable(getattr(obj, name)):
+                original = getattr(obj, name)
+                wrapper = self._wrap(kind, name, original)
+                setattr(obj, name, wrapper)
+                self._wrapped.append((obj, name, original, wrapper))
+
+    def _wrap(self, kind: RecordKind, name: str, fn):
+        def wrapper(*args, **kwargs):
+            driver_kw = None
+            rec_args, rec_kwargs = args, kwargs
+            if kind is RecordKind.Callback:
+                driver_kw = next((k for k in _DRIVER_ARGS if k in kwargs), None)
+                if driver_kw is not None:
+                    rec_kwargs = {k: v for k, v in kwargs.items() if k != driver_kw}
+                else:
+                    rec_args = args[1:]
+
+            self.write(kind, name, driver_kw, rec_args, rec_kwargs)
+            return fn(*args, **kwargs)
+
+        wrapper.__wrapped__ = fn
+        return wrapper
+
+
+def read_records(path: str) -> Iterator[Record]:
+    """Iterate the callback and call records of a log file
+
+    :param path: log file
+    :return: Iterator of records in recording order
+    """
+    names = dict()  # type: dict[int, str]
+
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not an event log")
+
+        while True:
+            header = f.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                return
+
+            kind, t, name_id, length = RECORD_HEADER.unpack(header)
+            payload = f.read(length)
+            if len(payload) < length:
+                logger.warning(f"Truncated record at the end of {path}")
+                return
+
+            if kind == RecordKind.Name:
+                names[name_id] = payload.decode("utf-8")
+                continue
+
+            driver_kw, args, kwargs = pickle.loads(payload)
+            yield Record(RecordKind(kind), t, names[name_id], driver_kw, args, kwargs)
+
+
+class EventReplayer:
+    """Feed the observer callbacks of a log file back into a CentralBleDriver (or any observer object)"""
+
+    def __init__(self, path: str) -> None:
+        """Initialize replayer object, loading every callback record of the log file
+
+        :param path: log file
+        """
+        self.path = path
+        self.records = [r for r in read_records(path) if r.kind is RecordKind.Callback]
+
+    def replay(self, observer: Any, speed: float | None = None, ble_driver: Any = None) -> float:
+        """Replay the recorded callbacks on the calling thread
+
+        :param observer: object receiving the callbacks, usually a CentralBleDriver that was not opened
+        :param speed: playback speed factor relative to the recording (1.0 is recorded speed), None replays at maximum
+                      speed
+        :param ble_driver: object passed as the driver/adapter argument of every callback
+        :return: Elapsed replay time in seconds
+        """
+        start = time.perf_counter()
+        t_first = self.records[0].t if self.records else 0.0
+
+        for record in self.records:
+            if speed is not None:
+                delay = (record.t - t_first) / speed - (time.perf_counter() - start)
+                if delay > 0:
+                    time.sleep(delay)
+
+            fn = getattr(observer, record.name, None)
+            if fn is None:
+                continue
+
+            if record.driver_kw is None:
+                fn(ble_driver, *record.args, **record.kwargs)
+            else:
+                fn(*record.args, **{record.driver_kw: ble_driver}, **record.kwargs)
+
+        return time.perf_counter() - start
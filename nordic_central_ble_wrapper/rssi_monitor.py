@@ -0,0 +1,154 @@
+#!/usr/bin/env python3.10
+# -*- coding: utf-8 -*-
+
+"""
+Per-connection RSSI monitoring with rolling statistics and threshold crossings
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+
+from dataclasses import dataclass
+from typing import Callable
+
+# Called as callback(conn_handle, rssi, rising), rising being True when the RSSI crossed the level upwards
+TThresholdCallback = Callable[[int, int, bool], None]
+
+
+@dataclass(frozen=True, slots=True)
+class RssiStats:
+    """Statistics of the RSSI samples in a monitor's window (dBm)"""
+
+    count: int
+    min: int
+    max: int
+    mean: float
+    percentiles: dict[int, float]
+
+
+@dataclass(slots=True)
+class RssiThreshold:
+    level_dbm: int
+    callback: TThresholdCallback
+    hysteresis_db: int = 2
+    above: bool | None = None  # side of the level, None until the first sample
+
+
+class RssiMonitor:
+    """RSSI samples of a connection in a fixed-size ring, with callbacks on threshold crossings
+
+    Samples come from the SoftDevice's RSSI changed events, reported whenever the RSSI changes by at least the
+    threshold given to ble_gap_rssi_start(), so monitoring costs no traffic beyond the connection events. A threshold
+    fires rising once the RSSI reaches its level and falling once the RSSI drops below level - hysteresis, the first
+    sample only setting its initial side.
+    """
+
+    def __init__(self, conn_handle: int, window: int = 64) -> None:
+        """Initialize monitor
+
+        :param conn_handle: monitored connection
+        :param window: number of samples the statistics are computed over
+        """
+        assert window > 0, "RSSI window must hold at least one sample."
+
+        self.conn_handle = conn_handle
+        self.window = window
+        self.samples = 0
+        self.latest = None  # type: (int | None)
+        self.updated_at = None  # type: (float | None)
+        self.thresholds = list()  # type: list[RssiThreshold]
+
+        self._lock = threading.Lock()
+        self._ring = [0] * window
+        self._index = 0
+        self._count = 0
+
+    def add_threshold(self, level_dbm: int, callback: TThresholdCallback, hysteresis_db: int = 2) -> RssiThreshold:
+        """Call back when the RSSI crosses a level
+
+        :param level_dbm: RSSI level in dBm
+        :param callback: called as callback(conn_handle, rssi, rising) through the driver's dispatcher
+        :param hysteresis_db: margin below the level the RSSI must drop to before crossing downwards
+        :return: Threshold object, for remove_threshold()
+        """
+        threshold = RssiThreshold(level_dbm, callback, hysteresis_db)
+        with self._lock:
+            if self.latest is not None:
+                threshold.above = self.latest >= level_dbm
+            self.thresholds.append(threshold)
+        return threshold
+
+    def remove_threshold(self, threshold: RssiThreshold) -> None:
+        with self._lock:
+            if threshold in self.thresholds:
+                self.thresholds.remove(threshold)
+
+    def update(self, rssi: int) -> list[tuple[TThresholdCallback, bool]]:
+        """Add a sample
+
+        :param rssi: RSSI in dBm
+        :return: List of (callback, rising) tuples of the thresholds crossed
+        """
+        crossed = []
+        with self._lock:
+            self._ring[self._index] = rssi
+            self._index = (self._index + 1) % self.window
+            self._count = min(self._count + 1, self.window)
+            self.samples += 1
+            self.latest = rssi
+            self.updated_at = time.monotonic()
+
+            for threshold in self.thresholds:
+                if threshold.above is None:
+                    threshold.above = rssi >= threshold.level_dbm
+                elif not threshold.above and rssi >= threshold.level_dbm:
+                    threshold.above = True
+                    crossed.append((threshold.callback, True))
+                elif threshold.above and rssi < threshold.level_dbm - threshold.hysteresis_db:
+                    threshold.above = False
+                    crossed.append((threshold.callback, False))
+
+        return crossed
+
+    def values(self) -> list[int]:
+        """Samples in the window, oldest first"""
+        with self._lock:
+            if self._count < self.window:
+                return self._ring[: self._count]
+            return self._ring[self._index :] + self._ring[: self._index]
+
+    def stats(self, percentiles: tuple[int, ...] = (10, 50, 90)) -> RssiStats | None:
+        """Statistics of the samples in the window
+
+        :param percentiles: percentiles to compute (linear interpolation between samples)
+        :return: Statistics object, None before the first sample
+        """
+        values = sorted(self.values())
+        if not values:
+            return None
+
+        last = len(values) - 1
+        result = dict()  # type: dict[int, float]
+        for p in percentiles:
+            rank = last * p / 100
+            lo = int(rank)
+            hi = min(lo + 1, last)
+            result[p] = values[lo] + (values[hi] - values[lo]) * (rank - lo)
+
+        return RssiStats(
+            count=len(values),
+            min=values[0],
+            max=values[-1],
+            mean=sum(values) / len(values),
+            percentiles=result,
+        )
+
+    def reset(self) -> None:
+        """Forget every sample, thresholds take their side again from the next sample"""
+        with self._lock:
+            self._index = self._count = 0
+            self.latest = self.updated_at = None
+            for threshold in self.thresholds:
+                threshold.above = None
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3.10
+# -*- coding: utf-8 -*-
+
+"""
+Compiled scan filters evaluated against raw advertising records
+"""
+
+from __future__ import annotations
+
+import uuid as uuidlib
+
+from pc_ble_driver_py import ble_driver as NordicDriver
+
+_TYPES = NordicDriver.BLEAdvData.Types
+
+_NAME_TYPES = (_TYPES.complete_local_name, _TYPES.short_local_name)
+_UUID16_TYPES = (_TYPES.service_16bit_uuid_complete, _TYPES.service_16bit_uuid_more_available)
+_UUID128_TYPES = (_TYPES.service_128bit_uuid_complete, _TYPES.service_128bit_uuid_more_available)
+
+
+class ScanFilter:
+    """Advertising report filter
+
+    Every criterion given must match (criteria are AND-ed, values within a criterion are OR-ed). All criteria are
+    compiled into the byte-level representation used by the advertising records, so evaluating a report never decodes
+    strings or builds address hex strings. Criteria are checked from cheapest to most expensive.
+    """
+
+    def __init__(
+        self,
+        addresses: list[str] | set[str] | None = None,
+        name_prefix: str | None = None,
+        uuids16: list[int] | None = None,
+        uuids128: list[str] | None = None,
+        manufacturer_id: int | None = None,
+        manufacturer_data: bytes | None = None,
+        manufacturer_data_mask: bytes | None = None,
+        min_rssi: int | None = None,
+    ) -> None:
+        """Compile a scan filter
+
+        :param addresses: peer addresses in the CentralBleDriver hex format (e.g. "FCAE017C78CE")
+        :param name_prefix: complete or shortened local name prefix
+        :param uuids16: 16-bit service UUIDs, any listed UUID matches
+        :param uuids128: 128-bit service UUID strings (e.g. "6E400001-B5A3-F393-E0A9-E50E24DCCA9E"), any matches
+        :param manufacturer_id: manufacturer specific data company identifier
+        :param manufacturer_data: manufacturer specific data (after the company identifier) to compare
+        :param manufacturer_data_mask: bit mask applied to manufacturer_data and the advertised data before comparing,
+                                       defaults to comparing every bit
+        :param min_rssi: minimum RSSI in dBm
+        """
+        self.min_rssi = min_rssi
+
+        self._addresses = None if addresses is None else frozenset(tuple(bytes.fromhex(a)) for a in addresses)
+        self._name_prefix = None if name_prefix is None else list(name_prefix.encode("utf-8"))
+        self._uuids16 = None if uuids16 is None else frozenset(uuids16)
+        self._uuids128 = None if uuids128 is None else [list(uuidlib.UUID(u).bytes[::-1]) for u in uuids128]
+
+        self._manufacturer = None
+        if manufacturer_id is not None or manufacturer_data is not None:
+            data = bytes(manufacturer_data or b"")
+            mask = bytes(manufacturer_data_mask) if manufacturer_data_mask is not None else b"\xff" * len(data)
+            assert len(mask) == len(data), "Manufacturer data mask must be the same length as the data."
+            self._manufacturer = (
+                manufacturer_id,
+                tuple((i + 2, m, d & m) for i, (d, m) in enumerate(zip(data, mask)) if m),
+                len(data) + 2,
+            )
+
+    def matches(self, peer_addr: NordicDriver.BLEGapAddr, rssi: int, adv_data: NordicDriver.BLEAdvData) -> bool:
+        """Evaluate the filter against an advertising report
+
+        :param peer_addr: advertiser address
+        :param rssi: report RSSI
+        :param adv_data: advertising data records
+        :return: Boolean indicating if the report passes the filter
+        """
+        if self.min_rssi is not None and rssi < self.min_rssi:
+            return False
+
+        if self._addresses is not None and tuple(peer_addr.addr) not in self._addresses:
+            return False
+
+        records = adv_data.records
+
+        if self._name_prefix is not None:
+            prefix = self._name_prefix
+            for t in _NAME_TYPES:
+                name = records.get(t)
+                if name is not None and name[: len(prefix)] == prefix:
+                    break
+            else:
+                return False
+
+        if self._uuids16 is not None and not self._match_uuids16(records):
+            return False
+
+        if self._uuids128 is not None and not self._match_uuids128(records):
+            return False
+
+        if self._manufacturer is not None and not self._match_manufacturer(records):
+            return False
+
+        return True
+
+    def __call__(self, peer_addr: NordicDriver.BLEGapAddr, rssi: int, adv_data: NordicDriver.BLEAdvData) -> bool:
+        return self.matches(peer_addr, rssi, adv_data)
+
+    def _match_uuids16(self, records: dict) -> bool:
+        for t in _UUID16_TYPES:
+            rec = records.get(t)
+            if rec is not None:
+                for i in range(0, len(rec) - 1, 2):
+                    if rec[i] | (rec[i + 1] << 8) in self._uuids16:
+                        return True
+        return False
+
+    def _match_uuids128(self, records: dict) -> bool:
+        for t in _UUID128_TYPES:
+            rec = records.get(t)
+            if rec is not None:
+                for i in range(0, len(rec) - 15, 16):
+                    if rec[i : i + 16] in self._uuids128:
+                        return True
+        return False
+
+    def _match_manufacturer(self, records: dict) -> bool:
+        rec = records.get(_TYPES.manufacturer_specific_data)
+        company_id, masked, length = self._manufacturer
+        if rec is None or len(rec) < length:
+            return False
+        if company_id is not None and rec[0] | (rec[1] << 8) != company_id:
+            return False
+        return all(rec[i] & m == d for i, m, d in masked)
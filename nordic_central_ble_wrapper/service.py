@@ -13,6 +13,7 @@ from typing import TYPE_CHECKING
 from pc_ble_driver_py import ble_driver as NordicDriver
 
 if TYPE_CHECKING:
+    from cache import StaticValueCache
     from central_ble_driver import CentralBleDriver
     from characteristic import Characteristic
 
@@ -23,6 +24,14 @@ class Service:
     uuid = None  # type: (NordicDriver.BLEUUID | None)
     characteristics = dict()  # type: dict[NordicDriver.BLEUUID, Characteristic]
 
-    def __init__(self, nrf: CentralBleDriver) -> None:
+    def __init__(self, nrf: CentralBleDriver, cache: StaticValueCache | None = None) -> None:
         self.nrf = nrf
+        self.cache = cache
         self.logger = logging.getLogger(self.__class__.__name__)
+
+    def cache_key(self) -> tuple[str, str] | None:
+        """Cache key prefix (peer address, firmware revision) of the connected peer for static characteristic reads
+
+        :return: Key prefix, None disables caching
+        """
+        return None
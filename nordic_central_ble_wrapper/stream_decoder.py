@@ -0,0 +1,209 @@
+#!/usr/bin/env python3.10
+# -*- coding: utf-8 -*-
+
+"""
+Batched NumPy decoding of fixed-layout notification streams
+
+NumPy is an optional dependency, only imported when a decoder is created.
+"""
+
+from __future__ import annotations
+
+import re
+import struct
+import threading
+
+from collections import deque
+from typing import TYPE_CHECKING, Callable
+
+if TYPE_CHECKING:
+    import numpy as np
+
+    from characteristic import Characteristic
+
+# struct format code: NumPy type code (without byte order)
+_STRUCT_TO_NUMPY = {
+    "c": "S1",
+    "b": "i1",
+    "B": "u1",
+    "?": "?",
+    "h": "i2",
+    "H": "u2",
+    "i": "i4",
+    "I": "u4",
+    "l": "i4",
+    "L": "u4",
+    "q": "i8",
+    "Q": "u8",
+    "e": "f2",
+    "f": "f4",
+    "d": "f8",
+}
+_BYTE_ORDERS = {"<": "<", ">": ">", "!": ">", "=": "=", "@": "="}
+
+
+def struct_dtype(fmt: str, names: list[str] | None = None) -> np.dtype:
+    """Build a NumPy structured dtype with the same layout as a struct format
+
+    Every value of the format becomes a field ("3H" is three fields), pad bytes ("x") are skipped and "Ns" becomes an
+    N-byte string field. Native alignment ("@" or no prefix) isn't supported, the format must not need padding.
+
+    :param fmt: struct format string (e.g. "<Hhhh")
+    :param names: field names, one per value, defaults to f0, f1, ...
+    :return: Packed structured dtype whose itemsize equals struct.calcsize(fmt)
+    """
+    import numpy as np  # optional dependency, only needed for stream decoding
+
+    order = _BYTE_ORDERS.get(fmt[:1], "=")
+    body = fmt[1:] if fmt[:1] in _BYTE_ORDERS else fmt
+
+    types = []  # type: list[str]
+    for count, code in re.findall(r"\s*(\d*)([a-zA-Z?])", body):
+        count = int(count) if count else 1
+        if code == "x":
+            types.append(f"V{count}")
+        elif code == "s":
+            types.append(f"S{count}")
+        elif code in _STRUCT_TO_NUMPY:
+            types += [order + _STRUCT_TO_NUMPY[code]] * count
+        else:
+            raise ValueError(f"Unsupported struct format code {code!r} in {fmt!r}")
+
+    value_count = sum(not t.startswith("V") for t in types)
+    if names is None:
+        names = [f"f{i}" for i in range(value_count)]
+    if len(names) != value_count:
+        raise ValueError(f"{fmt!r} has {value_count} values, {len(names)} names given")
+
+    offsets, formats, field_names = [], [], []
+    offset = 0
+    value_names = iter(names)
+    for t in types:
+        size = np.dtype(t).itemsize
+        if not t.startswith("V"):
+            field_names.append(next(value_names))
+            formats.append(t)
+            offsets.append(offset)
+        offset += size
+
+    dtype = np.dtype({"names": field_names, "formats": formats, "offsets": offsets, "itemsize": offset})
+    if dtype.itemsize != struct.calcsize(fmt):
+        raise ValueError(f"{fmt!r} needs native alignment padding, use an explicit byte order prefix")
+    return dtype
+
+
+class NotificationStreamDecoder:
+    """Accumulate fixed-layout notification payloads in a preallocated block and decode them a batch at a time
+
+    Payloads are copied into the block as they arrive (a payload may carry several packed records); each time it fills
+    up, the whole block is decoded with a single NumPy call into a structured array, handed to on_batch or queued for
+    read(). Payloads whose length isn't a multiple of the record size are counted in dropped and discarded.
+    """
+
+    def __init__(
+        self,
+        fmt: str,
+        names: list[str] | None = None,
+        batch_size: int = 1024,
+        on_batch: Callable[[np.ndarray], None] | None = None,
+        max_batches: int | None = None,
+    ) -> None:
+        """Initialize decoder
+
+        :param fmt: struct format of a record (e.g. "<Hhhh")
+        :param names: record field names, see struct_dtype()
+        :param batch_size: number of records per decoded batch
+        :param on_batch: called with each full batch (a structured array) on the notifying thread, otherwise batches
+                         are queued for read()
+        :param max_batches: maximum number of queued batches, the oldest is discarded beyond it
+        """
+        import numpy as np  # optional dependency, only needed for stream decoding
+
+        self._np = np
+        self.dtype = struct_dtype(fmt, names)
+        self.record_size = self.dtype.itemsize
+        self.batch_size = batch_size
+        self.on_batch = on_batch
+
+        self.records = 0
+        self.dropped = 0
+
+        self._lock = threading.Lock()
+        self._block = bytearray(batch_size * self.record_size)
+        self._count = 0
+        self._batches = deque(maxlen=max_batches)  # type: deque[np.ndarray]
+        self._characteristics = list()  # type: list[Characteristic]
+
+    def feed(self, payload: bytes) -> None:
+        """Add a notification payload, usable directly as a Characteristic notification listener
+
+        :param payload: one or more packed records
+        """
+        size = self.record_size
+        n = len(payload) // size
+        if n == 0 or n * size != len(payload):
+            self.dropped += 1
+            return
+
+        view = memoryview(payload)
+        full = []
+        with self._lock:
+            offset = 0
+            while n:
+                take = min(n, self.batch_size - self._count)
+                start = self._count * size
+                self._block[start : start + take * size] = view[offset : offset + take * size]
+                self._count += take
+                self.records += take
+                offset += take * size
+                n -= take
+
+                if self._count == self.batch_size:
+                    full.append(self._decode())
+
+            if self.on_batch is None:
+                self._batches.extend(full)
+
+        if self.on_batch is not None:
+            for batch in full:
+                self.on_batch(batch)
+
+    def flush(self) -> np.ndarray:
+        """Decode the records of the partially filled block now
+
+        :return: Structured array of the pending records (possibly empty)
+        """
+        with self._lock:
+            return self._decode()
+
+    def read(self) -> np.ndarray:
+        """Take every queued batch and the pending records
+
+        :return: Structured array of all records received since the last read, oldest first
+        """
+        with self._lock:
+            batches = list(self._batches)
+            self._batches.clear()
+            batches.append(self._decode())
+        return batches[0] if len(batches) == 1 else self._np.concatenate(batches)
+
+    def attach(self, characteristic: Characteristic) -> None:
+        """Start decoding a characteristic's notifications/indications
+
+        :param characteristic: characteristic to listen to
+        """
+        characteristic.notification_listeners.append(self.feed)
+        self._characteristics.append(characteristic)
+
+    def detach(self) -> None:
+        """Stop decoding every attached characteristic"""
+        for characteristic in self._characteristics:
+            if self.feed in characteristic.notification_listeners:
+                characteristic.notification_listeners.remove(self.feed)
+        self._characteristics.clear()
+
+    def _decode(self) -> np.ndarray:
+        # Copy out of the block, which is reused for the next records
+        batch = self._np.frombuffer(self._block, dtype=self.dtype, count=self._count).copy()
+        self._count = 0
+        return batch
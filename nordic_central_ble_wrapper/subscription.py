@@ -0,0 +1,178 @@
+#!/usr/bin/env python3.10
+# -*- coding: utf-8 -*-
+
+"""
+Bounded notification subscription object
+"""
+
+from __future__ import annotations
+
+import threading
+
+from collections import deque
+from enum import IntEnum
+from typing import TYPE_CHECKING, Iterator
+
+if TYPE_CHECKING:
+    from characteristic import Characteristic
+
+
+class OverflowPolicy(IntEnum):
+    Block = 0
+    """Block the producer (driver event thread) until the consumer frees a slot"""
+
+    DropOldest = 1
+    """Discard the oldest queued payload to make room for the new one"""
+
+    DropNewest = 2
+    """Discard the new payload, keeping the queued ones"""
+
+
+class NotificationSubscription:
+    """Bounded queue of notification/indication payloads for a single characteristic
+
+    Payloads are pushed from the driver's event thread and consumed from any other thread, either one at a time
+    (get/iteration) or in batches (drain).
+    """
+
+    def __init__(
+        self,
+        characteristic: Characteristic,
+        maxsize: int = 1024,
+        overflow_policy: OverflowPolicy = OverflowPolicy.DropOldest,
+        block_timeout: float | None = None,
+    ) -> None:
+        """Initialize subscription object
+
+        :param characteristic: characteristic the subscription receives payloads from
+        :param maxsize: maximum number of queued payloads
+        :param overflow_policy: behavior when a payload arrives while the queue is full
+        :param block_timeout: maximum time the producer blocks with OverflowPolicy.Block before dropping the payload
+        """
+        assert maxsize > 0, "Subscription queue size must be greater than 0."
+
+        self.characteristic = characteristic
+        self.maxsize = maxsize
+        self.overflow_policy = overflow_policy
+        self.block_timeout = block_timeout
+
+        self.received = 0
+        self.dropped_oldest = 0
+        self.dropped_newest = 0
+
+        self._q = deque()  # type: deque[bytes]
+        self._closed = False
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+
+    @property
+    def dropped(self) -> int:
+        return self.dropped_oldest + self.dropped_newest
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def __len__(self) -> int:
+        return len(self._q)
+
+    def put(self, payload: bytes) -> bool:
+        """Queue a payload, applying the overflow policy when full
+
+        :param payload: notification/indication payload
+        :return: Boolean indicating if the payload was queued
+        """
+        with self._lock:
+            if self._closed:
+                return False
+
+            self.received += 1
+
+            if len(self._q) >= self.maxsize:
+                if self.overflow_policy is OverflowPolicy.DropNewest:
+                    self.dropped_newest += 1
+                    return False
+
+                if self.overflow_policy is OverflowPolicy.DropOldest:
+                    self._q.popleft()
+                    self.dropped_oldest += 1
+
+                elif not self._not_full.wait_for(
+                    lambda: self._closed or len(self._q) < self.maxsize, timeout=self.block_timeout
+                ):
+                    self.dropped_newest += 1
+                    return False
+
+                if self._closed:
+                    return False
+
+            self._q.append(payload)
+            self._not_empty.notify()
+            return True
+
+    def get(self, timeout: float | None = None) -> bytes | None:
+        """Wait for a single payload
+
+        :param timeout: maximum time to wait in seconds, None waits forever
+        :return: Payload, or None on timeout or when the subscription is closed and empty
+        """
+        with self._lock:
+            if not self._not_empty.wait_for(lambda: self._q or self._closed, timeout=timeout) or not self._q:
+                return None
+
+            payload = self._q.popleft()
+            self._not_full.notify()
+            return payload
+
+    def drain(self, max_n: int | None = None, timeout: float | None = 0) -> list[bytes]:
+        """Remove up to max_n queued payloads at once
+
+        :param max_n: maximum number of payloads to return, None returns everything queued
+        :param timeout: time to wait for at least one payload, 0 returns immediately, None waits forever
+        :return: List of payloads in arrival order
+        """
+        with self._lock:
+            if timeout != 0:
+                self._not_empty.wait_for(lambda: self._q or self._closed, timeout=timeout)
+
+            n = len(self._q) if max_n is None else min(max_n, len(self._q))
+            if n == len(self._q):
+                ret = list(self._q)
+                self._q.clear()
+            else:
+                popleft = self._q.popleft
+                ret = [popleft() for _ in range(n)]
+
+            if n:
+                self._not_full.notify_all()
+            return ret
+
+    def close(self) -> None:
+        """Detach from the characteristic and wake any waiting producer/consumer"""
+        self.characteristic.unsubscribe(self)
+        with self._lock:
+            self._closed = True
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+
+    def __iter__(self) -> Iterator[bytes]:
+        """Iterate payloads as they arrive until the subscription is closed"""
+        while True:
+            payload = self.get()
+            if payload is None:
+                return
+            yield payload
+
+    def __enter__(self) -> NotificationSubscription:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __str__(self) -> str:
+        return (
+            f"{self.__class__.__name__}({self.characteristic.__class__.__name__}, queued={len(self._q)}/"
+            f"{self.maxsize}, received={self.received}, dropped_oldest={self.dropped_oldest}, "
+            f"dropped_newest={self.dropped_newest})"
+        )
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3.10
+# -*- coding: utf-8 -*-
+
+"""
+Vendor specific UUID base registry of an adapter
+"""
+
+from __future__ import annotations
+
+import threading
+
+from typing import Iterator
+
+from pc_ble_driver_py import ble_driver as NordicDriver
+
+# BLE_UUID_TYPE_UNKNOWN, the type of a vendor specific base that wasn't registered with the SoftDevice
+UUID_TYPE_UNKNOWN = 0
+
+
+class UuidRegistry:
+    """Vendor specific UUID bases and the UUID types the SoftDevice assigned them
+
+    Each base costs one ble_vs_uuid_add round trip to the adapter when first registered, after which normalising a
+    UUID (filling in its base type) is a dictionary lookup. The registry outlives connections; when the adapter is
+    reopened, bind() registers the known bases again in their original order, so they get the same types back.
+    """
+
+    def __init__(self) -> None:
+        self.driver = None  # type: (NordicDriver.BLEDriver | None)
+
+        self._lock = threading.Lock()
+        self._bases = dict()  # type: dict[tuple[int, ...], NordicDriver.BLEUUIDBase]
+        self._types = dict()  # type: dict[tuple[int, ...], int]
+
+    def __len__(self) -> int:
+        return len(self._bases)
+
+    def __contains__(self, base: NordicDriver.BLEUUIDBase) -> bool:
+        return tuple(base.base) in self._bases
+
+    def __iter__(self) -> Iterator[NordicDriver.BLEUUIDBase]:
+        return iter(list(self._bases.values()))
+
+    def bind(self, driver: NordicDriver.BLEDriver) -> None:
+        """Attach to an opened (enabled) driver, registering every known base with it
+
+        :param driver: BLE driver of the adapter
+        """
+        with self._lock:
+            self.driver = driver
+            self._types.clear()
+            for key, base in self._bases.items():
+                self._add(key, base)
+
+    def unbind(self) -> None:
+        """Detach from a closed driver, types are assigned again by the next bind()"""
+        with self._lock:
+            self.driver = None
+            self._types.clear()
+
+    def register(self, base: NordicDriver.BLEUUIDBase) -> int | None:
+        """Register a vendor specific base, only the first registration of a base reaches the adapter
+
+        :param base: vendor specific UUID base, its type is filled in
+        :return: UUID type assigned to the base, None until the registry is bound to a driver
+        """
+        key = tuple(base.base)
+        with self._lock:
+            self._bases.setdefault(key, base)
+            uuid_type = self._types.get(key)
+            if uuid_type is None and self.driver is not None:
+                uuid_type = self._add(key, base)
+            if uuid_type is not None:
+                base.type = uuid_type
+            return uuid_type
+
+    def normalize(self, uuid: NordicDriver.BLEUUID) -> NordicDriver.BLEUUID:
+        """Fill in the base type of a vendor specific UUID, registering its base if unknown
+
+        :param uuid: UUID to normalise in place
+        :return: The same UUID object
+        """
+        base = uuid.base
+        if base is not None and base.base is not None and base.type in (None, UUID_TYPE_UNKNOWN):
+            uuid_type = self._types.get(tuple(base.base))
+            if uuid_type is None:
+                uuid_type = self.register(base)
+            if uuid_type is not None:
+                base.type = uuid_type
+        return uuid
+
+    def _add(self, key: tuple[int, ...], base: NordicDriver.BLEUUIDBase) -> int:
+        self.driver.ble_vs_uuid_add(base)
+        self._types[key] = base.type
+        return base.type
@@ -0,0 +1,409 @@
+#!/usr/bin/env python3.10
+# -*- coding: utf-8 -*-
+
+"""
+Process-per-adapter workers streaming notifications and advertising reports through shared-memory rings
+
+Each AdapterWorker runs a CentralBleDriver in its own process, so the pc-ble-driver event threads of different adapters
+(and the decoding done in their callbacks) no longer compete for a single GIL. Driver methods are called over a Pipe,
+while notifications/indications and advertising reports are pushed by the worker's event thread into a single-producer
+single-consumer ring buffer in shared memory, read by the parent without any per-event pickling or syscalls.
+
+Ring layout: header = write position (u64), read position (u64), dropped records (u64), capacity (u64), followed by
+capacity bytes of records = length (u32) + payload, padded to 4 bytes. A length of WRAP marks the unused tail of the
+buffer, the next record starting at offset 0. Positions are monotonically increasing byte counts.
+"""
+
+from __future__ import annotations
+
+import logging
+import multiprocessing
+import struct
+import threading
+import time
+
+from dataclasses import dataclass
+from enum import IntEnum
+from multiprocessing import shared_memory
+from typing import Any, Callable
+
+from pc_ble_driver_py import ble_driver as NordicDriver
+
+from adv_parser import AdvertisementParser, address_str
+
+logger = logging.getLogger("worker")
+
+
+class WorkerError(Exception):
+    """A command failed in the worker process"""
+
+
+class SharedRing:
+    """Single-producer single-consumer byte record ring buffer in shared memory
+
+    The producer never blocks: a record that doesn't fit is dropped and counted. Only the producer writes the write
+    position and the consumer the read position, each after the record bytes, so no lock is shared between processes.
+    """
+
+    HEADER = struct.Struct("<QQQQ")
+    LENGTH = struct.Struct("<I")
+    WRAP = 0xFFFFFFFF
+
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool) -> None:
+        self.shm = shm
+        self.owner = owner
+        self.capacity = self.HEADER.unpack_from(shm.buf, 0)[3]
+        self._data = shm.buf[self.HEADER.size : self.HEADER.size + self.capacity]
+
+    @classmethod
+    def create(cls, size: int = 1 << 20) -> SharedRing:
+        """Allocate a ring
+
+        :param size: record capacity in bytes, rounded up to a multiple of 4
+        :return: Ring owning the shared memory block
+        """
+        size = (size + 3) & ~3
+        shm = shared_memory.SharedMemory(create=True, size=cls.HEADER.size + size)
+        cls.HEADER.pack_into(shm.buf, 0, 0, 0, 0, size)
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name: str) -> SharedRing:
+        """Attach to a ring created by another process
+
+        :param name: shared memory block name
+        :return: Ring not owning the shared memory block
+        """
+        return cls(shared_memory.SharedMemory(name=name), owner=False)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    @property
+    def dropped(self) -> int:
+        return self.HEADER.unpack_from(self.shm.buf, 0)[2]
+
+    def __len__(self) -> int:
+        """Number of unread bytes (including record framing)"""
+        w, r, _, _ = self.HEADER.unpack_from(self.shm.buf, 0)
+        return w - r
+
+    def push(self, payload: bytes) -> bool:
+        """Append a record (producer side)
+
+        :param payload: record payload
+        :return: Boolean indicating if the record was stored, False if it was dropped for lack of space
+        """
+        w, r, dropped, cap = self.HEADER.unpack_from(self.shm.buf, 0)
+        size = (self.LENGTH.size + len(payload) + 3) & ~3
+        offset = w % cap
+        tail = cap - offset
+        needed = size if size <= tail else tail + size
+
+        if needed > cap - (w - r):
+            struct.pack_into("<Q", self.shm.buf, 16, dropped + 1)
+            return False
+
+        if size > tail:
+            self.LENGTH.pack_into(self._data, offset, self.WRAP)
+            w += tail
+            offset = 0
+
+        self.LENGTH.pack_into(self._data, offset, len(payload))
+        self._data[offset + self.LENGTH.size : offset + self.LENGTH.size + len(payload)] = payload
+        # Publish the record only once its bytes are in place
+        struct.pack_into("<Q", self.shm.buf, 0, w + size)
+        return True
+
+    def pop(self) -> bytes | None:
+        """Remove the oldest record (consumer side)
+
+        :return: Record payload, None if the ring is empty
+        """
+        w, r, _, cap = self.HEADER.unpack_from(self.shm.buf, 0)
+        if r == w:
+            return None
+
+        offset = r % cap
+        length = self.LENGTH.unpack_from(self._data, offset)[0]
+        if length == self.WRAP:
+            r += cap - offset
+            offset = 0
+            length = self.LENGTH.unpack_from(self._data, 0)[0]
+
+        payload = bytes(self._data[offset + self.LENGTH.size : offset + self.LENGTH.size + length])
+        struct.pack_into("<Q", self.shm.buf, 8, r + ((self.LENGTH.size + length + 3) & ~3))
+        return payload
+
+    def drain(self, max_records: int | None = None) -> list[bytes]:
+        """Remove every available record (consumer side)
+
+        :param max_records: maximum number of records to remove
+        :return: Record payloads, oldest first
+        """
+        records = []
+        while max_records is None or len(records) < max_records:
+            payload = self.pop()
+            if payload is None:
+                break
+            records.append(payload)
+        return records
+
+    def close(self) -> None:
+        self._data.release()
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+class EventKind(IntEnum):
+    Notification = 0
+    """Notification or indication payload"""
+
+    AdvReport = 1
+
+
+EVENT_HEADER = struct.Struct("<BHd")  # kind, conn_handle, time.monotonic() timestamp
+NOTIFICATION_HEADER = struct.Struct("<HB")  # characteristic UUID value, UUID base type
+ADV_REPORT_HEADER = struct.Struct("<6sBbB")  # address, address type, rssi, advertising type
+
+
+@dataclass(slots=True)
+class WorkerEvent:
+    """Notification or advertising report read from a worker's ring"""
+
+    kind: EventKind
+    conn_handle: int
+    t: float
+    data: bytes
+    uuid: int | None = None
+    uuid_type: int | None = None
+    address: str | None = None
+    address_type: int | None = None
+    rssi: int | None = None
+    adv_type: int | None = None
+
+    @property
+    def records(self) -> dict[int, list[int]]:
+        """Advertising data records by AD type of an advertising report"""
+        records = dict()
+        i = 0
+        while i + 1 < len(self.data):
+            length = self.data[i]
+            records[self.data[i + 1]] = list(self.data[i + 2 : i + 1 + length])
+            i += 1 + length
+        return records
+
+
+def encode_notification(conn_handle: int, uuid: NordicDriver.BLEUUID, data: list[int]) -> bytes:
+    uuid_type = getattr(uuid.base, "type", None) or 0
+    return (
+        EVENT_HEADER.pack(EventKind.Notification, conn_handle, time.monotonic())
+        + NOTIFICATION_HEADER.pack(uuid.value, uuid_type)
+        + bytes(data)
+    )
+
+
+def encode_adv_report(peer_addr: NordicDriver.BLEGapAddr, rssi: int, adv_type: Any, adv_data: Any) -> bytes:
+    addr_type = getattr(peer_addr, "addr_type", None)
+    return (
+        EVENT_HEADER.pack(EventKind.AdvReport, 0xFFFF, time.monotonic())
+        + ADV_REPORT_HEADER.pack(
+            bytes(peer_addr.addr),
+            0 if addr_type is None else int(addr_type),
+            rssi,
+            0xFF if adv_type is None else int(adv_type),
+        )
+        + AdvertisementParser.payload_key(adv_data.records)
+    )
+
+
+def decode_event(payload: bytes) -> WorkerEvent:
+    kind, conn_handle, t = EVENT_HEADER.unpack_from(payload, 0)
+    offset = EVENT_HEADER.size
+
+    if kind == EventKind.Notification:
+        uuid, uuid_type = NOTIFICATION_HEADER.unpack_from(payload, offset)
+        data = payload[offset + NOTIFICATION_HEADER.size :]
+        return WorkerEvent(EventKind.Notification, conn_handle, t, data, uuid=uuid, uuid_type=uuid_type)
+
+    addr, addr_type, rssi, adv_type = ADV_REPORT_HEADER.unpack_from(payload, offset)
+    return WorkerEvent(
+        EventKind.AdvReport,
+        conn_handle,
+        t,
+        payload[offset + ADV_REPORT_HEADER.size :],
+        address=address_str(tuple(addr)),
+        address_type=addr_type,
+        rssi=rssi,
+        adv_type=None if adv_type == 0xFF else adv_type,
+    )
+
+
+def _worker_main(
+    port: str,
+    ring_name: str,
+    conn: Any,
+    open_kwargs: dict[str, Any],
+    driver_kwargs: dict[str, Any],
+    setup: Callable[[Any], None] | None,
+) -> None:
+    from central_ble_driver import CentralBleDriver
+
+    ring = SharedRing.attach(ring_name)
+    nrf = CentralBleDriver(**driver_kwargs)
+    nrf.notification_listeners.append(lambda h, uuid, data: ring.push(encode_notification(h, uuid, data)))
+    nrf.adv_report_listeners.append(lambda addr, rssi, t, data: ring.push(encode_adv_report(addr, rssi, t, data)))
+
+    try:
+        nrf.open(com=port, **open_kwargs)
+        if nrf.adapter is None:
+            conn.send(("error", f"Failed to open {port}"))
+            return
+        if setup is not None:
+            setup(nrf)
+        conn.send(("ok", None))
+
+        while True:
+            try:
+                msg = conn.recv()
+            except EOFError:
+                break
+            if msg is None:
+                break
+
+            method, args, kwargs = msg
+            try:
+                reply = ("ok", getattr(nrf, method)(*args, **kwargs))
+            except Exception as e:
+                reply = ("error", f"{type(e).__name__}: {e}")
+
+            try:
+                conn.send(reply)
+            except Exception as e:
+                conn.send(("error", f"{method} result can't be sent: {e}"))
+    finally:
+        if nrf.adapter is not None:
+            nrf.close()
+        ring.close()
+
+
+class AdapterWorker:
+    """CentralBleDriver running in a separate process, see the module documentation
+
+    Every public CentralBleDriver method can be called on the worker (e.g. worker.connect(...)), arguments and results
+    are pickled over the command pipe. Service handlers, which hold callbacks, are set up inside the worker process by
+    the setup function.
+    """
+
+    def __init__(
+        self,
+        port: str,
+        ring_size: int = 1 << 20,
+        open_kwargs: dict[str, Any] | None = None,
+        driver_kwargs: dict[str, Any] | None = None,
+        setup: Callable[[Any], None] | None = None,
+        start_method: str = "spawn",
+    ) -> None:
+        """Initialize worker, call start() to launch its process
+
+        :param port: COM port of the adapter
+        :param ring_size: event ring capacity in bytes
+        :param open_kwargs: CentralBleDriver.open() keyword arguments besides com
+        :param driver_kwargs: CentralBleDriver() keyword arguments
+        :param setup: module-level function called as setup(nrf) in the worker after opening the adapter
+        :param start_method: multiprocessing start method
+        """
+        self.port = port
+        self.ring = SharedRing.create(ring_size)
+
+        self._lock = threading.Lock()
+        self._conn, child_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.get_context(start_method).Process(
+            target=_worker_main,
+            args=(port, self.ring.name, child_conn, open_kwargs or dict(), driver_kwargs or dict(), setup),
+            name=f"AdapterWorker-{port}",
+            daemon=True,
+        )
+
+    def __enter__(self) -> AdapterWorker:
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __getattr__(self, name: str) -> Callable[..., Any]:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return lambda *args, **kwargs: self.call(name, *args, **kwargs)
+
+    def start(self, timeout: float | None = 30) -> None:
+        """Launch the worker process and wait for its adapter to be opened
+
+        :param timeout: maximum time to wait in seconds
+        """
+        self.process.start()
+        self._reply(timeout)
+
+    def call(self, method: str, *args, timeout: float | None = None, **kwargs) -> Any:
+        """Call a CentralBleDriver method in the worker
+
+        :param method: method name
+        :param timeout: maximum time to wait for the result in seconds
+        :return: Method result
+        """
+        with self._lock:
+            self._conn.send((method, args, kwargs))
+            return self._reply(timeout)
+
+    def events(self, max_events: int | None = None) -> list[WorkerEvent]:
+        """Read the available notification and advertising report events, oldest first
+
+        :param max_events: maximum number of events to read
+        :return: Decoded events
+        """
+        return [decode_event(payload) for payload in self.ring.drain(max_events)]
+
+    def wait_events(
+        self, timeout: float | None = None, max_events: int | None = None, poll_s: float = 0.001
+    ) -> list[WorkerEvent]:
+        """Poll the ring until events are available
+
+        :param timeout: maximum time to wait in seconds
+        :param max_events: maximum number of events to read
+        :param poll_s: polling interval in seconds
+        :return: Decoded events, empty on timeout
+        """
+        end = None if timeout is None else time.monotonic() + timeout
+        while True:
+            events = self.events(max_events)
+            if events or (end is not None and time.monotonic() >= end):
+                return events
+            time.sleep(poll_s)
+
+    def close(self, timeout: float = 5) -> None:
+        """Close the adapter and stop the worker process"""
+        if self.process.is_alive():
+            try:
+                with self._lock:
+                    self._conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+            self.process.join(timeout)
+            if self.process.is_alive():
+                self.process.terminate()
+        self._conn.close()
+        self.ring.close()
+
+    def _reply(self, timeout: float | None) -> Any:
+        if not self._conn.poll(timeout):
+            raise WorkerError(f"{self.port}: timeout waiting for the worker")
+        try:
+            status, value = self._conn.recv()
+        except EOFError:
+            raise WorkerError(f"{self.port}: worker exited")
+        if status == "error":
+            raise WorkerError(f"{self.port}: {value}")
+        return value